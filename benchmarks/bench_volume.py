@@ -0,0 +1,76 @@
+# Benchmarks for the scan, matching, resize and merge stages on synthetic volumes.
+#
+#   python -m pytest benchmarks/bench_volume.py --benchmark-only
+#   python -m pytest benchmarks/bench_volume.py --benchmark-only -k small --benchmark-autosave
+import os, shutil
+
+
+def bundled_icon_map(ventoy_assist):
+    names = [os.path.splitext(f)[0] for f in os.listdir(ventoy_assist.ICON_DIR) if f.lower().endswith(".png")]
+    return {name: name for name in names}
+
+
+def test_find_image_files(benchmark, ventoy_assist, volume):
+    files = benchmark(ventoy_assist.find_image_files, volume["root"], ventoy_assist.IMAGE_EXTENSIONS)
+    assert len(files) == len(volume["images"])
+
+
+def test_path_store_scan(benchmark, ventoy_assist, volume):
+    store = benchmark(ventoy_assist.PathStore.scan, volume["root"], ventoy_assist.IMAGE_EXTENSIONS)
+    assert len(store.file_names) == len(volume["images"])
+
+
+def test_trigram_index_build(benchmark, ventoy_assist, volume):
+    store = ventoy_assist.PathStore.scan(volume["root"], ventoy_assist.IMAGE_EXTENSIONS)
+    search_index = benchmark(ventoy_assist.TrigramIndex, store)
+    assert search_index.search("ubuntu")
+
+
+def test_trigram_index_search(benchmark, ventoy_assist, volume):
+    search_index = ventoy_assist.TrigramIndex(ventoy_assist.PathStore.scan(volume["root"], ventoy_assist.IMAGE_EXTENSIONS))
+    results = benchmark(search_index.search, "ubuntu")
+    assert results
+
+
+def test_get_matching_tools(benchmark, ventoy_assist, volume):
+    icon_map = bundled_icon_map(ventoy_assist)
+    matching_tools = benchmark(ventoy_assist.get_matching_tools, volume["images"], icon_map)
+    assert matching_tools
+
+
+def test_collect_theme_paths(benchmark, ventoy_assist, volume):
+    theme_paths = benchmark(
+        ventoy_assist.collect_theme_paths,
+        volume["root"],
+        volume["ventoy_json"],
+        volume["first_theme"],
+        True,
+        True,
+    )
+    assert len(theme_paths) == len(volume["icons_paths"])
+
+
+def test_merge_menu_class(benchmark, ventoy_assist, volume):
+    matching_tools = ventoy_assist.get_matching_tools(volume["images"], bundled_icon_map(ventoy_assist))
+    menu_class = benchmark(ventoy_assist.merge_menu_class, volume["ventoy_json"]["menu_class"], matching_tools)
+    assert len(menu_class) >= len(set(matching_tools))
+
+
+def test_copy_and_resize_icons(benchmark, ventoy_assist, volume, tmp_path):
+    # Copy the theme icons folders so every round starts from the same collisions
+    originals = volume["icons_paths"]
+    dest_dirs = [str(tmp_path / f"icons{index}") for index in range(len(originals))]
+
+    def setup():
+        for original, dest_dir in zip(originals, dest_dirs):
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            shutil.copytree(original, dest_dir)
+
+    icon_maps, warnings = benchmark.pedantic(
+        ventoy_assist.copy_and_resize_icons,
+        args=(ventoy_assist.ICON_DIR, dest_dirs, (32, 32)),
+        setup=setup,
+        rounds=3,
+    )
+    assert not warnings
+    assert all(icon_maps[dest_dir] for dest_dir in dest_dirs)
@@ -0,0 +1,30 @@
+import pytest
+from synthetic import load_ventoy_assist, make_volume
+
+# (images, depth, themes, resolutions, menu_class entries) per scale
+SCALES = {
+    "small": (500, 3, 1, 2, 200),
+    "medium": (5000, 5, 3, 4, 2000),
+    "large": (20000, 7, 5, 8, 20000),
+}
+
+
+@pytest.fixture(scope="session")
+def ventoy_assist():
+    return load_ventoy_assist()
+
+
+@pytest.fixture(scope="session", params=sorted(SCALES))
+def volume(request, tmp_path_factory, ventoy_assist):
+    images, depth, themes, resolutions, menu_class_entries = SCALES[request.param]
+    root = str(tmp_path_factory.mktemp(f"volume-{request.param}"))
+    return make_volume(
+        root,
+        images=images,
+        depth=depth,
+        themes=themes,
+        resolutions=resolutions,
+        collisions=10,
+        menu_class_entries=menu_class_entries,
+        icon_dir=ventoy_assist.ICON_DIR,
+    )
@@ -0,0 +1,87 @@
+# Benchmark harness for the volume probe and the batched icon writer.
+#
+# Runs against any writable folder (for example a tmpfs mount) or, with --fat-image, against a
+# freshly formatted FAT32 image mounted through a loop device (Linux, needs root and mkfs.vfat):
+#
+#   python benchmarks/io_bench.py --target /dev/shm/ventoy-bench
+#   sudo python benchmarks/io_bench.py --fat-image 256
+import os, time, json, shutil, argparse, tempfile, subprocess
+from synthetic import load_ventoy_assist
+
+
+# Create a FAT32 image, mount it through a loop device and return (mount point, cleanup)
+def mount_fat_image(size_mb):
+    work_dir = tempfile.mkdtemp(prefix="ventoy-bench-")
+    image_path = os.path.join(work_dir, "volume.img")
+    mount_point = os.path.join(work_dir, "mnt")
+    os.makedirs(mount_point)
+
+    with open(image_path, "wb") as image_file:
+        image_file.truncate(size_mb * 1024 * 1024)
+    subprocess.run(["mkfs.vfat", "-F", "32", "-n", "VENTOY", image_path], check=True, stdout=subprocess.DEVNULL)
+    subprocess.run(["mount", "-o", f"loop,uid={os.getuid()},gid={os.getgid()}", image_path, mount_point], check=True)
+
+    def cleanup():
+        subprocess.run(["umount", mount_point], check=False)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return mount_point, cleanup
+
+
+# Time writing the same set of small files with a given schedule
+def time_writes(ventoy_assist, target, files, file_size, schedule):
+    out_dir = os.path.join(target, "bench-icons")
+    os.makedirs(out_dir, exist_ok=True)
+    data = os.urandom(file_size)
+    writes = [(os.path.join(out_dir, f"icon{index}.png"), data) for index in range(files)]
+
+    start = time.perf_counter()
+    warnings = ventoy_assist.write_plan_files(writes, [], schedule)
+    os.sync()
+    elapsed = time.perf_counter() - start
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    if warnings:
+        raise RuntimeError(warnings[0])
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the volume probe and batched writes of ventoy-assist.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--target", help="writable folder to benchmark, e.g. on a tmpfs mount")
+    group.add_argument("--fat-image", type=int, metavar="MB", help="create and loop-mount a FAT32 image of this size")
+    parser.add_argument("--files", type=int, default=500, help="number of icon-sized files to write")
+    parser.add_argument("--file-size", type=int, default=8 * 1024, help="size of every file in bytes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per configuration, the best one is reported")
+    args = parser.parse_args()
+
+    ventoy_assist = load_ventoy_assist()
+
+    cleanup = None
+    if args.fat_image:
+        target, cleanup = mount_fat_image(args.fat_image)
+    else:
+        target = args.target
+        os.makedirs(target, exist_ok=True)
+
+    try:
+        profile = ventoy_assist.probe_volume(target)
+        chosen = ventoy_assist.io_schedule(profile)
+        print(json.dumps({"profile": profile, "schedule": chosen}, indent=4))
+        print()
+        print(f"{'workers':>8} {'batch':>6} {'seconds':>9} {'files/s':>9}")
+
+        configurations = [dict(chosen, workers=workers) for workers in (1, 2, 4, 8)]
+        configurations.append(chosen)
+        for schedule in configurations:
+            best = min(time_writes(ventoy_assist, target, args.files, args.file_size, schedule) for _ in range(args.repeat))
+            marker = "  <- chosen" if schedule is chosen else ""
+            print(f"{schedule['workers']:>8} {schedule['batch_size']:>6} {best:>9.3f} {args.files / best:>9.0f}{marker}")
+    finally:
+        if cleanup:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
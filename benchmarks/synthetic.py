@@ -0,0 +1,121 @@
+# Synthetic Ventoy volumes for the benchmarks: image trees, themes with resolution variants,
+# icons folders with controlled name collisions and large ventoy.json files.
+import os, json, random, importlib.util
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ventoy-assist.py")
+
+# Distribution names used to build image file names, most of them have a bundled icon
+IMAGE_NAMES = [
+    "ubuntu-24.04-desktop-amd64",
+    "kubuntu-22.04.4-desktop-amd64",
+    "linuxmint-21.3-cinnamon-64bit",
+    "Fedora-Workstation-Live-x86_64-40",
+    "archlinux-2024.06.01-x86_64",
+    "debian-12.5.0-amd64-netinst",
+    "Win11_23H2_English_x64v2",
+    "Windows10_22H2_x64",
+    "manjaro-kde-24.0-240513-linux69",
+    "pop-os_22.04_amd64_nvidia",
+    "gparted-live-1.6.0-1-amd64",
+    "tails-amd64-6.3",
+    "kali-linux-2024.2-live-amd64",
+    "openSUSE-Tumbleweed-DVD-x86_64",
+    "proxmox-ve_8.2-1",
+    "some-random-tool",
+]
+
+
+# Import ventoy-assist.py as a module (the file name is not a valid module name)
+def load_ventoy_assist():
+    spec = importlib.util.spec_from_file_location("ventoy_assist", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Spread image files over a tree of the given depth, returns their paths
+def make_image_tree(root, images, depth=4, fanout=4, seed=0):
+    rng = random.Random(seed)
+    extensions = (".iso", ".iso", ".iso", ".img", ".wim", ".vhd", ".vhdx")
+    paths = []
+    for index in range(images):
+        folders = [f"dir{rng.randrange(fanout)}" for _ in range(rng.randrange(depth + 1))]
+        folder = os.path.join(root, "ISO", *folders)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{rng.choice(IMAGE_NAMES)}-{index}{rng.choice(extensions)}")
+        with open(path, "wb"):
+            pass
+        paths.append(path)
+
+        # Some files Ventoy ignores, so the walk has something to skip
+        if index % 10 == 0:
+            with open(os.path.join(folder, f"readme-{index}.txt"), "w") as note:
+                note.write("notes")
+    return paths
+
+
+# Create themes x resolutions theme folders and the matching ventoy.json theme entry
+def make_themes(root, themes, resolutions, icon_size=32, collisions=0, icon_dir=None, seed=0):
+    from PIL import Image
+
+    rng = random.Random(seed)
+    sizes = ["800x600", "1024x768", "1280x720", "1366x768", "1600x900", "1920x1080", "2560x1440", "3840x2160"]
+    bundled = sorted(f for f in os.listdir(icon_dir) if f.lower().endswith(".png")) if icon_dir else []
+
+    theme_files = []
+    icons_paths = []
+    for theme_index in range(themes):
+        for resolution in sizes[:resolutions]:
+            name = f"theme{theme_index}_{resolution}"
+            theme_dir = os.path.join(root, "ventoy", "themes", name)
+            icons_path = os.path.join(theme_dir, "icons")
+            os.makedirs(icons_path, exist_ok=True)
+            with open(os.path.join(theme_dir, "theme.txt"), "w") as theme_txt:
+                theme_txt.write('desktop-image: "background.png"\n')
+
+            # Every theme gets ubuntu.png so the icon size is taken from it
+            Image.new("RGBA", (icon_size, icon_size), (40, 40, 40, 255)).save(os.path.join(icons_path, "ubuntu.png"))
+
+            # Collisions: half are copies of the bundled icon (similar), half are flat colour (different)
+            for collision_index, icon_file in enumerate(rng.sample(bundled, min(collisions, len(bundled)))):
+                if collision_index % 2 == 0:
+                    with Image.open(os.path.join(icon_dir, icon_file)) as img:
+                        img.convert("RGBA").resize((icon_size, icon_size)).save(os.path.join(icons_path, icon_file))
+                else:
+                    Image.new("RGBA", (icon_size, icon_size), (rng.randrange(256), 0, 0, 255)).save(os.path.join(icons_path, icon_file))
+
+            theme_files.append(f"/ventoy/themes/{name}/theme.txt")
+            icons_paths.append(icons_path)
+    return theme_files, icons_paths
+
+
+# A menu_class list with the given number of key entries (plus some dir entries)
+def make_menu_class(entries, seed=0):
+    rng = random.Random(seed)
+    menu_class = []
+    for index in range(entries):
+        if index % 20 == 0:
+            menu_class.append({"dir": f"/ISO/dir{index}", "class": "folder"})
+        else:
+            menu_class.append({"key": f"{rng.choice(IMAGE_NAMES)[: rng.randrange(3, 12)]}{index}", "class": f"class{index % 50}"})
+    return menu_class
+
+
+# Build a complete volume and write its ventoy.json, returns a description of what was created
+def make_volume(root, images=1000, depth=4, themes=1, resolutions=1, collisions=0, menu_class_entries=0, icon_dir=None, seed=0):
+    image_paths = make_image_tree(root, images, depth, seed=seed)
+    theme_files, icons_paths = make_themes(root, themes, resolutions, collisions=collisions, icon_dir=icon_dir, seed=seed)
+
+    ventoy_json = {"theme": {"file": theme_files}}
+    if menu_class_entries:
+        ventoy_json["menu_class"] = make_menu_class(menu_class_entries, seed)
+    with open(os.path.join(root, "ventoy", "ventoy.json"), "w") as json_file:
+        json.dump(ventoy_json, json_file, indent=4)
+
+    return {
+        "root": root,
+        "images": image_paths,
+        "icons_paths": icons_paths,
+        "ventoy_json": ventoy_json,
+        "first_theme": os.path.basename(os.path.dirname(theme_files[0])) if theme_files else None,
+    }
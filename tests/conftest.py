@@ -0,0 +1,13 @@
+import importlib.util, os
+import pytest
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ventoy-assist.py")
+
+
+# ventoy-assist.py is not a valid module name, import it from its path once per session
+@pytest.fixture(scope="session")
+def ventoy_assist():
+    spec = importlib.util.spec_from_file_location("ventoy_assist", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,17 @@
+def test_sized_cache_evicts_least_recently_used(ventoy_assist):
+    cache = ventoy_assist.SizedCache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+    assert cache.get("b") is None and cache.get("a") == b"1234" and cache.size == 8
+
+
+def test_sized_cache_skips_values_larger_than_it(ventoy_assist):
+    cache = ventoy_assist.SizedCache(4)
+    cache.put("big", b"12345")
+    assert cache.get("big") is None and cache.size == 0
+
+    off = ventoy_assist.SizedCache(0)
+    off.put("icon", b"1")
+    assert off.get("icon") is None
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture
+def drive(tmp_path):
+    images = {
+        "z/copy-of-b.iso": b"b" * 100,
+        "b.iso": b"b" * 100,
+        "deep/dir/a.iso": b"a" * 100,
+        "a.iso": b"a" * 100,
+        "c/big.iso": b"c" * 200,
+        "big.iso": b"c" * 200,
+        "unique.iso": b"u" * 100,
+    }
+    for path, data in images.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_bytes(data)
+    (tmp_path / "ventoy").mkdir()
+    return tmp_path
+
+
+def test_duplicate_groups_are_ordered_by_size_then_kept_path(ventoy_assist, drive):
+    groups = ventoy_assist.find_duplicates(str(drive))
+    assert groups == [
+        {"size": 200, "paths": ["big.iso", "c/big.iso"]},
+        {"size": 100, "paths": ["a.iso", "deep/dir/a.iso"]},
+        {"size": 100, "paths": ["b.iso", "z/copy-of-b.iso"]},
+    ]
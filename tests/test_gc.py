@@ -0,0 +1,111 @@
+import json, os
+import numpy as np
+import pytest
+from PIL import Image
+
+MENU_ALIAS = [
+    {"image": "/ISO/ubuntu.iso", "alias": "Ubuntu"},
+    {"image": "/ISO/gone.iso", "alias": "Gone"},
+    {"image": "/iso/UBUNTU.ISO", "alias": "Other case"},
+    {"image": "/ISO/*.iso", "alias": "Wildcard"},
+    {"dir": "/ISO/Win", "alias": "Windows"},
+    {"dir": "/Gone", "alias": "Gone folder"},
+]
+MENU_CLASS = [
+    {"key": "ubuntu", "class": "ubuntu-alt"},
+    {"key": "arch", "class": "arch"},
+    {"parent": "/ISO/Win", "class": "windows"},
+    {"parent": "/Old", "class": "windows"},
+    {"key": "fedora", "class": "windows"},
+    {"key": "UBUNTU", "class": "ubuntu"},
+]
+
+
+@pytest.fixture
+def drive(tmp_path):
+    (tmp_path / "ISO" / "Win").mkdir(parents=True)
+    (tmp_path / "ISO" / "ubuntu.iso").write_bytes(b"")
+    (tmp_path / "ISO" / "archlinux.iso").write_bytes(b"")
+    icons = tmp_path / "ventoy" / "themes" / "tela" / "icons"
+    icons.mkdir(parents=True)
+    for icon in ("ubuntu", "ubuntu-alt", "debian-alt", "windows"):
+        (icons / f"{icon}.png").write_bytes(b"png")
+    (tmp_path / "ventoy" / "ventoy.json").write_text(json.dumps({"menu_alias": MENU_ALIAS, "menu_class": MENU_CLASS}))
+    (tmp_path / "ventoy" / ".ventoy-assist").mkdir()
+    (tmp_path / "ventoy" / ".ventoy-assist" / "manifest.json").write_text(json.dumps({"menu_class": {"ubuntu": "ubuntu-alt", "arch": "arch"}}))
+    return tmp_path
+
+
+def test_gc_plan(ventoy_assist, drive):
+    plan = ventoy_assist.plan_gc(str(drive))
+    assert plan["ventoy_json"]["menu_alias"] == [MENU_ALIAS[0], MENU_ALIAS[2], MENU_ALIAS[3], MENU_ALIAS[4]]
+    # "fedora" is in no image name any more, keys compare case-folded like the paths
+    assert plan["ventoy_json"]["menu_class"] == [MENU_CLASS[0], MENU_CLASS[2], MENU_CLASS[5]]
+    assert plan["removes"] == [str(drive / "ventoy" / "themes" / "tela" / "icons" / "debian-alt.png")]
+    assert plan["state"] == [("manifest.json", {"menu_class": {"ubuntu": "ubuntu-alt"}})]
+    assert {name: plan["report"].counters[name] for name in ("dead_references", "missing_icons", "unused_alt_icons")} == {"dead_references": 4, "missing_icons": 1, "unused_alt_icons": 1}
+
+
+def test_gc_dry_run_and_apply(ventoy_assist, drive, monkeypatch):
+    monkeypatch.setattr(ventoy_assist, "VOLUME_PROFILES", {})
+    before = sorted(os.path.join(folder, name) for folder, _, files in os.walk(drive) for name in files)
+    ventoy_assist.run_plan(ventoy_assist.plan_gc(str(drive)), True)
+    assert sorted(os.path.join(folder, name) for folder, _, files in os.walk(drive) for name in files) == before
+
+    ventoy_assist.run_plan(ventoy_assist.plan_gc(str(drive)), False)
+    ventoy_json = ventoy_assist.read_ventoy_json(str(drive / "ventoy"))
+    assert len(ventoy_json["menu_alias"]) == 4 and len(ventoy_json["menu_class"]) == 3
+    assert not (drive / "ventoy" / "themes" / "tela" / "icons" / "debian-alt.png").exists()
+    assert ventoy_assist.read_state(str(drive / "ventoy"), "manifest.json") == {"menu_class": {"ubuntu": "ubuntu-alt"}}
+
+    # A second run has nothing left to prune
+    plan = ventoy_assist.plan_gc(str(drive))
+    assert plan["ventoy_json"] == ventoy_json and plan["removes"] == [] and plan["diff"] == {}
+
+
+# Without any icons folder every class counts as missing, so that check is skipped
+def test_gc_keeps_classes_without_icons_folders(ventoy_assist, tmp_path):
+    (tmp_path / "ventoy").mkdir()
+    (tmp_path / "archlinux.iso").write_bytes(b"")
+    (tmp_path / "ventoy" / "ventoy.json").write_text(json.dumps({"menu_class": [{"key": "arch", "class": "arch"}]}))
+    plan = ventoy_assist.plan_gc(str(tmp_path))
+    assert plan["ventoy_json"]["menu_class"] == [{"key": "arch", "class": "arch"}]
+    assert plan["diff"] == {}
+
+
+def save_png(path, seed, size):
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 4), dtype=np.uint8)
+    Image.fromarray(pixels, "RGBA").save(path)
+
+
+# The theme has its own debian.png and fedora.png, so the pack's go to '-alt' icons; only debian has an image
+def test_apply_gc_apply_leaves_nothing_to_do(ventoy_assist, tmp_path, monkeypatch):
+    monkeypatch.setattr(ventoy_assist, "VOLUME_PROFILES", {})
+    root = tmp_path / "drive"
+    icons = root / "ventoy" / "themes" / "tela_1920x1080" / "icons"
+    icons.mkdir(parents=True)
+    (icons.parent / "theme.txt").write_text("")
+    save_png(icons / "debian.png", 100, 32)
+    save_png(icons / "fedora.png", 101, 32)
+    (root / "ventoy" / "ventoy.json").write_text(json.dumps({"theme": {"file": "/ventoy/themes/tela_1920x1080/theme.txt"}}))
+    (root / "ISO").mkdir()
+    for name in ("ubuntu-24.04-desktop-amd64.iso", "debian-12.5.0-amd64-netinst.iso"):
+        (root / "ISO" / name).write_bytes(b"")
+    pack = tmp_path / "pack"
+    pack.mkdir()
+    for seed, icon in enumerate(("arch", "debian", "fedora", "ubuntu")):
+        save_png(pack / f"{icon}.png", seed, 64)
+
+    def apply():
+        return ventoy_assist.plan_apply_icons(str(root), "tela_1920x1080", False, False, False, str(pack), detect_contents=False)
+
+    plan = apply()
+    assert sorted(os.path.basename(path) for path, _ in plan["writes"]) == ["arch.png", "debian-alt.png", "ubuntu.png"]
+    ventoy_assist.execute_plan(plan)
+
+    gc = ventoy_assist.plan_gc(str(root))
+    assert gc["removes"] == [] and gc["diff"] == {}
+
+    plan = apply()
+    assert plan["writes"] == [] and plan["removes"] == []
+    assert plan["ventoy_json"] == plan["original_json"]
@@ -0,0 +1,83 @@
+import io, os, tarfile, threading, time, zipfile
+import pytest
+
+ICONS = {"icons/ubuntu.png": b"ubuntu png", "icons/linux/debian.png": b"debian png", "__MACOSX/icons/._ubuntu.png": b"resource fork", "icons/readme.txt": b"text"}
+
+
+def build_zip(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def build_tar(path, members):
+    with tarfile.open(path, "w") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def no_open_packs(ventoy_assist):
+    ventoy_assist.ICON_PACKS.clear()
+    yield
+    ventoy_assist.ICON_PACKS.clear()
+
+
+# Only PNG files count, by file name wherever they sit in the archive
+@pytest.mark.parametrize("build", [build_zip, build_tar])
+def test_archive_packs(ventoy_assist, tmp_path, build):
+    pack = ventoy_assist.open_icon_pack(build(tmp_path / ("pack.zip" if build is build_zip else "pack.tar"), ICONS))
+    assert pack.names() == ["debian.png", "ubuntu.png"]
+    assert pack.read("debian.png") == b"debian png"
+    assert pack.cache.get("debian.png") == b"debian png"
+
+
+def test_folder_pack(ventoy_assist, tmp_path):
+    (tmp_path / "ubuntu.png").write_bytes(b"ubuntu png")
+    (tmp_path / "notes.txt").write_bytes(b"text")
+    pack = ventoy_assist.open_icon_pack(str(tmp_path))
+    assert pack.names() == ["ubuntu.png"] and pack.read("ubuntu.png") == b"ubuntu png"
+
+
+def test_pack_is_opened_again_only_when_it_changed(ventoy_assist, tmp_path):
+    path = build_zip(tmp_path / "pack.zip", ICONS)
+    pack = ventoy_assist.open_icon_pack(path)
+    assert ventoy_assist.open_icon_pack(path) is pack
+
+    build_zip(path, {**ICONS, "icons/arch.png": b"arch png"})
+    os.utime(path, ns=(pack.stamp + 10**9, pack.stamp + 10**9))
+    reopened = ventoy_assist.open_icon_pack(path)
+    assert reopened is not pack and "arch.png" in reopened.names()
+
+
+@pytest.mark.parametrize("name", ["broken.zip", "broken.tar", "missing.zip"])
+def test_bad_packs_raise_value_error(ventoy_assist, tmp_path, name):
+    if name != "missing.zip":
+        (tmp_path / name).write_bytes(b"not an archive" * 100)
+    with pytest.raises(ValueError, match=name):
+        ventoy_assist.open_icon_pack(str(tmp_path / name))
+
+
+# Jobs of the job server asking for the same pack at once share one opened pack
+def test_pack_is_opened_once_by_concurrent_callers(ventoy_assist, tmp_path, monkeypatch):
+    path = build_zip(tmp_path / "pack.zip", ICONS)
+    opened = []
+    real_icon_pack = ventoy_assist.IconPack
+
+    def slow_icon_pack(path):
+        time.sleep(0.05)
+        opened.append(path)
+        return real_icon_pack(path)
+
+    monkeypatch.setattr(ventoy_assist, "IconPack", slow_icon_pack)
+    packs = []
+    threads = [threading.Thread(target=lambda: packs.append(ventoy_assist.open_icon_pack(path))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert opened == [path] and len(packs) == 4 and all(pack is packs[0] for pack in packs)
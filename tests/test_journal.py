@@ -0,0 +1,139 @@
+import json, os
+import numpy as np
+import pytest
+from PIL import Image
+
+ICONS = ["arch", "debian", "fedora", "gparted", "kali", "manjaro", "mint", "opensuse", "popos", "ubuntu", "windows", "zorin"]
+
+
+def save_png(path, seed, size=32):
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 4), dtype=np.uint8)
+    Image.fromarray(pixels, "RGBA").save(path)
+
+
+# A drive with one theme whose icons folder already has debian.png and debian-alt.png, and a pack of
+# 12 icons; debian.png differs from the pack's, so the new one goes to debian-alt.png over the old one
+@pytest.fixture
+def drive(tmp_path):
+    root = tmp_path / "drive"
+    theme = root / "ventoy" / "themes" / "tela_1920x1080"
+    (theme / "icons").mkdir(parents=True)
+    (theme / "theme.txt").write_text("")
+    save_png(theme / "icons" / "debian.png", 100)
+    save_png(theme / "icons" / "debian-alt.png", 101)
+    (root / "ventoy" / "ventoy.json").write_text(json.dumps({"theme": {"file": "/ventoy/themes/tela_1920x1080/theme.txt"}}))
+    (root / "ISO").mkdir()
+    for name in ("ubuntu-24.04-desktop-amd64.iso", "debian-12.5.0-amd64-netinst.iso"):
+        (root / "ISO" / name).write_bytes(b"")
+    pack = tmp_path / "pack"
+    pack.mkdir()
+    for seed, icon in enumerate(ICONS):
+        save_png(pack / f"{icon}.png", seed, 64)
+    return root, pack
+
+
+def plan_apply(ventoy_assist, root, pack):
+    return ventoy_assist.plan_apply_icons(str(root), "tela_1920x1080", False, False, False, str(pack), detect_contents=False)
+
+
+def snapshot(root):
+    return {os.path.relpath(os.path.join(folder, name), root): open(os.path.join(folder, name), "rb").read() for folder, _, files in os.walk(root) for name in files if ".ventoy-assist" not in folder}
+
+
+# Run the journal and the first writes of a plan, then stop as if the drive was pulled
+def interrupt(ventoy_assist, plan, finished):
+    journal = ventoy_assist.Journal.begin(plan)
+    writes = sorted(plan["writes"], key=lambda write: write[0])[:finished]
+    ventoy_assist.write_plan_files(writes, [], None, journal.mark)
+    journal.log.close()
+    return writes
+
+
+def test_journal_records_icons_by_source(ventoy_assist, drive):
+    root, pack = drive
+    plan = plan_apply(ventoy_assist, root, pack)
+    assert len(plan["writes"]) == 12
+    interrupt(ventoy_assist, plan, 0)
+    ventoy_dir = str(root / "ventoy")
+    header = ventoy_assist.read_journal(ventoy_dir)
+    assert all("source" in step and "data" not in step for step in header["steps"])
+    # Only the overwritten debian-alt.png is kept, as a backup
+    assert os.path.getsize(ventoy_assist.state_path(ventoy_dir, "journal.data")) == os.path.getsize(root / "ventoy" / "themes" / "tela_1920x1080" / "icons" / "debian-alt.png")
+
+
+def test_resume_finishes_only_the_unfinished_files(ventoy_assist, drive):
+    root, pack = drive
+    plan = plan_apply(ventoy_assist, root, pack)
+    planned = {path: ventoy_assist.plan_bytes(data) for path, data in plan["writes"]}
+    finished = interrupt(ventoy_assist, plan, 4)
+
+    resume = ventoy_assist.plan_resume(str(root))
+    assert resume["report"].counters["steps_skipped"] == 4
+    assert sorted(path for path, _ in resume["writes"]) == sorted(set(planned) - {path for path, _ in finished})
+    assert resume["warnings"] == []
+    ventoy_assist.execute_plan(resume)
+
+    for path, data in planned.items():
+        assert open(path, "rb").read() == data
+    assert ventoy_assist.read_ventoy_json(str(root / "ventoy")) == plan["ventoy_json"]
+    assert ventoy_assist.read_journal(str(root / "ventoy")) is None
+
+
+def test_resume_skips_icons_whose_pack_changed(ventoy_assist, drive):
+    root, pack = drive
+    plan = plan_apply(ventoy_assist, root, pack)
+    interrupt(ventoy_assist, plan, 4)
+    for icon in ICONS:
+        save_png(pack / f"{icon}.png", 1000, 64)
+    ventoy_assist.ICON_PACKS.clear()
+
+    resume = ventoy_assist.plan_resume(str(root))
+    assert resume["writes"] == []
+    assert len(resume["warnings"]) == 8
+
+
+def test_rollback_restores_the_drive(ventoy_assist, drive):
+    root, pack = drive
+    before = snapshot(root)
+    plan = plan_apply(ventoy_assist, root, pack)
+    interrupt(ventoy_assist, plan, 6)
+    assert snapshot(root) != before
+
+    assert ventoy_assist.rollback_journal(str(root)) == []
+    after = snapshot(root)
+    # ventoy.json is written back in the app's own format
+    assert json.loads(after.pop(os.path.join("ventoy", "ventoy.json"))) == json.loads(before.pop(os.path.join("ventoy", "ventoy.json")))
+    assert after == before
+    assert ventoy_assist.read_journal(str(root / "ventoy")) is None
+
+
+def test_journal_marks_every_finished_file(ventoy_assist, drive, monkeypatch):
+    root, pack = drive
+    plan = plan_apply(ventoy_assist, root, pack)
+    syncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(ventoy_assist.os, "fsync", lambda fd: syncs.append(fd) or real_fsync(fd))
+    interrupt(ventoy_assist, plan, 12)
+    header = ventoy_assist.read_journal(str(root / "ventoy"))
+    assert len(header["done"]) == 12
+    # The data file once, then the log every JOURNAL_SYNC_OPERATIONS files
+    assert len(syncs) == 1 + 12 // ventoy_assist.JOURNAL_SYNC_OPERATIONS
+
+
+def test_estimate_counts_the_journal(ventoy_assist, drive):
+    root, pack = drive
+    plan = plan_apply(ventoy_assist, root, pack)
+    estimate = ventoy_assist.estimate_plan(plan)
+    backup = os.path.getsize(root / "ventoy" / "themes" / "tela_1920x1080" / "icons" / "debian-alt.png")
+    assert backup < estimate["journal_bytes"] < 64 * 1024
+    assert estimate["bytes"] > estimate["journal_bytes"] + sum(len(data) for _, data in plan["writes"])
+
+
+@pytest.mark.parametrize("mode", [None, "tint", "hue", "luminance"])
+def test_icons_build_again_to_the_same_bytes(ventoy_assist, drive, tmp_path, mode):
+    _, pack = drive
+    (tmp_path / "icons").mkdir()
+    recolor = (mode, ((20, 30, 40), (200, 120, 60)), 0.7) if mode else None
+    _, steps, _ = ventoy_assist.plan_icon_copies(str(pack), [str(tmp_path / "icons")], (48, 48), recolor=recolor)
+    for step in steps:
+        assert ventoy_assist.build_icon_png(json.loads(json.dumps(step["source"]))) == ventoy_assist.plan_bytes(step["write"][1])
@@ -0,0 +1,133 @@
+import os
+import pytest
+
+SECTOR = 2048
+
+
+def text(value, size):
+    return value.encode("ascii").ljust(size, b" ")
+
+
+def dstring(value, size, utf16=False):
+    data = b"\x10" + value.encode("utf-16-be") if utf16 else b"\x08" + value.encode("latin-1")
+    return data.ljust(size - 1, b"\x00") + bytes([len(data)])
+
+
+def iso9660_sectors(volume="", system="LINUX", publisher="", bootable=False):
+    primary = bytearray(SECTOR)
+    primary[0:6] = b"\x01CD001"
+    primary[8:40] = text(system, 32)
+    primary[40:72] = text(volume, 32)
+    primary[318:446] = text(publisher, 128)
+    sectors = [bytes(primary)]
+    if bootable:
+        boot = bytearray(SECTOR)
+        boot[0:6] = b"\x00CD001"
+        boot[7:30] = b"EL TORITO SPECIFICATION"
+        sectors.append(bytes(boot))
+    sectors.append(b"\xffCD001".ljust(SECTOR, b"\x00"))
+    return sectors
+
+
+# An image with the given descriptors from sector 16 on, plus an optional UDF anchor and main
+# volume descriptor sequence (primary volume, logical volume, terminator) at sector 32
+def write_image(path, sectors, udf=None):
+    image = bytearray(40 * SECTOR if udf is None else 257 * SECTOR)
+    for index, sector in enumerate(sectors):
+        image[(16 + index) * SECTOR : (17 + index) * SECTOR] = sector
+    if udf is not None:
+        volume, logical_volume = udf
+        anchor = 256 * SECTOR
+        image[anchor : anchor + 2] = (2).to_bytes(2, "little")
+        image[anchor + 16 : anchor + 20] = (3 * SECTOR).to_bytes(4, "little")
+        image[anchor + 20 : anchor + 24] = (32).to_bytes(4, "little")
+        image[32 * SECTOR : 32 * SECTOR + 2] = (1).to_bytes(2, "little")
+        image[32 * SECTOR + 24 : 32 * SECTOR + 56] = dstring(volume, 32)
+        image[33 * SECTOR : 33 * SECTOR + 2] = (6).to_bytes(2, "little")
+        image[33 * SECTOR + 84 : 33 * SECTOR + 212] = dstring(logical_volume, 128, utf16=True)
+        image[34 * SECTOR : 34 * SECTOR + 2] = (8).to_bytes(2, "little")
+    path.write_bytes(bytes(image))
+    return str(path)
+
+
+def udf_sectors():
+    return [b"\x00BEA01\x01".ljust(SECTOR, b"\x00"), b"\x00NSR02\x01".ljust(SECTOR, b"\x00"), b"\x00TEA01\x01".ljust(SECTOR, b"\x00")]
+
+
+def test_iso9660_labels(ventoy_assist, tmp_path):
+    path = write_image(tmp_path / "a.iso", iso9660_sectors("Ubuntu 24.04 LTS amd64", publisher="Canonical", bootable=True))
+    assert ventoy_assist.read_image_labels(path) == {"volume": "Ubuntu 24.04 LTS amd64", "system": "LINUX", "publisher": "Canonical", "bootable": True}
+
+
+# Windows images carry a blank or generic ISO9660 label, the real one is in the UDF descriptors
+def test_udf_labels(ventoy_assist, tmp_path):
+    path = write_image(tmp_path / "win.iso", iso9660_sectors("", system="") + udf_sectors(), udf=("CCCOMA_X64FRE_EN-US_DV9", "Win11 Pro"))
+    labels = ventoy_assist.read_image_labels(path)
+    assert labels["volume"] == "CCCOMA_X64FRE_EN-US_DV9"
+    assert labels["logical_volume"] == "Win11 Pro"
+
+
+def test_not_an_image(ventoy_assist, tmp_path):
+    (tmp_path / "random.iso").write_bytes(os.urandom(40 * SECTOR))
+    (tmp_path / "tiny.iso").write_bytes(b"\x00" * 100)
+    assert ventoy_assist.read_image_labels(str(tmp_path / "random.iso")) is None
+    assert ventoy_assist.read_image_labels(str(tmp_path / "tiny.iso")) is None
+    assert ventoy_assist.read_image_labels(write_image(tmp_path / "blank.iso", iso9660_sectors(""))) is None
+
+
+def test_decode_dstring(ventoy_assist):
+    assert ventoy_assist.decode_dstring(dstring("LABEL", 32)) == "LABEL"
+    assert ventoy_assist.decode_dstring(dstring("Ünïcode", 32, utf16=True)) == "Ünïcode"
+    assert ventoy_assist.decode_dstring(bytes(32)) == ""
+
+
+@pytest.mark.parametrize(
+    "labels, expected",
+    [
+        ({"volume": "PeppermintOS"}, None),
+        ({"volume": "Mint 21.3 Cinnamon"}, "mint"),
+        ({"volume": "Ubuntu-Server 24.04"}, "ubuntu"),
+        ({"volume": "kali-linux"}, "kali-linux"),
+        ({"volume": "CCCOMA_X64FRE_EN-US_DV9"}, "windows"),
+        ({"volume": "DATA", "publisher": "Microsoft Corporation"}, "windows"),
+        ({"volume": "DATA"}, None),
+    ],
+)
+def test_classify_labels(ventoy_assist, labels, expected):
+    assert ventoy_assist.classify_labels(labels, ["mint", "ubuntu", "kali", "kali-linux", "linux", "windows"]) == expected
+
+
+# A renamed image gets an entry with its full file name, an image named after its contents does not. A label
+# only overrules a file name class it extends, not a different one or a short form of it
+def test_content_matches(ventoy_assist):
+    files = ["install.iso", "ubuntu-24.04.iso", "ubuntu-custom.iso", "ubuntu-mint.iso", "archlinux-2024.05.01-x86_64.iso", "EndeavourOS_Gemini-2024.04.20.iso"]
+    labels_by_file = {
+        0: {"volume": "Ubuntu 24.04"},
+        1: {"volume": "Ubuntu 24.04"},
+        2: {"volume": "Ubuntu-MATE 24.04"},
+        3: {"volume": "Linux Mint 21"},
+        4: {"volume": "ARCH_202405"},
+        5: {"volume": "EOS_202404"},
+    }
+    icon_map = {"ubuntu": "ubuntu", "ubuntu-mate": "ubuntu-mate", "mint": "mint", "arch": "arch", "archlinux": "archlinux", "eos": "eos", "endeavouros": "endeavouros"}
+    assert sorted(ventoy_assist.get_content_matches(files, labels_by_file, icon_map)) == [("install.iso", "ubuntu"), ("ubuntu-custom.iso", "ubuntu-mate")]
+
+
+def test_labels_are_cached_by_size_and_mtime(ventoy_assist, tmp_path, monkeypatch):
+    write_image(tmp_path / "a.iso", iso9660_sectors("Ubuntu 24.04"))
+    write_image(tmp_path / "b.iso", iso9660_sectors("Debian 12"))
+    store = ventoy_assist.PathStore.scan(str(tmp_path), ventoy_assist.IMAGE_EXTENSIONS)
+    labels, cache = ventoy_assist.detect_image_labels(store, {})
+    assert sorted(labels_by_file["volume"] for labels_by_file in labels.values()) == ["Debian 12", "Ubuntu 24.04"]
+
+    reads = []
+    real_read = ventoy_assist.read_image_labels
+    monkeypatch.setattr(ventoy_assist, "read_image_labels", lambda path: reads.append(path) or real_read(path))
+    again, unchanged = ventoy_assist.detect_image_labels(store, cache)
+    assert again == labels and unchanged is None and reads == []
+
+    write_image(tmp_path / "b.iso", iso9660_sectors("Fedora 40"))
+    os.utime(tmp_path / "b.iso", ns=(0, 10**18))
+    changed, cache = ventoy_assist.detect_image_labels(store, cache)
+    assert reads == [str(tmp_path / "b.iso")]
+    assert sorted(labels_by_file["volume"] for labels_by_file in changed.values()) == ["Fedora 40", "Ubuntu 24.04"]
@@ -0,0 +1,84 @@
+import random
+import pytest
+
+ICON_MAP = {name: name for name in ("win", "windows", "windows10", "ubuntu", "kubuntu", "xubuntu", "linux", "arch", "debian", "mint", "kali", "Win")}
+ICON_MAP["windows"] = "windows-alt"
+WORDS = list(ICON_MAP) + ["x", "iso", "foo", "Ubuntu", "LINUX", "Arch"]
+FOLDERS = ["", "/A", "/A/B", "/B", "/Ab", "/A/Bc", "/A-b", "/A/B/C"]
+
+
+# Class Ventoy gives an image: the first "key" contained in the file name, then a "parent" entry, which
+# Ventoy matches either as the exact folder or as a path prefix
+def ventoy_class(menu_class, image_path, parent_prefix):
+    name = image_path.rsplit("/", 1)[-1]
+    for entry in menu_class:
+        if "key" in entry and entry["key"] in name:
+            return entry["class"]
+    for entry in menu_class:
+        if "parent" in entry:
+            folder = entry["parent"]
+            if image_path.startswith(folder + "/") if parent_prefix else image_path.rsplit("/", 1)[0] == folder:
+                return entry["class"]
+    return None
+
+
+def matching_tools(ventoy_assist, image_paths):
+    return ventoy_assist.get_matching_tools([path.rsplit("/", 1)[-1] for path in image_paths], ICON_MAP)
+
+
+def random_volume(rng):
+    image_paths = {rng.choice(FOLDERS) + "/" + "".join(rng.choice(WORDS) + rng.choice(["", "_", "-", "1"]) for _ in range(rng.randint(1, 3))) + ".iso" for _ in range(rng.randint(1, 16))}
+    return sorted(image_paths)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_minimal_menu_class_keeps_every_class(ventoy_assist, seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        image_paths = random_volume(rng)
+        tools = matching_tools(ventoy_assist, image_paths)
+        fixed = [(rng.choice(WORDS)[: rng.randint(1, 4)], "hand")] if rng.random() < 0.3 else []
+        hand_written = [ventoy_assist.menu_class_entry(key, class_string) for key, class_string in fixed]
+
+        full = ventoy_assist.merge_menu_class(hand_written, [tool for tool in tools if tool[0] not in dict(fixed)])
+        minimal = ventoy_assist.merge_menu_class(hand_written, ventoy_assist.minimal_menu_class(image_paths, tools, fixed))
+        assert len(minimal) <= len(full)
+        for image_path in image_paths:
+            expected = ventoy_class(full, image_path, True)
+            assert ventoy_class(minimal, image_path, True) == expected, (image_path, full, minimal)
+            assert ventoy_class(minimal, image_path, False) == expected, (image_path, full, minimal)
+
+
+def test_minimal_menu_class_is_stable(ventoy_assist):
+    rng = random.Random(10)
+    for _ in range(200):
+        image_paths = random_volume(rng)
+        tools = matching_tools(ventoy_assist, image_paths)
+        shuffled = list(reversed(image_paths))
+        assert ventoy_assist.minimal_menu_class(image_paths, tools) == ventoy_assist.minimal_menu_class(shuffled, list(reversed(tools)))
+
+
+def test_minimal_menu_class_collapses_uniform_folder(ventoy_assist):
+    image_paths = ["/ISO/Windows/windows10_x64.iso", "/ISO/Windows/Win11_23H2.iso", "/ISO/Windows/win-server.iso", "/ISO/ubuntu.iso"]
+    generated = ventoy_assist.minimal_menu_class(image_paths, matching_tools(ventoy_assist, image_paths))
+    assert ("parent:/ISO/Windows", "win") not in generated  # windows10 has its own class
+    image_paths = ["/ISO/Ubuntu/ubuntu-22.iso", "/ISO/Ubuntu/xubuntu-20.iso", "/ISO/Ubuntu/kubuntu-18.iso", "/ISO/arch.iso"]
+    tools = [(key, "ubuntu") if "ubuntu" in key else (key, class_string) for key, class_string in matching_tools(ventoy_assist, image_paths)]
+    assert ventoy_assist.minimal_menu_class(image_paths, tools) == [("arch", "arch"), ("parent:/ISO/Ubuntu", "ubuntu")]
+
+
+def test_reconcile_keeps_hand_written_entries(ventoy_assist):
+    menu_class = [{"key": "ubuntu", "class": "my-ubuntu"}, {"key": "arch", "class": "arch"}, {"key": "gone", "class": "gone"}]
+    manifest = {"arch": "arch", "gone": "gone"}
+    new_menu_class, new_manifest = ventoy_assist.reconcile_menu_class(menu_class, [("ubuntu", "ubuntu"), ("arch", "arch"), ("debian", "debian")], manifest)
+    assert {"key": "ubuntu", "class": "my-ubuntu"} in new_menu_class
+    assert {"key": "gone", "class": "gone"} not in new_menu_class
+    assert {"key": "debian", "class": "debian"} in new_menu_class
+    assert new_manifest == {"arch": "arch", "debian": "debian"}
+
+
+def test_reconcile_adopts_matching_entries_without_manifest(ventoy_assist):
+    menu_class = [{"key": "arch", "class": "arch"}, {"key": "debian", "class": "mine"}]
+    new_menu_class, new_manifest = ventoy_assist.reconcile_menu_class(menu_class, [("arch", "arch"), ("debian", "debian")], None)
+    assert new_menu_class == [{"key": "debian", "class": "mine"}, {"key": "arch", "class": "arch"}]
+    assert new_manifest == {"arch": "arch"}
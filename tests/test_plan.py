@@ -0,0 +1,40 @@
+import json, os
+import pytest
+
+
+@pytest.fixture
+def drive(tmp_path):
+    (tmp_path / "ventoy").mkdir()
+    (tmp_path / "ventoy" / "ventoy.json").write_text(json.dumps({"menu_alias": []}))
+    (tmp_path / "ISO").mkdir()
+    (tmp_path / "ISO" / "ubuntu-24.04-desktop-amd64.iso").write_bytes(b"")
+    return tmp_path
+
+
+def listing(root):
+    return sorted(os.path.join(folder, name) for folder, dirs, files in os.walk(root) for name in dirs + files)
+
+
+# A dry run must leave the drive alone, probing it would write test files
+def test_dry_run_does_not_probe_the_drive(ventoy_assist, drive, monkeypatch):
+    monkeypatch.setattr(ventoy_assist, "VOLUME_PROFILES", {})
+    before = listing(drive)
+    plan = ventoy_assist.plan_rename(str(drive), [("ISO/ubuntu-24.04-desktop-amd64.iso", "Ubuntu")])
+    output, _ = ventoy_assist.run_plan(plan, True)
+    assert listing(drive) == before
+    assert ventoy_assist.VOLUME_PROFILES == {}
+    assert plan["estimate"]["seconds"] is None
+    assert "write time unknown" in output
+
+
+def test_dry_run_uses_the_saved_profile(ventoy_assist, drive, monkeypatch):
+    monkeypatch.setattr(ventoy_assist, "VOLUME_PROFILES", {})
+    profile = {"latency": 0.01, "small_throughput": 1024 * 1024, "sequential_throughput": 10 * 1024 * 1024}
+    ventoy_assist.write_state(str(drive / "ventoy"), "volume.json", profile)
+    before = listing(drive)
+    plan = ventoy_assist.plan_rename(str(drive), [("ISO/ubuntu-24.04-desktop-amd64.iso", "Ubuntu")])
+    ventoy_assist.run_plan(plan, True)
+    assert listing(drive) == before
+    assert plan["estimate"]["profile"] == profile
+    assert plan["estimate"]["seconds"] > 0
+    assert plan["estimate"]["schedule"] == ventoy_assist.io_schedule(profile)
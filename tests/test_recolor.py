@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+PALETTE = ((20, 30, 40), (200, 100, 50))
+
+
+# One 2x2 icon: black, white, mid gray and a muted red, with an alpha of its own on every pixel
+def icon_stack():
+    pixels = np.array([[[0, 0, 0, 255], [255, 255, 255, 200]], [[128, 128, 128, 100], [180, 60, 60, 50]]], dtype=np.uint8)
+    return pixels[None]
+
+
+def hue(color):
+    r, g, b = (float(c) for c in color[:3])
+    return np.arctan2(np.sqrt(3) * (g - b), 2 * r - g - b)
+
+
+def test_tint_colors_the_luminance_with_the_accent(ventoy_assist):
+    result = ventoy_assist.recolor_icons(icon_stack(), "tint", PALETTE)
+    assert result[0, 0, 0, :3].tolist() == [0, 0, 0]
+    # Mid gray keeps its luminance and takes the accent's color
+    gray = result[0, 1, 0, :3].astype(float)
+    assert abs(gray @ [0.299, 0.587, 0.114] - 128) < 2
+    assert np.allclose(gray / gray.max(), np.array(PALETTE[1]) / max(PALETTE[1]), atol=0.02)
+
+
+def test_luminance_maps_dark_to_the_background_and_light_to_the_accent(ventoy_assist):
+    result = ventoy_assist.recolor_icons(icon_stack(), "luminance", PALETTE)
+    assert result[0, 0, 0, :3].tolist() == list(PALETTE[0])
+    assert result[0, 0, 1, :3].tolist() == list(PALETTE[1])
+
+
+def test_hue_rotates_the_main_hue_onto_the_accent(ventoy_assist):
+    result = ventoy_assist.recolor_icons(icon_stack(), "hue", PALETTE)
+    assert abs(hue(result[0, 1, 1]) - hue(PALETTE[1])) < 0.02
+    # Grays sit on the rotation axis
+    assert result[0, 0, 1, :3].tolist() == [255, 255, 255] and result[0, 1, 0, :3].tolist() == [128, 128, 128]
+
+
+@pytest.mark.parametrize("mode", ["tint", "hue", "luminance"])
+def test_recolor_keeps_alpha_and_scales_with_strength(ventoy_assist, mode):
+    stack = icon_stack()
+    assert np.array_equal(ventoy_assist.recolor_icons(stack, mode, PALETTE)[..., 3], stack[..., 3])
+    assert np.array_equal(ventoy_assist.recolor_icons(stack, mode, PALETTE, strength=0), stack)
+    full = ventoy_assist.recolor_icons(stack, mode, PALETTE).astype(int)
+    half = ventoy_assist.recolor_icons(stack, mode, PALETTE, strength=0.5).astype(int)
+    assert np.abs(half - (stack.astype(int) + full) / 2).max() <= 1
+
+
+def test_unknown_recolor_mode(ventoy_assist):
+    with pytest.raises(ValueError):
+        ventoy_assist.recolor_icons(icon_stack(), "sepia", PALETTE)
+
+
+def test_sample_theme_palette(ventoy_assist, tmp_path):
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    image[:16, :16] = (255, 0, 0)  # A saturated spot on black, 6% of the image
+    (tmp_path / "theme").mkdir()
+    Image.fromarray(image).save(tmp_path / "theme" / "background.png")
+    (tmp_path / "theme" / "theme.txt").write_text('desktop-image: "missing.png"\n')
+    background, accent = ventoy_assist.sample_theme_palette(str(tmp_path / "theme"))
+    assert max(background) < 20 and accent[0] > 200 and accent[1] < 50
+
+    # A theme folder that is gone has no palette
+    assert ventoy_assist.sample_theme_palette(str(tmp_path / "gone")) is None
@@ -0,0 +1,77 @@
+import json, os
+import pytest
+
+
+def write(path, data, mtime_ns=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+# A curated source drive with a generated and a hand-written menu_class entry, and a target that has an
+# entry of its own, a stale copy of the source's generated one and an older theme
+@pytest.fixture
+def drives(tmp_path, monkeypatch, ventoy_assist):
+    monkeypatch.setattr(ventoy_assist, "VOLUME_PROFILES", {})
+    source, target = tmp_path / "source", tmp_path / "target"
+    write(source / "ISO" / "ubuntu.iso", b"ubuntu", 10**18)
+    write(source / "ISO" / "debian.iso", b"debian", 10**18)
+    write(source / "ventoy" / "ventoy.json", json.dumps({
+        "theme": {"file": "/ventoy/themes/new/theme.txt"},
+        "menu_class": [{"key": "ubuntu", "class": "ubuntu-alt"}, {"key": "debian", "class": "my-debian"}],
+        "menu_alias": [{"image": "/ISO/ubuntu.iso", "alias": "Ubuntu"}],
+    }).encode())
+    write(source / "ventoy" / ".ventoy-assist" / "manifest.json", json.dumps({"menu_class": {"ubuntu": "ubuntu-alt"}}).encode())
+    write(source / "$RECYCLE.BIN" / "old.iso", b"deleted")
+
+    write(target / "ISO" / "debian.iso", b"debian", 10**18 + 10**9)  # Within the FAT mtime step
+    write(target / "ISO" / "ubuntu.iso", b"ubuntX", 10**18)  # Same size, other bytes
+    write(target / "ISO" / "arch.iso", b"arch")
+    write(target / "ventoy" / "ventoy.json", json.dumps({
+        "theme": {"file": "/ventoy/themes/old/theme.txt"},
+        "menu_class": [{"key": "arch", "class": "arch"}, {"key": "ubuntu", "class": "ubuntu"}, {"key": "debian", "class": "debian"}],
+    }).encode())
+    write(target / "ventoy" / ".ventoy-assist" / "manifest.json", json.dumps({"menu_class": {"arch": "arch", "ubuntu": "ubuntu", "debian": "debian"}, "other": 1}).encode())
+    return source, target
+
+
+def test_diff_layout(ventoy_assist, drives):
+    source, target = drives
+    # ventoy.json is merged, not copied, and skipped folders are never looked at
+    assert ventoy_assist.diff_layout(str(source), str(target)) == []
+    assert ventoy_assist.diff_layout(str(source), str(target), use_hash=True) == [(os.path.join("ISO", "ubuntu.iso"), 6)]
+
+    os.utime(source / "ISO" / "debian.iso", ns=(10**18 + 4 * 10**9,) * 2)
+    (target / "ISO" / "ubuntu.iso").unlink()
+    assert sorted(ventoy_assist.diff_layout(str(source), str(target))) == [(os.path.join("ISO", "debian.iso"), 6), (os.path.join("ISO", "ubuntu.iso"), 6)]
+
+
+def test_merge_ventoy_json(ventoy_assist):
+    target_json = {"control": [{"VTOY_DEFAULT_MENU_MODE": "1"}], "menu_alias": [{"image": "/a.iso", "alias": "A"}, {"image": "/b.iso", "alias": "Old B"}]}
+    source_json = {"control": [{"VTOY_MENU_TIMEOUT": "10"}], "menu_alias": [{"image": "/b.iso", "alias": "B"}]}
+    merged = ventoy_assist.merge_ventoy_json(target_json, source_json)
+    assert merged["control"] == [{"VTOY_DEFAULT_MENU_MODE": "1"}, {"VTOY_MENU_TIMEOUT": "10"}]
+    assert merged["menu_alias"] == [{"image": "/a.iso", "alias": "A"}, {"image": "/b.iso", "alias": "B"}]
+
+
+def test_replicate_merges_ventoy_json_and_manifest(ventoy_assist, drives):
+    source, target = drives
+    (result,) = ventoy_assist.replicate(str(source), [str(target)], use_hash=True)
+    assert result["files"] == [os.path.join("ISO", "ubuntu.iso")] and result["copied"] == 1 and result["errors"] == []
+    assert (target / "ISO" / "ubuntu.iso").read_bytes() == b"ubuntu"
+    assert not (target / "$RECYCLE.BIN").exists()
+
+    merged = ventoy_assist.read_ventoy_json(str(target / "ventoy"))
+    assert merged["theme"] == {"file": "/ventoy/themes/new/theme.txt"}
+    assert merged["menu_class"] == [{"key": "debian", "class": "my-debian"}, {"key": "ubuntu", "class": "ubuntu-alt"}, {"key": "arch", "class": "arch"}]
+    # The source's hand-written debian entry replaced the target's generated one, so the target no longer owns it
+    assert ventoy_assist.read_state(str(target / "ventoy"), "manifest.json") == {"menu_class": {"arch": "arch", "ubuntu": "ubuntu-alt"}, "other": 1}
+
+
+def test_replicate_dry_run_changes_nothing(ventoy_assist, drives):
+    source, target = drives
+    before = {os.path.join(folder, name): open(os.path.join(folder, name), "rb").read() for folder, _, files in os.walk(target) for name in files}
+    (result,) = ventoy_assist.replicate(str(source), [str(target)], use_hash=True, dry_run=True)
+    assert result["files"] == [os.path.join("ISO", "ubuntu.iso")] and result["bytes"] == 6 and result["copied"] == 0
+    assert {os.path.join(folder, name): open(os.path.join(folder, name), "rb").read() for folder, _, files in os.walk(target) for name in files} == before
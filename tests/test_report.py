@@ -0,0 +1,52 @@
+import threading, time
+
+
+def test_stage_counts_parallel_threads_once(ventoy_assist):
+    report = ventoy_assist.RunReport("test")
+    barrier = threading.Barrier(4)
+
+    def work():
+        barrier.wait()
+        with report.stage("resize"):
+            time.sleep(0.2)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 0.2 <= report.stages["resize"] < 0.4
+
+
+def test_repeated_stages_add_up(ventoy_assist):
+    report = ventoy_assist.RunReport("test")
+    for _ in range(2):
+        with report.stage("scan"):
+            time.sleep(0.05)
+    assert 0.1 <= report.stages["scan"] < 0.2
+
+
+def test_profiler_writes_its_files(ventoy_assist, tmp_path):
+    import json, pstats
+
+    (tmp_path / "ventoy").mkdir()
+    (tmp_path / "ventoy" / "ventoy.json").write_text(json.dumps({"menu_alias": [{"image": "/gone.iso", "alias": "Gone"}]}))
+    report = ventoy_assist.RunReport("gc")
+    with ventoy_assist.RunProfiler(str(tmp_path / "profiles" / "gc"), interval=0.001) as profiler:
+        # Plan again until the sampler has caught the planning at least once
+        plan = ventoy_assist.plan_gc(str(tmp_path), report=report)
+        while not any("plan_gc" in stack for stack in list(profiler.stacks)):
+            ventoy_assist.plan_gc(str(tmp_path))
+    assert plan["ventoy_json"]["menu_alias"] == []
+
+    paths = profiler.save(report)
+    assert paths == [str(tmp_path / "profiles" / f"gc{extension}") for extension in (".pstats", ".collapsed", ".alloc.txt", ".json")]
+    assert any(function == "plan_gc" for _, _, function in pstats.Stats(paths[0]).stats)
+
+    collapsed = (tmp_path / "profiles" / "gc.collapsed").read_text().splitlines()
+    assert collapsed and all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed)
+    assert any(line.startswith("MainThread;") and "plan_gc (ventoy-assist.py:" in line for line in collapsed)
+
+    alloc = (tmp_path / "profiles" / "gc.alloc.txt").read_text()
+    assert alloc.startswith("Peak traced memory: ") and " blocks\n" in alloc
+    assert json.loads((tmp_path / "profiles" / "gc.json").read_text())["command"] == "gc"
@@ -0,0 +1,57 @@
+import random
+import pytest
+
+
+@pytest.fixture
+def store(ventoy_assist, tmp_path):
+    for image_path in ("ISO/ubuntu-24.04-desktop-amd64.iso", "ISO/Linux/kali-linux-2024.2-live-amd64.iso", "ISO/Linux/archlinux-2024.06.01-x86_64.iso", "Windows/Win11_23H2_English_x64v2.iso", "Windows/old/Windows10_22H2_x64.iso", "tools/gparted-live-1.6.0-1-amd64.iso"):
+        path = tmp_path / image_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    return ventoy_assist.PathStore.scan(str(tmp_path), ventoy_assist.IMAGE_EXTENSIONS)
+
+
+def test_find_returns_the_row_of_a_path(store):
+    assert len(store) == 11  # 6 images and 5 folders
+    for row in range(len(store)):
+        assert store.find(store[row]) == row
+    assert store.find("ISO/ubuntu") == -1
+    assert store.find("") == -1
+    assert store.find("zzz") == -1
+
+
+def test_search_treats_separators_as_spaces(ventoy_assist, store):
+    index = ventoy_assist.TrigramIndex(store)
+    assert index.search("kali linux")[0] == "ISO/Linux/kali-linux-2024.2-live-amd64.iso"
+    assert index.search("ISO/Linux/kali")[0] == "ISO/Linux/kali-linux-2024.2-live-amd64.iso"
+    assert index.search("windows old")[0] == "Windows/old"
+    assert index.search("23h2 english")[0] == "Windows/Win11_23H2_English_x64v2.iso"
+
+
+def test_search_finds_typos(ventoy_assist, store):
+    index = ventoy_assist.TrigramIndex(store)
+    assert index.search("ubunut")[0] == "ISO/ubuntu-24.04-desktop-amd64.iso"
+    assert index.search("archlnux")[0] == "ISO/Linux/archlinux-2024.06.01-x86_64.iso"
+    # Only one of the trigrams is found anywhere, too few for a fuzzy match
+    assert index.search("qqqubu") == []
+
+
+# Every path holding the query is found when there are fewer hits than the limit, in the order
+# file name before folder, word start before inside a word
+def test_search_matches_a_plain_scan(ventoy_assist, tmp_path):
+    rng = random.Random(7)
+    words = ["ubuntu", "kali", "linux", "live", "amd64", "win11", "english", "x64", "2024", "debian", "netinst"]
+    for _ in range(300):
+        folder = "/".join(rng.choice(["iso", "linux", "win", "old", "tools"]) for _ in range(rng.randint(0, 3)))
+        name = rng.choice("-_. ").join(rng.sample(words, rng.randint(1, 4))) + ".iso"
+        path = tmp_path / folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    store = ventoy_assist.PathStore.scan(str(tmp_path), ventoy_assist.IMAGE_EXTENSIONS)
+    index = ventoy_assist.TrigramIndex(store)
+    texts = [store[row].lower().translate(ventoy_assist.SEPARATORS_TO_SPACE) for row in range(len(store))]
+    for query in ["linux live", "amd64 iso", "win11", "kali", "old/tools", "x64 2024 iso", "netinst_ubuntu", "ub"]:
+        normal = query.translate(ventoy_assist.SEPARATORS_TO_SPACE)
+        expected = {store[row] for row, text in enumerate(texts) if normal in text}
+        found = index.search(query, limit=len(store))
+        assert set(found[: len(expected)]) == expected, query
@@ -0,0 +1,143 @@
+import json, os, stat
+import pytest
+
+posix_only = pytest.mark.skipif(not hasattr(os, "getuid"), reason="file modes are only checked on POSIX")
+
+
+@posix_only
+def test_server_file_is_private(ventoy_assist, tmp_path):
+    server_file = str(tmp_path / "ventoy-assist" / "server.json")
+    ventoy_assist.write_server_file(server_file, {"port": 1, "token": "secret"})
+    assert stat.S_IMODE(os.stat(os.path.dirname(server_file)).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(server_file).st_mode) == 0o600
+    assert ventoy_assist.read_server_file(server_file) == {"port": 1, "token": "secret"}
+
+
+@posix_only
+def test_server_file_replaces_planted_files(ventoy_assist, tmp_path):
+    server_dir = tmp_path / "ventoy-assist"
+    server_dir.mkdir(mode=0o700)
+    server_file = server_dir / "server.json"
+    server_file.write_text("{}")
+    os.chmod(server_file, 0o666)
+    ventoy_assist.write_server_file(str(server_file), {"token": "secret"})
+    assert stat.S_IMODE(os.stat(server_file).st_mode) == 0o600
+
+    # A link is replaced, the file it points to is left alone
+    target = tmp_path / "elsewhere.json"
+    target.write_text("untouched")
+    os.remove(server_file)
+    os.symlink(target, server_file)
+    ventoy_assist.write_server_file(str(server_file), {"token": "secret"})
+    assert not os.path.islink(server_file) and target.read_text() == "untouched"
+
+
+@posix_only
+def test_client_refuses_open_server_files(ventoy_assist, tmp_path):
+    server_dir = tmp_path / "ventoy-assist"
+    server_file = str(server_dir / "server.json")
+    ventoy_assist.write_server_file(server_file, {"port": 1, "token": "secret"})
+    os.chmod(server_file, 0o644)
+    with pytest.raises(ValueError, match="not private"):
+        ventoy_assist.read_server_file(server_file)
+
+    os.chmod(server_file, 0o600)
+    os.chmod(server_dir, 0o755)
+    with pytest.raises(ValueError, match="not private"):
+        ventoy_assist.read_server_file(server_file)
+    with pytest.raises(ValueError, match="not private"):
+        ventoy_assist.write_server_file(server_file, {})
+
+    os.chmod(server_dir, 0o700)
+    os.remove(server_file)
+    os.symlink(tmp_path / "elsewhere.json", server_file)
+    with pytest.raises(OSError):
+        ventoy_assist.read_server_file(server_file)
+
+
+@pytest.fixture
+def server(ventoy_assist, tmp_path):
+    import threading, time
+
+    job_server = ventoy_assist.JobServer(workers=1, server_file=str(tmp_path / "ventoy-assist" / "server.json"))
+    threading.Thread(target=job_server.serve, kwargs={"log": lambda message: None}, daemon=True).start()
+    while not os.path.exists(job_server.server_file):
+        time.sleep(0.01)
+    return job_server
+
+
+def post(server, body, token=None):
+    import urllib.error, urllib.request
+
+    request = urllib.request.Request(f"http://127.0.0.1:{server.port}/", data=body, headers={"Authorization": f"Bearer {token or server.token}"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def rpc(server, method, params=None):
+    return post(server, json.dumps({"jsonrpc": "2.0", "id": 7, "method": method, "params": params or {}}).encode("utf-8"))
+
+
+def error_code(reply):
+    return reply["error"]["code"]
+
+
+def test_server_rejects_bad_requests(server):
+    assert post(server, b"{}", token="wrong") == 403
+    assert error_code(post(server, b"{not json")) == -32700
+    assert error_code(post(server, b"[1, 2]")) == -32600
+    assert error_code(post(server, b'{"method": "ping", "params": [1]}')) == -32600
+    assert error_code(rpc(server, "format")) == -32601
+    assert error_code(rpc(server, "job", {"id": "1"})) == -32602
+    assert error_code(rpc(server, "rename", {"drive": "E:"})) == -32602
+    assert error_code(rpc(server, "rename", {"drive": "E:", "aliases": "oops"})) == -32602
+    assert error_code(rpc(server, "rename", {"drive": "E:", "aliases": [["ISO/a.iso"]]})) == -32602
+    assert error_code(rpc(server, "apply", {"drive": "E:", "theme": "t", "dry_run": "yes"})) == -32602
+    assert error_code(rpc(server, "apply", {"drive": "E:", "theme": "t", "memory_budget": True})) == -32602
+    assert error_code(rpc(server, "apply", {"drive": "E:", "theme": "t", "recolor": "sepia"})) == -32602
+    assert rpc(server, "ping")["result"]["workers"] == 1
+
+
+def test_server_runs_jobs(server, ventoy_assist, tmp_path):
+    volume = tmp_path / "volume"
+    (volume / "ventoy").mkdir(parents=True)
+    (volume / "ventoy" / "ventoy.json").write_text("{}")
+    (volume / "ISO").mkdir()
+    (volume / "ISO" / "ubuntu.iso").write_bytes(b"")
+
+    reply = rpc(server, "rename", {"drive": str(volume), "aliases": [["ISO/ubuntu.iso", "Ubuntu"]], "wait": True})
+    assert reply["id"] == 7 and reply["result"]["state"] == "done"
+    assert json.loads((volume / "ventoy" / "ventoy.json").read_text())["menu_alias"] == [{"image": "/ISO/ubuntu.iso", "alias": "Ubuntu"}]
+    assert [job["state"] for job in rpc(server, "jobs")["result"]] == ["done"]
+
+    reply = ventoy_assist.call_server("rename", {"drive": str(tmp_path / "missing"), "aliases": [["a.iso", "A"]], "wait": True}, server.server_file)
+    assert reply["state"] == "failed" and reply["error"]
+
+
+def test_client_sends_absolute_paths(ventoy_assist, tmp_path, monkeypatch):
+    import argparse
+
+    (tmp_path / "pack.zip").write_bytes(b"")
+    monkeypatch.chdir(tmp_path)
+    sent = {}
+    monkeypatch.setattr(ventoy_assist, "call_server", lambda method, params: sent.update(params) or {"state": "failed", "error": "stop"})
+    args = argparse.Namespace(command="apply", drive=".", theme="t", icon_pack="pack.zip", report=None, profile=None, server=True)
+    assert ventoy_assist.run_server_job_cli(args) == 1
+    assert sent["drive"] == str(tmp_path) and sent["icon_pack"] == str(tmp_path / "pack.zip")
+
+    sent.clear()
+    args.icon_pack = "default"  # A pack name is resolved by the server
+    ventoy_assist.run_server_job_cli(args)
+    assert sent["icon_pack"] == "default"
+
+
+# The resized icons cache is only on while a server runs
+def test_server_close_turns_the_icon_cache_off(ventoy_assist, tmp_path):
+    limit = ventoy_assist.RESIZED_ICONS.limit
+    job_server = ventoy_assist.JobServer(workers=1, server_file=str(tmp_path / "server.json"))
+    assert ventoy_assist.RESIZED_ICONS.limit == ventoy_assist.RESIZED_ICON_CACHE_LIMIT
+    job_server.close()
+    assert ventoy_assist.RESIZED_ICONS.limit == limit and ventoy_assist.RESIZED_ICONS.entries == {}
@@ -0,0 +1,61 @@
+import hashlib, json
+import pytest
+
+DIGEST = "ab" * 32
+
+
+@pytest.mark.parametrize(
+    "line, digest, name",
+    [
+        (f"{DIGEST}  ubuntu-24.04-desktop-amd64.iso", DIGEST, "ubuntu-24.04-desktop-amd64.iso"),
+        (f"{DIGEST} *ubuntu-24.04-desktop-amd64.iso", DIGEST, "ubuntu-24.04-desktop-amd64.iso"),
+        (f"{DIGEST.upper()}  name with spaces.iso", DIGEST.upper(), "name with spaces.iso"),
+        (f"SHA256 (Fedora-Workstation-Live-x86_64-40-1.14.iso) = {DIGEST}", DIGEST, "Fedora-Workstation-Live-x86_64-40-1.14.iso"),
+    ],
+)
+def test_checksum_line_formats(ventoy_assist, line, digest, name):
+    match = ventoy_assist.CHECKSUM_LINE.match(line)
+    assert match is not None
+    assert (match.group(1) or match.group(4)) == digest
+    assert (match.group(2) or match.group(3)) == name
+
+
+@pytest.mark.parametrize("line", ["", "# Fedora CHECKSUM", f"{DIGEST[:-1]}  short.iso", f"MD5 (a.iso) = {DIGEST}", "-----BEGIN PGP SIGNATURE-----"])
+def test_checksum_line_rejects_other_lines(ventoy_assist, line):
+    assert ventoy_assist.CHECKSUM_LINE.match(line) is None
+
+
+def test_expected_digests_from_checksum_files(ventoy_assist, tmp_path):
+    for folder, name in (("ubuntu", "ubuntu.iso"), ("fedora", "Fedora-40.iso"), ("debian", "debian.iso"), ("bare", "bare.iso"), ("none", "none.iso")):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / name).write_bytes(b"")
+    (tmp_path / "ubuntu" / "SHA256SUMS").write_text(f"{'11' * 32} *ubuntu.iso\n{'22' * 32}  other.iso\n")
+    (tmp_path / "fedora" / "Fedora-Workstation-40-CHECKSUM").write_text(f"# Fedora-40.iso: 100 bytes\nSHA256 (Fedora-40.iso) = {'33' * 32}\n")
+    (tmp_path / "debian" / "debian.iso.sha256").write_text(f"{'44' * 32}  sub\\DEBIAN.ISO\r\n")
+    (tmp_path / "bare" / "bare.iso.sha256").write_text("55" * 32 + "\n")
+
+    images = [str(tmp_path / folder / name) for folder, name in (("ubuntu", "ubuntu.iso"), ("fedora", "Fedora-40.iso"), ("debian", "debian.iso"), ("bare", "bare.iso"), ("none", "none.iso"))]
+    assert ventoy_assist.find_expected_digests(images) == {images[0]: "11" * 32, images[1]: "33" * 32, images[2]: "44" * 32, images[3]: "55" * 32}
+
+
+def test_verify_reports_mismatches_and_resumes_from_the_cache(ventoy_assist, tmp_path, monkeypatch):
+    (tmp_path / "ventoy").mkdir()
+    good, bad = b"good image", b"bad image"
+    (tmp_path / "good.iso").write_bytes(good)
+    (tmp_path / "bad.iso").write_bytes(bad)
+    (tmp_path / "unlisted.iso").write_bytes(b"")
+    (tmp_path / "SHA256SUMS").write_text(f"{hashlib.sha256(good).hexdigest()}  good.iso\n{'00' * 32}  bad.iso\n")
+    monkeypatch.setattr(ventoy_assist, "VOLUME_PROFILES", {str(tmp_path): None})
+
+    results = {result["path"]: result["status"] for result in ventoy_assist.verify_images(str(tmp_path))}
+    assert results == {"good.iso": "ok", "bad.iso": "mismatch", "unlisted.iso": "unlisted"}
+    with open(ventoy_assist.state_path(str(tmp_path / "ventoy"), "checksums.json")) as cache_file:
+        assert set(json.load(cache_file)) == {"good.iso", "bad.iso"}
+
+    # Unchanged images are not read again, a changed one is
+    (tmp_path / "bad.iso").write_bytes(b"bad image, fixed")
+    report = ventoy_assist.RunReport("verify")
+    results = {result["path"]: result["status"] for result in ventoy_assist.verify_images(str(tmp_path), report=report)}
+    assert results["good.iso"] == "ok"
+    assert report.counters["images_cached"] == 1
+    assert report.counters["images_hashed"] == 1
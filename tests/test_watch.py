@@ -0,0 +1,62 @@
+import json, os, random
+from test_menu_class import ICON_MAP, WORDS, ventoy_class
+
+
+def make_image(root, image_path):
+    path = os.path.join(root, *image_path.strip("/").split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return path
+
+
+def read_menu_class(root):
+    with open(os.path.join(root, "ventoy", "ventoy.json")) as ventoy_json:
+        return json.load(ventoy_json).get("menu_class", [])
+
+
+# After every batch, incremental or not, ventoy.json gives each image the class the full list of matches gives it
+def test_sync_keeps_every_class(ventoy_assist, tmp_path):
+    rng = random.Random(3)
+    for volume in range(20):
+        root = str(tmp_path / f"volume{volume}")
+        os.makedirs(os.path.join(root, "ventoy"))
+        with open(os.path.join(root, "ventoy", "ventoy.json"), "w") as ventoy_json:
+            json.dump({"menu_class": [{"key": "Arch", "class": "hand"}]}, ventoy_json)
+
+        def random_image():
+            name = "".join(rng.choice(WORDS) + rng.choice(["", "_", "-", "1"]) for _ in range(rng.randint(1, 3)))
+            return rng.choice(["", "/A", "/A/B", "/B"]) + f"/{name}{rng.randrange(1000)}.iso"
+
+        files = {make_image(root, random_image()) for _ in range(rng.randint(1, 12))}
+        sync = ventoy_assist.MenuClassSync(root, [ICON_MAP])
+        sync.start(sorted(files))
+        for _ in range(15):
+            added = {make_image(root, random_image()) for _ in range(rng.randint(0, 3))} - files
+            removed = set(rng.sample(sorted(files), min(len(files), rng.randint(0, 2))))
+            files = (files | added) - removed
+            sync.update(sorted(added), sorted(removed))
+
+            image_paths = ["/" + os.path.relpath(file, root).replace(os.sep, "/") for file in sorted(files)]
+            full = ventoy_assist.merge_menu_class([{"key": "Arch", "class": "hand"}], [tool for tool in sync.matches(image_paths) if tool[0] != "Arch"])
+            menu_class = read_menu_class(root)
+            for image_path in image_paths:
+                assert ventoy_class(menu_class, image_path, True) == ventoy_class(full, image_path, True), (image_path, menu_class)
+                assert ventoy_class(menu_class, image_path, False) == ventoy_class(full, image_path, True), (image_path, menu_class)
+
+
+def test_sync_skips_batches_that_change_no_class(ventoy_assist, tmp_path, monkeypatch):
+    root = str(tmp_path)
+    os.makedirs(os.path.join(root, "ventoy"))
+    with open(os.path.join(root, "ventoy", "ventoy.json"), "w") as ventoy_json:
+        json.dump({}, ventoy_json)
+    sync = ventoy_assist.MenuClassSync(root, [ICON_MAP])
+    added, removed = sync.start([make_image(root, "/ISO/ubuntu-22.iso"), make_image(root, "/ISO/debian-12.iso")])
+    assert sorted(entry["key"] for entry in added) == ["debian", "ubuntu"] and removed == []
+
+    # Another image of a class already there is handled without reading or writing ventoy.json
+    monkeypatch.setattr(ventoy_assist, "read_ventoy_json", None)
+    assert sync.update([make_image(root, "/ISO/ubuntu-24.iso")], []) == ([], [])
+    assert sync.update([], [os.path.join(root, "ISO", "ubuntu-22.iso")]) == ([], [])
+    monkeypatch.undo()
+
+    assert sync.update([], [os.path.join(root, "ISO", "debian-12.iso")]) == ([], [{"key": "debian", "class": "debian"}])
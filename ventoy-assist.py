@@ -1,12 +1,13 @@
-import os, ctypes, sys, json, shutil, math, pythoncom, win32com.client, random
+import os, io, re, bisect, zipfile, tarfile, tempfile, queue, ctypes, sys, json, shutil, math, time, argparse, random, hashlib, importlib, contextlib, threading, collections, itertools, cProfile, tracemalloc, http.server, urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6 import QtWidgets, QtCore, QtGui
 from PyQt6.QtWidgets import QMessageBox, QTableWidgetItem, QCheckBox, QCompleter, QGroupBox
-from PyQt6.QtGui import QFont, QPixmap
+from PyQt6.QtGui import QFont
 from PIL import Image
 from screeninfo import get_monitors
 from pathlib import Path
-from skimage.metrics import structural_similarity as ssim
 import numpy as np
+from array import array
 
 if getattr(sys, "frozen", False):
     icon_base_path = os.path.dirname(sys.executable)
@@ -14,6 +15,14 @@ else:
     icon_base_path = os.path.dirname(os.path.abspath(__file__))
 
 ICON_DIR = os.path.join(icon_base_path, "icons")
+ICON_PACK_DIR = os.path.join(icon_base_path, "icon-packs")
+ICON_PACK_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+ICON_PACK_CACHE_LIMIT = 32 * 1024 * 1024  # Source PNGs kept in memory per pack
+RESIZED_ICON_CACHE_LIMIT = 64 * 1024 * 1024  # Decoded icons the job server keeps across runs
+PROFILE_DIR = os.path.join(icon_base_path, "profiles")
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024  # Decoded icons in flight plus planned icons kept in memory
+THUMBNAIL_CACHE_LIMIT = 16 * 1024 * 1024  # Icon preview thumbnails kept in QPixmapCache
+IMAGE_EXTENSIONS = (".iso", ".wim", ".img", ".vhd", ".vhdx")
 
 
 # Check if the JSON is valid by trying to load it
@@ -27,17 +36,240 @@ def check_json_syntax(file_path):
 
 
 # Find image files (iso, wim, img, vhd, vhdx)
-def find_image_files(drive_letter, extensions):
+def find_image_files(drive_letter, extensions, report=None):
     matching_files = []
     for root, dirs, files in os.walk(drive_letter):
+        if report:
+            report.count("files_scanned", len(files))
         for file in files:
             if file.lower().endswith(extensions):
                 matching_files.append(os.path.join(root, file))
     return matching_files
 
 
+# Characters that separate words in file names, used to rank search hits. Search sees all of them as a
+# space, so "kali linux" finds kali-linux and "dir3 win" finds dir3/win.
+WORD_SEPARATORS = "/-_. "
+SEPARATORS_TO_SPACE = str.maketrans(WORD_SEPARATORS, " " * len(WORD_SEPARATORS))
+FUZZY_CANDIDATES = 2048  # Best ranked entries the fuzzy search counts trigrams for
+SUBSTRING_CANDIDATES = 512  # Best ranked entries holding every query trigram that are checked for the query
+NARROW_CHUNK = 8192  # Entries of the rarest query trigram narrowed with the other trigrams at a time
+
+
+# Compact index of the image files on a volume. Directory names are interned once in a table with
+# parent indices, files are (name, parent index) records, and the sorted listing of folders and files
+# is an array of record ids (negative ids are folders), so no full path string is kept in memory.
+class PathStore:
+    __slots__ = ("root", "dir_names", "dir_parents", "file_names", "file_parents", "order")
+
+    def __init__(self, root):
+        self.root = root
+        self.dir_names = [""]  # Folder 0 is the volume root
+        self.dir_parents = array("i", [-1])
+        self.file_names = []
+        self.file_parents = array("i")
+        self.order = array("i")
+
+    # Walk the volume once and record the image files and the folders that contain them
+    @classmethod
+    def scan(cls, drive_letter, extensions, skip_dirs=(), report=None):
+        store = cls(drive_root(drive_letter))
+        dir_ids = {}  # Relative folder path -> folder id, only needed while walking
+        for root, dirs, files in os.walk(store.root):
+            dirs[:] = [d for d in dirs if d not in skip_dirs]
+            if report:
+                report.count("files_scanned", len(files))
+
+            images = [file for file in files if file.lower().endswith(extensions)]
+            if not images:
+                continue
+
+            parent = store.intern_dir(os.path.relpath(root, store.root), dir_ids)
+            for image in images:
+                store.file_names.append(image)
+                store.file_parents.append(parent)
+
+        store.sort()
+        return store
+
+    def intern_dir(self, relative_path, dir_ids):
+        if relative_path in ("", "."):
+            return 0
+        if relative_path not in dir_ids:
+            head, name = os.path.split(relative_path)
+            parent = self.intern_dir(head, dir_ids)
+            self.dir_names.append(sys.intern(name))
+            self.dir_parents.append(parent)
+            dir_ids[relative_path] = len(self.dir_names) - 1
+        return dir_ids[relative_path]
+
+    def dir_path(self, dir_id):
+        parts = []
+        while dir_id > 0:
+            parts.append(self.dir_names[dir_id])
+            dir_id = self.dir_parents[dir_id]
+        return "/".join(reversed(parts))
+
+    # Relative path with '/' separators of a listing entry (file id, or negative folder id)
+    def display_path(self, entry):
+        if entry < 0:
+            return self.dir_path(-entry)
+        parent = self.dir_path(self.file_parents[entry])
+        return f"{parent}/{self.file_names[entry]}" if parent else self.file_names[entry]
+
+    def full_path(self, file_id):
+        return os.path.join(self.root, self.display_path(file_id).replace("/", os.sep))
+
+    # Sort folders and files together by their display path, the strings only live during the sort
+    def sort(self):
+        entries = list(range(-1, -len(self.dir_names), -1)) + list(range(len(self.file_names)))
+        entries.sort(key=self.display_path)
+        self.order = array("i", entries)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, row):
+        return self.display_path(self.order[row])
+
+    # Row of a display path, -1 if it is not listed. The rows are sorted by display path, so only the
+    # paths of the rows bisect looks at are built.
+    def find(self, path):
+        row = bisect.bisect_left(self, path)
+        return row if row < len(self) and self[row] == path else -1
+
+
+# Trigram index over the listing of a PathStore for ranked substring and fuzzy search.
+# Entries are kept in "rank order" (short file names first) so a query can stop after enough hits.
+class TrigramIndex:
+    __slots__ = ("store", "entries", "dir_texts", "name_texts", "postings", "word_starts")
+
+    def __init__(self, store):
+        self.store = store
+        self.dir_texts = [store.dir_path(dir_id).lower().translate(SEPARATORS_TO_SPACE) for dir_id in range(len(store.dir_names))]
+        self.name_texts = [name.lower().translate(SEPARATORS_TO_SPACE) for name in store.file_names]
+
+        def rank(entry):
+            return (len(self.dir_texts[-entry].rsplit("/", 1)[-1]) if entry < 0 else len(self.name_texts[entry]), entry)
+
+        self.entries = array("i", sorted(store.order, key=rank))
+
+        # All trigrams, plus a smaller list of the trigrams that start a word for the best ranked hits
+        postings = {}
+        word_starts = {}
+        for position in range(len(self.entries)):
+            text = self.text(position)
+            for trigram in {text[index : index + 3] for index in range(len(text) - 2)}:
+                postings.setdefault(trigram, []).append(position)
+            for trigram in {text[index : index + 3] for index in range(len(text) - 2) if index == 0 or text[index - 1] == " "}:
+                word_starts.setdefault(trigram, []).append(position)
+        self.postings = {trigram: array("i", positions) for trigram, positions in postings.items()}
+        self.word_starts = {trigram: array("i", positions) for trigram, positions in word_starts.items()}
+
+    # Lower case display path of the entry at a rank position, with spaces for the separators
+    def text(self, position):
+        entry = self.entries[position]
+        if entry < 0:
+            return self.dir_texts[-entry]
+        parent = self.dir_texts[self.store.file_parents[entry]]
+        return f"{parent} {self.name_texts[entry]}" if parent else self.name_texts[entry]
+
+    # Where the file or folder name starts in the text of a rank position
+    def name_start(self, position):
+        entry = self.entries[position]
+        if entry < 0:
+            return len(self.dir_texts[-entry]) - len(self.store.dir_names[-entry])
+        parent = self.dir_texts[self.store.file_parents[entry]]
+        return len(parent) + 1 if parent else 0
+
+    # Lower is better: matches in the file name, at the start of a word, then rank order
+    def score(self, text, query, position):
+        index = text.find(query, self.name_start(position))
+        in_name = index != -1
+        if not in_name:
+            index = text.find(query)
+        word_start = index == 0 or text[index - 1] == " "
+        return (not in_name, not word_start, position)
+
+    # Add (score, position) substring hits among the candidates. The walk stops once there are enough
+    # best-class hits (file name, word start) or enough hits overall to rank
+    def substring_hits(self, query, positions, limit, hits, seen):
+        best = sum(1 for score, _ in hits if not score[0] and not score[1])
+        for position in positions:
+            if position in seen:
+                continue
+            text = self.text(position)
+            if query in text:
+                score = self.score(text, query, position)
+                hits.append((score, position))
+                seen.add(position)
+                best += not score[0] and not score[1]
+                if best >= limit or len(hits) >= limit * 10:
+                    return True
+        return False
+
+    # Ranked display paths containing the query, falling back to trigram overlap for typos
+    def search(self, query, limit=50):
+        query = query.lower().translate(SEPARATORS_TO_SPACE).strip()
+        if not query:
+            return []
+
+        hits = []
+        seen = set()
+        if len(query) < 3:
+            # Too short for trigrams, the first hits in rank order are good enough
+            self.substring_hits(query, range(len(self.entries)), limit, hits, seen)
+            return [self.store.display_path(self.entries[position]) for _, position in sorted(hits)[:limit]]
+
+        trigrams = {query[index : index + 3] for index in range(len(query) - 2)}
+        lists = sorted((self.postings.get(trigram, ()) for trigram in trigrams), key=len)
+
+        # An entry holding the query holds all of its trigrams, so a trigram found nowhere means only
+        # fuzzy matches. When even the rarest trigram is common, hits are usually dense: verify the best
+        # ranked entries where the query starts a word first. Otherwise, or when hits were sparse there,
+        # narrow the shortest list with the others a chunk at a time and verify the best ranked entries
+        # left. The posting lists are sorted, so numpy intersects them without a Python int per entry.
+        if lists[0]:
+            done = len(lists[0]) > SUBSTRING_CANDIDATES and self.substring_hits(query, self.word_starts.get(query[:3], array("i"))[: SUBSTRING_CANDIDATES // 2], limit, hits, seen)
+            others = [np.frombuffer(positions, dtype=np.int32) for positions in lists[1:] if len(positions) < len(self.entries)]
+            verified = 0
+            for start in range(0, len(lists[0]), NARROW_CHUNK):
+                if done or verified >= SUBSTRING_CANDIDATES:
+                    break
+                candidates = np.frombuffer(lists[0][start : start + NARROW_CHUNK], dtype=np.int32)
+                for positions in others:
+                    candidates = candidates[positions[np.minimum(np.searchsorted(positions, candidates), len(positions) - 1)] == candidates]
+                done = self.substring_hits(query, candidates[: SUBSTRING_CANDIDATES - verified].tolist(), limit, hits, seen)
+                verified += len(candidates)
+        results = [position for _, position in sorted(hits)[:limit]]
+
+        # Fuzzy matches: entries sharing a third of the query trigrams. Such an entry is in one of the
+        # len(lists) - needed + 1 shortest lists, and only the best ranked of those are counted
+        if len(results) < limit and len(trigrams) >= 2 and lists[-1]:
+            needed = max((len(trigrams) + 2) // 3, 1)
+            heads = [np.frombuffer(positions[:FUZZY_CANDIDATES], dtype=np.int32) for positions in lists[: len(lists) - needed + 1] if positions]
+            candidates = np.sort(np.concatenate(heads)) if heads else np.zeros(0, dtype=np.int32)
+            candidates = candidates[np.diff(candidates, prepend=-1) != 0][:FUZZY_CANDIDATES]
+            overlap = np.zeros(len(candidates), dtype=np.int32)
+            for positions in lists:
+                if positions:
+                    positions = np.frombuffer(positions, dtype=np.int32)
+                    overlap += positions[np.minimum(np.searchsorted(positions, candidates), len(positions) - 1)] == candidates
+            found = set(results)
+            for index in np.lexsort((candidates, -overlap)).tolist():
+                if overlap[index] < needed or len(results) >= limit:
+                    break
+                if candidates[index] not in found:
+                    results.append(int(candidates[index]))
+
+        return [self.store.display_path(self.entries[position]) for position in results]
+
+
 # Get external drives (USB drives and external HDD/SSD)
 def get_external_drives():
+    # pywin32 only exists on Windows, the headless commands and benchmarks run without it
+    import pythoncom, win32com.client
+
     pythoncom.CoInitialize()  # Initialize COM threading
     c = win32com.client.Dispatch("WbemScripting.SWbemLocator")
     wmi = c.ConnectServer(".", "root\\cimv2")
@@ -102,12 +334,2900 @@ def resource_path(relative_path):
     return base_path / relative_path
 
 
+# Peak memory (bytes) of this process so far, None if the platform does not tell
+def peak_memory():
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KB
+    except ImportError:
+        pass
+
+    try:
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", ctypes.c_ulong),
+                ("PageFaultCount", ctypes.c_ulong),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    except Exception:
+        pass
+    return None
+
+
+# Stage timings, counters and peak memory of one apply or rename run
+class RunReport:
+    def __init__(self, command):
+        self.command = command
+        self.started = time.time()
+        self.start_counter = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.running = {}  # Stage name -> [threads inside it, when the first of them entered]
+        self.lock = threading.Lock()  # Stages and counters are also updated from worker threads
+
+    # Time a stage with the high resolution counter, repeated stages add up. Worker threads running the
+    # same stage at once count once, so a stage gets the wall-clock time it was running, not thread time.
+    @contextlib.contextmanager
+    def stage(self, name):
+        with self.lock:
+            running = self.running.setdefault(name, [0, 0.0])
+            if running[0] == 0:
+                running[1] = time.perf_counter()
+            running[0] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                running[0] -= 1
+                if running[0] == 0:
+                    self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - running[1]
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        return {
+            "command": self.command,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "total_seconds": round(time.perf_counter() - self.start_counter, 6),
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+            "peak_memory": peak_memory(),
+            "platform": sys.platform,
+            "python": sys.version.split()[0],
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=4)
+
+    def save(self, path):
+        with open(path, "w") as report_file:
+            report_file.write(self.to_json())
+
+
+# Profile a whole run for offline diagnosis. cProfile covers the thread that runs the command, a sampler
+# thread records the stacks of every thread (worker pools included) as collapsed stacks for flamegraphs,
+# and tracemalloc records where memory was allocated. Files are written as <prefix>.pstats,
+# <prefix>.collapsed and <prefix>.alloc.txt, next to the run report at <prefix>.json.
+class RunProfiler:
+    def __init__(self, prefix, interval=0.005, top_allocators=30):
+        self.prefix = prefix
+        self.interval = interval
+        self.top_allocators = top_allocators
+        self.profile = cProfile.Profile()
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def __enter__(self):
+        self.stopped.clear()
+        tracemalloc.start(16)
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.stopped.set()
+        self.sampler.join()
+        self.snapshot = tracemalloc.take_snapshot()
+        self.traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return False
+
+    def sample(self):
+        names = {}
+        while not self.stopped.wait(self.interval):
+            threads = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.sampler.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    if code not in names:
+                        names[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    stack.append(names[code])
+                    frame = frame.f_back
+                stack.append(threads.get(thread_id, "thread"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    # Write the profile files (and the run report, if given), returns their paths
+    def save(self, report=None):
+        os.makedirs(os.path.dirname(os.path.abspath(self.prefix)), exist_ok=True)
+        paths = [self.prefix + ".pstats", self.prefix + ".collapsed", self.prefix + ".alloc.txt"]
+        self.profile.dump_stats(paths[0])
+        with open(paths[1], "w") as collapsed_file:
+            collapsed_file.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+        # Ignore the allocations of tracemalloc and of this profiler
+        snapshot = self.snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, cProfile.__file__)])
+        with open(paths[2], "w") as alloc_file:
+            alloc_file.write(f"Peak traced memory: {format_size(self.traced_peak)}\n\n")
+            for statistic in snapshot.statistics("traceback")[: self.top_allocators]:
+                alloc_file.write(f"{format_size(statistic.size)} in {statistic.count} blocks\n")
+                alloc_file.writelines(f"    {line}\n" for line in statistic.traceback.format(most_recent_first=True)[:8])
+                alloc_file.write("\n")
+
+        if report is not None:
+            report.save(self.prefix + ".json")
+            paths.append(self.prefix + ".json")
+        return paths
+
+
+# Default prefix of the profile files of a run: <folder>/ventoy-assist-<command>-<time>
+def profile_prefix(command, folder=PROFILE_DIR):
+    return os.path.join(folder, f"ventoy-assist-{command}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+
+# Turn a drive letter such as "E:" into the root of the volume; mount points are used as-is
+def drive_root(drive_letter):
+    if len(drive_letter) == 2 and drive_letter[1] == ":":
+        return drive_letter + "\\"
+    return drive_letter
+
+
+# Read ventoy.json from the ventoy folder of the drive
+def read_ventoy_json(ventoy_dir, is_rename=False):
+    ventoy_json_path = os.path.join(ventoy_dir, "ventoy.json")
+    if not os.path.exists(ventoy_json_path):
+        raise FileNotFoundError("ventoy.json not found")
+
+    try:
+        if is_rename:
+            with open(ventoy_json_path, "r") as json_file:
+                content = json_file.read().strip()
+                if not content:
+                    ventoy_json = {}
+                else:
+                    ventoy_json = json.loads(content)
+            return ventoy_json
+        else:
+            with open(ventoy_json_path, "r") as json_file:
+                ventoy_json = json.load(json_file)
+            return ventoy_json
+    except json.JSONDecodeError:
+        raise ValueError("Invalid ventoy.json syntax")
+
+
+# Write ventoy.json through a temporary file so a bad dump never replaces the original
+def write_ventoy_json(ventoy_dir, ventoy_json, buffer_size=1024 * 1024):
+    ventoy_json_path = os.path.join(ventoy_dir, "ventoy.json")
+    temp_ventoy_json_path = os.path.join(ventoy_dir, "temp_ventoy.json")
+
+    # Serialise first and hand the drive a single write instead of many small json.dump chunks
+    content = json.dumps(ventoy_json, indent=4)
+    with open(temp_ventoy_json_path, "w", buffering=buffer_size) as json_file:
+        json_file.write(content)
+
+    if not check_json_syntax(temp_ventoy_json_path):
+        os.remove(temp_ventoy_json_path)
+        raise ValueError("Syntax error in the modified ventoy.json. No changes were made.")
+
+    shutil.move(temp_ventoy_json_path, ventoy_json_path)
+    return ventoy_json_path
+
+
+# Sidecar folder on the volume for caches and state kept between runs
+def state_path(ventoy_dir, name):
+    return os.path.join(ventoy_dir, ".ventoy-assist", name)
+
+
+# Read a JSON state file, an empty dict if it is missing or unreadable
+def read_state(ventoy_dir, name):
+    try:
+        with open(state_path(ventoy_dir, name), "r") as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+# Replace a JSON state file in one step, so an interrupted save leaves the previous state behind
+def write_state(ventoy_dir, name, state):
+    path = state_path(ventoy_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as state_file:
+        json.dump(state, state_file)
+    os.replace(path + ".tmp", path)
+
+
+# Find the theme folders (and optionally all their resolution variants) to apply icons to
+def collect_theme_paths(drive_letter, ventoy_json, selected_theme, apply_to_all_themes, apply_to_all_resolutions):
+    theme_paths = []
+
+    # Find theme entries in ventoy.json
+    theme_keys = [key for key in ventoy_json.keys() if key.startswith("theme")]
+
+    for theme_key in theme_keys:
+        theme_entry = ventoy_json[theme_key]
+        if "file" in theme_entry:
+            file_field = theme_entry["file"]
+            if isinstance(file_field, str):
+                file_field = [file_field]
+            for file_path in file_field:
+                # Extract theme name from the path
+                if file_path.startswith("/"):
+                    file_path = file_path[1:]
+                file_path = file_path.replace("/", os.sep)
+                full_path = os.path.join(drive_root(drive_letter), file_path)
+                if os.path.exists(full_path):
+                    theme_name = os.path.basename(os.path.dirname(full_path))
+
+                    # Decide whether to include this theme
+                    include_theme = False
+                    if apply_to_all_themes:
+                        include_theme = True
+                    elif theme_name == selected_theme:
+                        include_theme = True
+
+                    if include_theme:
+                        if apply_to_all_resolutions:
+                            # Include all resolutions of the theme
+                            theme_base_name = theme_name.split("_")[0]
+                            theme_dir = os.path.dirname(os.path.dirname(full_path))
+                            # Search for all folders starting with the base theme name
+                            for dir_name in os.listdir(theme_dir):
+                                if dir_name.startswith(theme_base_name):
+                                    theme_paths.append(os.path.join(theme_dir, dir_name))
+                        else:
+                            theme_paths.append(os.path.dirname(full_path))
+
+    # Remove duplicates
+    theme_paths = list(set(theme_paths))
+
+    if not theme_paths:
+        return None
+
+    return theme_paths
+
+
+# Pick an icon size from the primary monitor resolution
+def icon_size_from_res():
+    try:
+        monitors = get_monitors()
+        if monitors:
+            width = monitors[0].width
+            height = monitors[0].height
+
+            # Get the scaling factor
+            user32 = ctypes.windll.user32
+            hdc = user32.GetDC(0)
+            dpi = ctypes.windll.gdi32.GetDeviceCaps(hdc, 88)
+
+            # Default DPI is 96
+            scale_factor = dpi / 96.0
+            scaled_width = int(width / scale_factor)
+            scaled_height = int(height / scale_factor)
+            resolution = (scaled_width, scaled_height)
+        else:
+            resolution = (1920, 1080)
+    except Exception:
+        resolution = (1920, 1080)
+
+    # Mapping of resolutions to icon sizes
+    resolution_icon_size_map = {
+        (1920, 1080): 32,
+        (2560, 1080): 32,
+        (2560, 1440): 48,
+        (3440, 1440): 48,
+        (3840, 2160): 64,
+    }
+
+    # Find the closest matching resolution
+    min_diff = float("inf")
+    icon_size = 32  # Default icon size
+    for res, size in resolution_icon_size_map.items():
+        diff = abs(resolution[0] - res[0]) + abs(resolution[1] - res[1])
+        if diff < min_diff:
+            min_diff = diff
+            icon_size = size
+
+    return icon_size
+
+
+# Get the icon size already used in a theme's icons folder, returns (size, warning)
+def theme_icon_size(icons_path):
+    png_files = [f for f in os.listdir(icons_path) if f.lower().endswith(".png")]
+    if not png_files:
+        return icon_size_from_res(), None
+
+    # Use the resolution of ubuntu.png if present, otherwise any icon
+    selected_file = "ubuntu.png" if "ubuntu.png" in png_files else random.choice(png_files)
+    try:
+        with Image.open(os.path.join(icons_path, selected_file)) as img:
+            return img.width, None  # Assuming square icons
+    except Exception:
+        theme_name = os.path.basename(os.path.dirname(icons_path))
+        return icon_size_from_res(), f"Failed to load {selected_file} in theme {theme_name}. Using default icon size."
+
+
+# Find (matched substring, icon class) pairs for every icon name found in the image filenames
+def get_matching_tools(files, icon_map):
+    tool_icons = list(icon_map.keys())
+
+    matching_tools = []
+    for file in files:
+        filename = os.path.basename(file)
+        filename_lower = filename.lower()
+        for tool in tool_icons:
+            tool_lower = tool.lower()
+            index = filename_lower.find(tool_lower)
+            if index != -1:
+                # Extract the matching substring from the filename, preserving case
+                matched_string = filename[index : index + len(tool)]
+                matching_tools.append((matched_string, icon_map[tool]))
+    return matching_tools
+
+
+ISO_SECTOR = 2048
+# Volume labels and publishers that do not name the icon directly
+LABEL_HINTS = {"cccoma": "windows", "ccsa": "windows", "cpba": "windows", "cena": "windows", "microsoft": "windows"}
+
+
+# Decode a UDF dstring: compression id, characters, and the used length in the last byte
+def decode_dstring(field):
+    length = field[-1]
+    if length < 2:
+        return ""
+    if field[0] == 16:
+        return field[1:length].decode("utf-16-be", "replace").strip()
+    return field[1:length].decode("latin-1").strip()
+
+
+# Read the labels of an ISO9660/UDF image from its volume descriptors, None if it is not one.
+# Only the descriptor sectors are read (a few KB), never the image data.
+def read_image_labels(path):
+    labels = {}
+    with open(path, "rb", buffering=0) as image:
+        image.seek(16 * ISO_SECTOR)
+        descriptors = image.read(8 * ISO_SECTOR)
+
+        is_udf = False
+        for offset in range(0, len(descriptors) - ISO_SECTOR + 1, ISO_SECTOR):
+            sector = descriptors[offset : offset + ISO_SECTOR]
+            kind, identifier = sector[0], sector[1:6]
+            if identifier == b"CD001":
+                if kind == 1:
+                    for field, start, end in (("volume", 40, 72), ("system", 8, 40), ("publisher", 318, 446)):
+                        value = sector[start:end].decode("ascii", "replace").strip(" \x00")
+                        if value:
+                            labels[field] = value
+                elif kind == 0 and sector[7:30] == b"EL TORITO SPECIFICATION":
+                    labels["bootable"] = True
+            # The UDF volume recognition sequence follows the ISO9660 set terminator
+            elif identifier in (b"NSR02", b"NSR03"):
+                is_udf = True
+            elif identifier not in (b"BEA01", b"TEA01"):
+                break
+
+        # UDF only (or blank ISO9660 label): follow the anchor at sector 256 to the volume descriptors
+        if is_udf and not labels.get("volume"):
+            image.seek(256 * ISO_SECTOR)
+            anchor = image.read(ISO_SECTOR)
+            if len(anchor) == ISO_SECTOR and int.from_bytes(anchor[0:2], "little") == 2:
+                length = int.from_bytes(anchor[16:20], "little")
+                location = int.from_bytes(anchor[20:24], "little")
+                image.seek(location * ISO_SECTOR)
+                sequence = image.read(min(length, 8 * ISO_SECTOR))
+                for offset in range(0, len(sequence) - ISO_SECTOR + 1, ISO_SECTOR):
+                    sector = sequence[offset : offset + ISO_SECTOR]
+                    tag = int.from_bytes(sector[0:2], "little")
+                    if tag == 1:
+                        labels["volume"] = decode_dstring(sector[24:56])
+                    elif tag == 6:
+                        labels["logical_volume"] = decode_dstring(sector[84:212])
+                    elif tag == 8:
+                        break
+
+    return labels if labels.get("volume") or labels.get("logical_volume") else None
+
+
+# Labels of every image in a PathStore by file id, read in parallel and cached by (path, size, mtime).
+# Returns the labels and the updated cache, or None for the cache if nothing changed.
+def detect_image_labels(store, cache):
+    cached = cache.get("images", {})
+    images = {}
+    labels_by_file = {}
+    to_read = []
+    for file_id in range(len(store.file_names)):
+        relative_path = store.display_path(file_id)
+        try:
+            stat = os.stat(store.full_path(file_id))
+        except OSError:
+            continue
+        entry = cached.get(relative_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            images[relative_path] = entry
+            if entry["labels"]:
+                labels_by_file[file_id] = entry["labels"]
+        else:
+            to_read.append((file_id, relative_path, stat))
+
+    def read_labels(item):
+        file_id, _, _ = item
+        try:
+            return read_image_labels(store.full_path(file_id))
+        except OSError:
+            return None
+
+    # The reads are tiny and seek bound, so several are kept in flight
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for (file_id, relative_path, stat), labels in zip(to_read, executor.map(read_labels, to_read)):
+            images[relative_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "labels": labels}
+            if labels:
+                labels_by_file[file_id] = labels
+
+    changed = bool(to_read) or len(images) != len(cached)
+    return labels_by_file, ({"images": images} if changed else None)
+
+
+# Icon name for the labels of an image: the longest icon name starting a word of the labels
+def classify_labels(labels, icon_names, use_hints=True):
+    text = " ".join(str(labels.get(field, "")) for field in ("volume", "logical_volume", "publisher", "system"))
+    words = "-".join("".join(char if char.isalnum() else " " for char in text.lower()).split())
+    if not words:
+        return None
+
+    best = None
+    for icon_name in icon_names:
+        name = icon_name.lower()
+        index = words.find(name)
+        while index != -1:
+            if index == 0 or words[index - 1] == "-":
+                if best is None or len(name) > len(best):
+                    best = icon_name
+                break
+            index = words.find(name, index + 1)
+    if best is None and use_hints:
+        for hint, icon_name in LABEL_HINTS.items():
+            if icon_name in icon_names and any(word.startswith(hint) for word in words.split("-")):
+                return icon_name
+    return best
+
+
+# (file name, icon class) pairs for images whose contents name a more specific class than their file name.
+# The full file name is the longest possible key, so Ventoy picks it before any substring key.
+def get_content_matches(files, labels_by_file, icon_map):
+    content_matches = []
+    for file_id, labels in labels_by_file.items():
+        filename = os.path.basename(files[file_id])
+        name_matches = get_matching_tools([filename], icon_map)
+        # Publisher hints are too vague to overrule a file name that already matches
+        icon_name = classify_labels(labels, icon_map, use_hints=not name_matches)
+        if icon_name is None:
+            continue
+        # A label is often a short form of the name ("ARCH_202405" for archlinux), so it only overrules a
+        # file name that matches nothing or a class it extends (ubuntu for ubuntu-mate)
+        name_class = max(name_matches, key=lambda match: len(match[0]))[1] if name_matches else None
+        label_class = icon_map[icon_name]
+        if name_class is None or (name_class != label_class and name_class in label_class):
+            content_matches.append((filename, label_class))
+    return content_matches
+
+
+# Identity of a menu_class / menu_alias entry, None for entries the tool does not understand
+def menu_entry_id(entry):
+    for field in ("key", "dir", "parent", "image"):
+        if field in entry:
+            return f"{field}:{entry[field]}"
+    return None
+
+
+# Generated folder entries are recorded as "parent:/folder"; ':' never appears in a FAT/NTFS file name
+PARENT_KEY = "parent:"
+
+
+# menu_class entry of a generated (key, class) pair
+def menu_class_entry(key, class_string):
+    if key.startswith(PARENT_KEY):
+        return {"parent": key[len(PARENT_KEY) :], "class": class_string}
+    return {"key": key, "class": class_string}
+
+
+# Key of a menu_class entry as it is recorded in the manifest, None for entries the tool never generates
+def generated_key(entry):
+    if "key" in entry:
+        return entry["key"]
+    if "parent" in entry:
+        return PARENT_KEY + entry["parent"]
+    return None
+
+
+# Whether an entry is still the one the tool generated: recorded in the manifest and not edited since
+def owns_entry(entry, manifest):
+    key = generated_key(entry)
+    return key is not None and manifest.get(key) == entry.get("class") and set(entry) == set(menu_class_entry(key, None))
+
+
+# Generated entries of menu_class as key -> class: the manifest, or before there is one, the entries
+# equal to a fresh match, which are then taken over
+def owned_menu_class(menu_class, manifest, matching_tools):
+    if manifest is not None:
+        return manifest
+    matched = dict(sorted(set(matching_tools)))
+    owned = {}
+    for entry in menu_class:
+        key = generated_key(entry)
+        if key is not None and matched.get(key) == entry.get("class"):
+            owned[key] = entry["class"]
+    return owned
+
+
+# (key, class) pairs of the hand-written key entries, owned maps the generated ones
+def hand_written_keys(menu_class, owned):
+    return [(entry["key"], entry.get("class")) for entry in menu_class if "key" in entry and not owns_entry(entry, owned)]
+
+
+# Order in which menu_class lists the keys: longest first so Ventoy picks the most specific class, "linux" last
+def menu_key_order(key):
+    return (key.lower() == "linux", -len(key), key.lower(), key)
+
+
+# Smallest set of generated entries that gives every image the class the full list of matches gives it.
+# Ventoy tries every key (a substring of the file name) in order before any "parent" folder entry, so
+# each image only needs its decisive key, the first one that matches it. Keys whose images fall through
+# to another key or folder of the same class are dropped, and a folder whose images all share a class
+# gets one "parent" entry when that saves at least two keys. image_paths are '/' separated from the
+# drive root, fixed_keys are hand-written (key, class) pairs that shadow generated ones.
+def minimal_menu_class(image_paths, matching_tools, fixed_keys=()):
+    classes = dict(sorted(set(matching_tools)))  # One class per key, the same one reconcile_menu_class picks
+    fixed = dict(fixed_keys)
+    all_classes = {**classes, **fixed}
+    names = [path.rsplit("/", 1)[-1] for path in image_paths]
+    folders = [path.rsplit("/", 1)[0] for path in image_paths]
+
+    # Every key in each file name, in menu_class order; the first one is the decisive key
+    ordered = sorted(all_classes, key=menu_key_order)
+    matches = [[key for key in ordered if key in name] for name in names]
+    decisive = [found[0] if found else None for found in matches]
+    desired = [all_classes[key] if key is not None else None for key in decisive]
+
+    def first_match(index, active):
+        for key in matches[index]:
+            if key in active:
+                return key
+        return None
+
+    # The images under a folder, subfolders included, are one run of the sorted paths. same_until[i] is
+    # where the run of equal classes starting at position i ends, so a folder is uniform in O(1).
+    order = sorted(range(len(image_paths)), key=image_paths.__getitem__)
+    sorted_paths = [image_paths[index] for index in order]
+    same_until = [len(order)] * len(order)
+    for position in range(len(order) - 2, -1, -1):
+        same = desired[order[position]] == desired[order[position + 1]]
+        same_until[position] = same_until[position + 1] if same else position + 1
+
+    images_in = collections.defaultdict(list)
+    for index, folder in enumerate(folders):
+        images_in[folder].append(index)
+    uncovered = collections.Counter(decisive)  # Images per decisive key that no folder entry covers
+
+    # Folders whose images all get the same class. Only the images directly in the folder rely on the
+    # entry, so it holds whether Ventoy matches "parent" exactly or as a path prefix.
+    parents = {}
+    for folder in sorted(images_in):
+        if not folder:
+            continue
+        start = bisect.bisect_left(sorted_paths, folder + "/")
+        end = bisect.bisect_left(sorted_paths, folder + "0")  # '0' sorts right after '/'
+        if desired[order[start]] is None or same_until[start] < end:
+            continue
+        inside = collections.Counter(decisive[index] for index in images_in[folder])
+        # Keys no image outside the folder (or an earlier folder entry) needs any more
+        saved = [key for key, count in inside.items() if uncovered[key] == count and key not in fixed]
+        if len(saved) >= 2:
+            parents[folder] = desired[order[start]]
+            uncovered.subtract(inside)
+
+    # Keys for every image outside those folders; a key that gives an image inside one another class
+    # wins over the folder entry, so that folder goes back to keys
+    keys = set()
+    pending = [folder for folder in images_in if folder not in parents]
+    while pending:
+        for folder in pending:
+            keys.update(decisive[index] for index in images_in[folder] if decisive[index] in classes and decisive[index] not in fixed)
+        active = keys | set(fixed)
+        pending = []
+        for folder, class_string in parents.items():
+            for index in images_in[folder]:
+                key = first_match(index, active)
+                if key is not None and all_classes[key] != class_string:
+                    pending.append(folder)
+                    break
+        for folder in pending:
+            del parents[folder]
+
+    # Drop keys whose images end up with the same class without them, longer keys first. Only the images
+    # whose name holds the key can change.
+    images_with = collections.defaultdict(list)
+    for index, found in enumerate(matches):
+        for key in found:
+            images_with[key].append(index)
+    active = keys | set(fixed)
+    for key in sorted(keys, key=lambda key: (-len(key), key)):
+        active.discard(key)
+        for index in images_with[key]:
+            other = first_match(index, active)
+            if (all_classes[other] if other is not None else parents.get(folders[index])) != desired[index]:
+                active.add(key)
+                break
+        else:
+            keys.discard(key)
+
+    return [(key, classes[key]) for key in sorted(keys, key=menu_key_order)] + [(PARENT_KEY + folder, class_string) for folder, class_string in sorted(parents.items())]
+
+
+# Merge the matched tools into menu_class, longest keys first so Ventoy picks the most specific class.
+# Generated "parent:<folder>" pairs become folder entries.
+def merge_menu_class(menu_class, matching_tools):
+    # Remove duplicates from matching_tools and sort by length of key in descending order and then case-insensitive
+    matching_tools = sorted(set(matching_tools), key=lambda x: (-len(x[0]), x[0].lower(), x))
+    entries = list(menu_class) + [menu_class_entry(key_string, class_string) for key_string, class_string in matching_tools]
+
+    # Remove duplicates and sort the menu_class entries
+    unique_menu_class = {}
+    for entry in entries:
+        for field in ("key", "dir", "parent"):
+            if field in entry:
+                sort_key = entry[field]
+                break
+        else:
+            continue
+        unique_menu_class[menu_entry_id(entry)] = (sort_key, entry)  # Store sort_key for sorting
+
+    sorted_menu_class_entries = [entry for _, entry in sorted(unique_menu_class.values(), key=lambda x: (-len(x[0]), x[0].lower(), x[0]))]
+
+    # Separate entries where key.lower() == "linux" and move them to the end
+    linux_entries = [entry for entry in sorted_menu_class_entries if entry.get("key", "").lower() == "linux"]
+    non_linux_entries = [entry for entry in sorted_menu_class_entries if entry.get("key", "").lower() != "linux"]
+
+    return non_linux_entries + linux_entries
+
+
+# Reconcile menu_class with freshly generated (key, class) pairs. Only entries the tool generated (recorded
+# as key -> class in the manifest, "parent:<folder>" for folder entries) are updated or removed,
+# hand-written entries are left untouched and win over a generated entry for the same key. Without a
+# manifest, entries equal to a fresh match are taken over.
+# Returns the new menu_class and the new manifest.
+def reconcile_menu_class(menu_class, matching_tools, manifest=None):
+    generated = {}
+    for key, class_string in sorted(set(matching_tools)):
+        generated[key] = class_string
+    manifest = owned_menu_class(menu_class, manifest, matching_tools)
+
+    kept = []
+    new_manifest = {}
+    hand_written = set()
+    for entry in menu_class:
+        key = generated_key(entry)
+        # An entry is still ours only if nobody edited it since it was generated
+        if owns_entry(entry, manifest):
+            continue
+        kept.append(entry)
+        if key is not None:
+            hand_written.add(key)
+
+    additions = [(key, class_string) for key, class_string in generated.items() if key not in hand_written]
+    new_manifest.update(additions)
+    return merge_menu_class(kept, additions), new_manifest
+
+
+# Add or update menu_alias entries for (relative path, alias) pairs
+def merge_menu_alias(menu_alias, aliases, drive_letter):
+    menu_alias = [dict(entry) for entry in menu_alias]
+
+    for path, new_alias in aliases:
+        image_path = "/" + path.replace("\\", "/")
+        alias_exists = False
+
+        # Determine if the path is a file or directory
+        full_path = os.path.join(drive_root(drive_letter), path.replace("/", os.sep))
+        is_directory = os.path.isdir(full_path)
+        key = "dir" if is_directory else "image"
+
+        for entry in menu_alias:
+            if entry.get(key) == image_path:
+                entry["alias"] = new_alias
+                alias_exists = True
+                break
+
+        if not alias_exists:
+            menu_alias.append({key: image_path, "alias": new_alias})
+
+    return menu_alias
+
+
+# Compare two versions of a menu_class / menu_alias list by entry identity
+def diff_menu_entries(old_entries, new_entries):
+    old_by_id = {menu_entry_id(entry): entry for entry in old_entries}
+    new_by_id = {menu_entry_id(entry): entry for entry in new_entries}
+
+    diff = {"added": [], "removed": [], "changed": []}
+    for entry_id, entry in new_by_id.items():
+        if entry_id not in old_by_id:
+            diff["added"].append(entry)
+        elif old_by_id[entry_id] != entry:
+            diff["changed"].append((old_by_id[entry_id], entry))
+    for entry_id, entry in old_by_id.items():
+        if entry_id not in new_by_id:
+            diff["removed"].append(entry)
+    return diff
+
+
+# Least recently used cache bounded by the total size of its values, shared by worker threads
+class SizedCache:
+    def __init__(self, limit, size_of=len):
+        self.limit = limit
+        self.size_of = size_of
+        self.entries = collections.OrderedDict()  # Least recently used first
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.size_of(self.entries.pop(key))
+            if self.size_of(value) > self.limit:
+                return  # Larger than the whole cache, or the cache is off
+            self.entries[key] = value
+            self.size += self.size_of(value)
+            while self.size > self.limit and len(self.entries) > 1:
+                self.size -= self.size_of(self.entries.popitem(last=False)[1])
+
+
+# A set of icons in a folder or in a zip/tar archive. An archive is opened once and its index read once,
+# members are read on demand and the recent ones kept, so other icon sizes rarely touch the file again.
+class IconPack:
+    def __init__(self, path, cache_limit=ICON_PACK_CACHE_LIMIT):
+        self.path = path
+        self.stamp = os.stat(path).st_mtime_ns  # Icons added or removed since change it
+        self.members = {}  # PNG file name -> folder path or archive member
+        self.cache = SizedCache(cache_limit)
+        self.lock = threading.Lock()  # tarfile reads are not thread-safe
+        self.archive = None
+
+        if os.path.isdir(path):
+            for icon_file in os.listdir(path):
+                if icon_file.lower().endswith(".png"):
+                    self.members[icon_file] = os.path.join(path, icon_file)
+        elif path.lower().endswith(".zip"):
+            self.archive = zipfile.ZipFile(path)
+            for info in self.archive.infolist():
+                self.add_member(info.filename, info, not info.is_dir())
+        else:
+            # Tar has no central directory; listing an uncompressed tar only reads the member headers
+            self.archive = tarfile.open(path)
+            for info in self.archive.getmembers():
+                self.add_member(info.name, info, info.isfile())
+
+    # Icons may sit in a subfolder of the archive, only the file name counts
+    def add_member(self, member_name, info, is_file):
+        icon_file = member_name.replace("\\", "/").rsplit("/", 1)[-1]
+        if is_file and icon_file.lower().endswith(".png") and not icon_file.startswith("._") and "__MACOSX" not in member_name:
+            self.members.setdefault(icon_file, info)
+
+    def names(self):
+        return sorted(self.members)
+
+    # Recently read icons stay cached up to cache_limit bytes, so a huge pack is never held in memory whole
+    def read(self, icon_file):
+        data = self.cache.get(icon_file)
+        if data is None:
+            member = self.members[icon_file]
+            if self.archive is None:
+                with open(member, "rb") as icon:
+                    data = icon.read()
+            else:
+                with self.lock:
+                    data = self.archive.read(member) if isinstance(self.archive, zipfile.ZipFile) else self.archive.extractfile(member).read()
+            self.cache.put(icon_file, data)
+        return data
+
+
+# Open icon packs once per session, again only when the folder or archive changed
+ICON_PACKS = {}
+ICON_PACKS_LOCK = threading.Lock()  # Jobs of the server open packs at the same time
+
+
+def open_icon_pack(path):
+    with ICON_PACKS_LOCK:
+        pack = ICON_PACKS.get(path)
+        try:
+            if pack is None or pack.stamp != os.stat(path).st_mtime_ns:
+                ICON_PACKS[path] = pack = IconPack(path)
+        except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+            raise ValueError(f"Failed to open icon pack {os.path.basename(path)}: {e}")
+    return pack
+
+
+# Available icon packs by name: the bundled icons folder, then the archives in the icon-packs folder
+def find_icon_packs(icon_dir=ICON_DIR, pack_dir=ICON_PACK_DIR):
+    packs = {}
+    if os.path.isdir(icon_dir):
+        packs["default"] = icon_dir
+    if os.path.isdir(pack_dir):
+        for file in sorted(os.listdir(pack_dir)):
+            for extension in ICON_PACK_EXTENSIONS:
+                if file.lower().endswith(extension):
+                    packs[file[: -len(extension)]] = os.path.join(pack_dir, file)
+                    break
+    return packs
+
+
+# Icon pack path for a pack name or a path given by the user
+def resolve_icon_pack(name_or_path):
+    if os.path.exists(name_or_path):
+        return name_or_path
+    packs = find_icon_packs()
+    if name_or_path not in packs:
+        raise ValueError(f"Icon pack {name_or_path} not found. Available: {', '.join(packs) or 'none'}")
+    return packs[name_or_path]
+
+
+RECOLOR_MODES = ("tint", "hue", "luminance")
+THEME_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+# Palette per theme folder, sampling a background once per session is enough
+THEME_PALETTES = {}
+
+
+# (background, accent) RGB colors of a theme, sampled from the desktop image named in theme.txt or
+# the largest image in the theme folder. None if the theme has no image to sample.
+def sample_theme_palette(theme_folder):
+    if theme_folder in THEME_PALETTES:
+        return THEME_PALETTES[theme_folder]
+
+    image_path = None
+    try:
+        with open(os.path.join(theme_folder, "theme.txt"), "r", errors="replace") as theme_file:
+            match = re.search(r'^\s*desktop-image\s*:\s*"([^"]+)"', theme_file.read(), re.MULTILINE)
+        if match and os.path.isfile(os.path.join(theme_folder, match.group(1))):
+            image_path = os.path.join(theme_folder, match.group(1))
+    except OSError:
+        pass
+    if image_path is None:
+        try:
+            images = [os.path.join(theme_folder, file) for file in os.listdir(theme_folder) if file.lower().endswith(THEME_IMAGE_EXTENSIONS)]
+            image_path = max(images, key=os.path.getsize, default=None)
+        except OSError:
+            pass  # The theme folder is gone, there is nothing to sample
+
+    palette = None
+    if image_path:
+        try:
+            with Image.open(image_path) as img:
+                img.draft("RGB", (128, 128))  # JPEG backgrounds decode at a fraction of their size
+                pixels = np.asarray(img.convert("RGB").resize((64, 64)), dtype=np.float32).reshape(-1, 3)
+            # The accent is the mean of the pixels that are both saturated and far from the background
+            background = pixels.mean(axis=0)
+            score = (pixels.max(axis=1) - pixels.min(axis=1)) * np.linalg.norm(pixels - background, axis=1)
+            if score.max() > 0:
+                accent = pixels[score >= np.quantile(score, 0.95)].mean(axis=0)
+            else:
+                accent = np.full(3, 255 if background.mean() < 128 else 0, dtype=np.float32)  # Flat image
+            palette = (tuple(int(c) for c in background), tuple(int(c) for c in accent))
+        except Exception:
+            palette = None
+    THEME_PALETTES[theme_folder] = palette
+    return palette
+
+
+# Recolor a stack of RGBA icons (N, H, W, 4) toward a (background, accent) palette in one pass.
+# tint colors the icon's luminance with the accent, hue rotates every icon's main hue onto the accent's,
+# luminance maps dark to the background and light to the accent. Alpha is left as it is.
+def recolor_icons(stack, mode, palette, strength=1.0):
+    if mode not in RECOLOR_MODES:
+        raise ValueError(f"Unknown recolor mode {mode}. Use one of: {', '.join(RECOLOR_MODES)}")
+    rgb = stack[..., :3].astype(np.float32) / 255
+    background, accent = (np.array(color, dtype=np.float32) / 255 for color in palette)
+    weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    luminance = rgb @ weights
+
+    if mode == "tint":
+        target = luminance[..., None] * accent / max(float(accent @ weights), 0.05)
+    elif mode == "luminance":
+        target = background + luminance[..., None] * (accent - background)
+    else:
+        # Hue angle of every pixel around the gray axis, averaged per icon weighted by chroma and alpha
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        x, y = 2 * r - g - b, math.sqrt(3) * (g - b)
+        weight = np.hypot(x, y) * stack[..., 3].astype(np.float32)
+        icon_hue = np.arctan2((y * weight).sum(axis=(1, 2)), (x * weight).sum(axis=(1, 2)))
+        accent_hue = math.atan2(math.sqrt(3) * (accent[1] - accent[2]), 2 * accent[0] - accent[1] - accent[2])
+
+        # Rotation about the gray axis, one 3x3 matrix per icon
+        angle = accent_hue - icon_hue
+        cos, sin = np.cos(angle)[:, None, None], np.sin(angle)[:, None, None]
+        cross = np.array([[0, -1, 1], [1, 0, -1], [-1, 1, 0]], dtype=np.float32) / math.sqrt(3)
+        rotation = cos * np.eye(3, dtype=np.float32) + (1 - cos) / 3 + sin * cross
+        target = (rgb.reshape(len(rgb), -1, 3) @ rotation.transpose(0, 2, 1).astype(np.float32)).reshape(rgb.shape)
+
+    recolored = rgb + (target - rgb) * strength
+    recolored = (np.clip(recolored, 0, 1) * 255 + 0.5).astype(np.uint8)
+    return np.concatenate([recolored, stack[..., 3:]], axis=-1)
+
+
+# RGBA stack (N, H, W, 4) of some icons of a pack, for previews; returns the stack and the icon names
+def resize_icon_set_subset(pack, icon_files, icon_size):
+    resized = []
+    names = []
+    for icon_file in icon_files:
+        try:
+            resized.append(np.asarray(load_icon(pack, icon_file, icon_size)))
+            names.append(icon_file)
+        except Exception:
+            continue
+    return (np.stack(resized) if resized else np.zeros((0, *icon_size, 4), np.uint8)), names
+
+
+# Bytes of a plan kept out of memory: a slice of the spool file of a MemoryBudget
+class SpooledBytes:
+    __slots__ = ("budget", "offset", "size")
+
+    def __init__(self, budget, offset, size):
+        self.budget = budget
+        self.offset = offset
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def read(self):
+        return self.budget.read(self.offset, self.size)
+
+
+# The bytes behind plan data, whether it is kept in memory or spooled
+def plan_bytes(data):
+    return data.read() if isinstance(data, SpooledBytes) else data
+
+
+# Memory budget of a run. Half of it bounds the decoded icons in flight through the icon pipeline, the
+# other half the encoded bytes a plan keeps in memory; past that, plan data goes to a local spool file.
+class MemoryBudget:
+    def __init__(self, limit=DEFAULT_MEMORY_BUDGET):
+        self.limit = limit
+        self.kept = 0
+        self.spool = None
+        self.lock = threading.Lock()
+
+    # How many items of item_size bytes may be in flight at once, at least one per stage
+    def slots(self, item_size, minimum=2):
+        return max(self.limit // 2 // max(item_size, 1), minimum)
+
+    def keep(self, data):
+        with self.lock:
+            if self.kept + len(data) <= self.limit // 2:
+                self.kept += len(data)
+                return data
+            if self.spool is None:
+                self.spool = tempfile.TemporaryFile()
+            self.spool.seek(0, os.SEEK_END)
+            offset = self.spool.tell()
+            self.spool.write(data)
+            return SpooledBytes(self, offset, len(data))
+
+    def read(self, offset, size):
+        with self.lock:
+            self.spool.seek(offset)
+            return self.spool.read(size)
+
+
+# Run items through a chain of stages, every stage on its own threads and connected by bounded queues,
+# so a slow stage holds the earlier ones back instead of letting work pile up in memory. A stage is
+# (function, batch size, workers); the function takes a list of items and returns a list of results.
+# Yields the results of the last stage as they come out.
+def run_pipeline(items, stages, queue_size):
+    done = object()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    errors = []
+
+    def feed():
+        try:
+            for item in items:
+                queues[0].put(item)
+        finally:
+            queues[0].put(done)
+
+    def work(index, function, batch_size, finished):
+        inbox, outbox = queues[index], queues[index + 1]
+        try:
+            while True:
+                batch = []
+                item = inbox.get()
+                while item is not done:
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        break
+                    item = inbox.get()
+                if batch and not errors:
+                    for result in function(batch):
+                        outbox.put(result)
+                if item is done:
+                    inbox.put(done)  # Let the other workers of this stage see the end too
+                    break
+        except Exception as e:
+            errors.append(e)
+            # Keep draining so the stages before this one never block on a full queue
+            while inbox.get() is not done:
+                pass
+            inbox.put(done)
+        finally:
+            with finished[1]:
+                finished[0] -= 1
+                if finished[0] == 0:
+                    outbox.put(done)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for index, (function, batch_size, workers) in enumerate(stages):
+        finished = [workers, threading.Lock()]
+        threads.extend(threading.Thread(target=work, args=(index, function, batch_size, finished), daemon=True) for _ in range(workers))
+    for thread in threads:
+        thread.start()
+
+    while True:
+        result = queues[-1].get()
+        if result is done:
+            break
+        yield result
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+# Resized icons of recent runs, so a GUI session or the job server resizes an icon set only once
+# Off outside the job server: a single run resizes every icon once anyway, and a cache that outlives the
+# run would not count against its memory budget
+RESIZED_ICONS = SizedCache(0, size_of=lambda img: img.width * img.height * 4)
+
+
+# Decode one icon of a pack and resize it, RGBA to keep the transparency
+def load_icon(pack, icon_file, icon_size):
+    key = (pack.path, pack.stamp, icon_file, icon_size)
+    resized_img = RESIZED_ICONS.get(key)
+    if resized_img is None:
+        with Image.open(io.BytesIO(pack.read(icon_file))) as img:
+            resized_img = img.convert("RGBA").resize(icon_size, Image.LANCZOS)
+        RESIZED_ICONS.put(key, resized_img)
+    return resized_img
+
+
+# Calculate the SSIM similarity (in percent) between an icon on the drive and a resized icon
+def icon_similarity(icon_path, resized_img, icon_size):
+    with Image.open(icon_path) as original_img:
+        # Make sure both images have same size
+        original_img = original_img.convert("RGBA").resize(icon_size, Image.LANCZOS)
+        original_array = np.array(original_img.convert("L"))
+    alt_array = np.array(resized_img.convert("L"))
+
+    from skimage.metrics import structural_similarity as ssim  # Slow to import, only needed on conflicts
+
+    similarity, _ = ssim(original_array, alt_array, full=True)
+    return similarity * 100
+
+
+# Decide what happens to one resized icon in a theme's icons folder without writing anything
+def plan_icon(icon_file, png_bytes, resized_img, dest_dir, icon_size):
+    icon_name = os.path.splitext(icon_file)[0]  # Original icon name
+    dest_icon_path = os.path.join(dest_dir, icon_file)
+    step = {"icon": icon_name, "class": icon_name, "write": None, "remove": None, "conflict": None, "warning": None}
+
+    if not os.path.exists(dest_icon_path):
+        # No conflict; copy the resized icon normally
+        step["write"] = (dest_icon_path, png_bytes)
+        return step
+
+    # If a file with the same name exists in the icons folder, the new icon becomes 'name-alt.png'
+    alt_icon_filename = f"{icon_name}-alt.png"
+    alt_icon_path = os.path.join(dest_dir, alt_icon_filename)
+
+    try:
+        similarity_percentage = icon_similarity(dest_icon_path, resized_img, icon_size)
+    except Exception as e:
+        step["warning"] = f"Failed to calculate similarity for {icon_name}: {e}. Keeping the '-alt' icon."
+        similarity_percentage = None
+
+    step["conflict"] = {"path": dest_icon_path, "similarity": similarity_percentage}
+    if similarity_percentage is not None and similarity_percentage >= 90:
+        # If similarity is high; drop any '-alt' icon and map to original
+        if os.path.exists(alt_icon_path):
+            step["remove"] = alt_icon_path
+        return step
+
+    # Similarity is low; keep the new icon as '-alt', unless that file already holds exactly these bytes
+    step["class"] = os.path.splitext(alt_icon_filename)[0]
+    try:
+        if os.path.getsize(alt_icon_path) == len(png_bytes):
+            with open(alt_icon_path, "rb") as alt_icon:
+                if alt_icon.read() == plan_bytes(png_bytes):
+                    return step
+    except OSError:
+        pass
+    step["write"] = (alt_icon_path, png_bytes)
+    return step
+
+
+# Resize the source icons once and plan their copies into every icons folder that uses this size.
+# Icons stream through decode/resize -> recolor -> encode -> compare, so only a budgeted number of
+# decoded icons exist at any time; with recolor = (mode, palette, strength) icons are recolored in batches.
+def plan_icon_copies(source_dir, dest_dirs, icon_size, report=None, recolor=None, budget=None):
+    report = report or RunReport("plan_icon_copies")
+    budget = budget or MemoryBudget()
+    if not os.path.exists(source_dir):
+        raise FileNotFoundError("Local icons folder not found.")
+    pack = open_icon_pack(source_dir)
+
+    # A decoded icon and its source image can both be alive in a stage, count them together
+    icon_bytes = icon_size[0] * icon_size[1] * 4 * 2
+    queue_size = min(budget.slots(icon_bytes * 4), 64)
+    batch_size = max(min(queue_size // 2, 32), 1)
+    warnings = []
+
+    def decode(icon_files):
+        loaded = []
+        for icon_file in icon_files:
+            try:
+                with report.stage("resize"):
+                    loaded.append((icon_file, load_icon(pack, icon_file, icon_size)))
+                report.count("icons_resized")
+            except Exception as e:
+                warnings.append(f"Failed to process {icon_file}: {e}. Skipping this icon.")
+        return loaded
+
+    def recolor_batch(loaded):
+        with report.stage("recolor"):
+            stack = recolor_icons(np.stack([np.asarray(resized_img) for _, resized_img in loaded]), *recolor)
+        return [(icon_file, Image.fromarray(pixels, "RGBA")) for (icon_file, _), pixels in zip(loaded, stack)]
+
+    def encode(loaded):
+        encoded = []
+        for icon_file, resized_img in loaded:
+            with report.stage("encode"):
+                buffer = io.BytesIO()
+                resized_img.save(buffer, format="PNG")
+            # One copy of the bytes serves every icons folder of this size
+            encoded.append((icon_file, budget.keep(buffer.getvalue()), resized_img))
+        return encoded
+
+    # The SSIM checks only read from the drive, so they run on several workers. Every step also says how
+    # to build its icon again, so the journal can record that instead of the bytes.
+    source = {"pack": os.path.abspath(source_dir), "size": list(icon_size), "recolor": [recolor[0], [list(color) for color in recolor[1]], recolor[2]] if recolor else None}
+
+    def compare(encoded):
+        planned = []
+        for icon_file, png_bytes, resized_img in encoded:
+            for dest_dir in dest_dirs:
+                with report.stage("compare"):
+                    step = plan_icon(icon_file, png_bytes, resized_img, dest_dir, icon_size)
+                step["source"] = {**source, "file": icon_file}
+                planned.append((dest_dir, step))
+        return planned
+
+    stages = [(decode, 1, 4)]
+    if recolor:
+        stages.append((recolor_batch, batch_size, 1))
+    stages.extend([(encode, 1, 2), (compare, 1, 4)])
+
+    icon_files = pack.names()
+    planned = list(run_pipeline(icon_files, stages, queue_size))
+    # Keep the order of a plain loop over folders and icons, so plans and reports stay stable
+    folder_order = {dest_dir: index for index, dest_dir in enumerate(dest_dirs)}
+    icon_order = {os.path.splitext(icon_file)[0]: index for index, icon_file in enumerate(icon_files)}
+    planned.sort(key=lambda item: (folder_order[item[0]], icon_order[item[1]["icon"]]))
+
+    icon_maps = {dest_dir: {} for dest_dir in dest_dirs}
+    steps = []
+    for dest_dir, step in planned:
+        icon_maps[dest_dir][step["icon"]] = step["class"]
+        if step["warning"]:
+            warnings.append(step["warning"])
+        if step["conflict"]:
+            report.count("conflicts")
+        steps.append(step)
+    return icon_maps, steps, warnings
+
+
+# PNG bytes of one icon built again from the source a step of plan_icon_copies recorded
+def build_icon_png(source):
+    resized_img = load_icon(open_icon_pack(source["pack"]), source["file"], tuple(source["size"]))
+    if source["recolor"]:
+        mode, palette, strength = source["recolor"]
+        resized_img = Image.fromarray(recolor_icons(np.asarray(resized_img)[None], mode, palette, strength)[0], "RGBA")
+    buffer = io.BytesIO()
+    resized_img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# Resize the source icons once and copy them into every icons folder that uses this size
+def copy_and_resize_icons(source_dir, dest_dirs, icon_size):
+    icon_maps, steps, warnings = plan_icon_copies(source_dir, dest_dirs, icon_size)
+    warnings.extend(write_plan_files([step["write"] for step in steps if step["write"]], [step["remove"] for step in steps if step["remove"]]))
+    return icon_maps, warnings
+
+
+# Probe results per volume folder, so a volume is only probed once per session
+VOLUME_PROFILES = {}
+
+
+# Measure small-file write latency, small-file throughput and sequential throughput of a volume
+def probe_volume(directory, small_files=16, small_size=8 * 1024, sequential_size=2 * 1024 * 1024):
+    probe_dir = os.path.join(directory, "ventoy-assist-probe.tmp")
+    os.makedirs(probe_dir, exist_ok=True)
+    small_data = os.urandom(small_size)
+    chunk = os.urandom(min(sequential_size, 1024 * 1024))
+    latencies = []
+    try:
+        # Many small files, flushed one by one like icons being copied
+        start = time.perf_counter()
+        for index in range(small_files):
+            file_start = time.perf_counter()
+            with open(os.path.join(probe_dir, f"{index}.bin"), "wb") as probe_file:
+                probe_file.write(small_data)
+                probe_file.flush()
+                os.fsync(probe_file.fileno())
+            latencies.append(time.perf_counter() - file_start)
+        small_elapsed = time.perf_counter() - start
+
+        # One larger sequential file
+        start = time.perf_counter()
+        with open(os.path.join(probe_dir, "sequential.bin"), "wb", buffering=0) as probe_file:
+            for _ in range(max(sequential_size // len(chunk), 1)):
+                probe_file.write(chunk)
+            os.fsync(probe_file.fileno())
+        sequential_elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(probe_dir, ignore_errors=True)
+
+    latencies.sort()
+    return {
+        "latency": latencies[len(latencies) // 2],
+        "small_throughput": small_files * small_size / max(small_elapsed, 1e-6),
+        "sequential_throughput": max(sequential_size // len(chunk), 1) * len(chunk) / max(sequential_elapsed, 1e-6),
+    }
+
+
+# Probe a volume the first time it is used, None if the volume cannot be written. Without probe only a
+# profile measured earlier in this session is returned, so nothing is written to the volume.
+def volume_profile(directory, probe=True):
+    if directory not in VOLUME_PROFILES:
+        if not probe:
+            return None
+        try:
+            VOLUME_PROFILES[directory] = probe_volume(directory)
+        except OSError:
+            return None
+    return VOLUME_PROFILES[directory]
+
+
+# Profile saved by `ventoy-assist probe` in the state folder of a drive, None if there is none
+def saved_volume_profile(ventoy_dir):
+    profile = read_state(ventoy_dir, "volume.json")
+    if all(isinstance(profile.get(key), (int, float)) and profile[key] > 0 for key in ("latency", "small_throughput", "sequential_throughput")):
+        return profile
+    return None
+
+
+# Pick writer concurrency, buffer size and batch size from a volume profile
+def io_schedule(profile=None):
+    if profile is None:
+        return {"workers": 4, "buffer_size": 1024 * 1024, "batch_size": 16, "read_workers": 2}
+
+    # Slow sticks serialise small writes internally, extra writers only make them seek more
+    latency = profile["latency"]
+    if latency >= 0.02:
+        workers = 1
+    elif latency >= 0.005:
+        workers = 2
+    elif latency >= 0.001:
+        workers = 4
+    else:
+        workers = 8
+
+    throughput = profile["sequential_throughput"]
+    if throughput >= 100 * 1024 * 1024:
+        buffer_size = 4 * 1024 * 1024
+    elif throughput >= 20 * 1024 * 1024:
+        buffer_size = 1024 * 1024
+    else:
+        buffer_size = 256 * 1024
+
+    # Give every writer about 50 ms of files per batch so the thread hand-off stays negligible
+    batch_size = min(max(int(0.05 / max(latency, 1e-4)), 8), 256)
+
+    # Whole-file reads (hashing) only gain from parallel readers on drives faster than one hasher needs
+    if throughput >= 200 * 1024 * 1024:
+        read_workers = min(os.cpu_count() or 1, 4)
+    elif throughput >= 60 * 1024 * 1024:
+        read_workers = 2
+    else:
+        read_workers = 1
+    return {"workers": workers, "buffer_size": buffer_size, "batch_size": batch_size, "read_workers": read_workers}
+
+
+# Write (path, bytes) pairs in batches and remove files, returns warnings for failed operations
+# Files go to a '.part' file first and replace the target in one step, so an interrupted write never
+# leaves a truncated icon under its real name. on_done gets the finished operations as each completes.
+def write_plan_files(writes, removes, schedule=None, on_done=None):
+    schedule = schedule or io_schedule()
+    warnings = []
+    removed = []
+    for path in removes:
+        try:
+            os.remove(path)
+            removed.append(f"remove {path}")
+        except Exception as e:
+            warnings.append(f"Failed to remove {os.path.basename(path)}: {e}.")
+    if on_done and removed:
+        on_done(removed)
+
+    # Keep files of the same folder together so each writer stays in one directory
+    writes = sorted(writes, key=lambda write: write[0])
+    batch_size = schedule["batch_size"]
+    batches = [writes[index : index + batch_size] for index in range(0, len(writes), batch_size)]
+
+    def write_batch(batch):
+        batch_warnings = []
+        for path, data in batch:
+            try:
+                with open(path + ".part", "wb", buffering=schedule["buffer_size"]) as file_out:
+                    file_out.write(plan_bytes(data))
+                os.replace(path + ".part", path)
+            except OSError as e:
+                batch_warnings.append(f"Failed to write {os.path.basename(path)}: {e}.")
+                continue
+            if on_done:
+                on_done([f"write {path}"])
+        return batch_warnings
+
+    with ThreadPoolExecutor(max_workers=schedule["workers"]) as executor:
+        for batch_warnings in executor.map(write_batch, batches):
+            warnings.extend(batch_warnings)
+    return warnings
+
+
+# Start an empty plan; a plan holds every change of a run in memory until execute_plan writes it
+def new_plan(kind, ventoy_dir, ventoy_json, report=None):
+    return {
+        "kind": kind,
+        "report": report or RunReport(kind),
+        "ventoy_dir": ventoy_dir,
+        "original_json": ventoy_json,
+        "ventoy_json": ventoy_json,
+        "writes": [],
+        "sources": {},  # path -> how to build a write again, the journal records this instead of the bytes
+        "removes": [],
+        "state": [],  # (name, dict) sidecar state files, saved after the plan is executed
+        "conflicts": [],
+        "diff": {},
+        "warnings": [],
+        "estimate": None,
+    }
+
+
+# New menu_class (and manifest) for the images of a volume: match them against the icon maps, keep the
+# smallest set of entries and reconcile it with the entries already there
+def plan_menu_class(store, icon_maps, labels_by_file, menu_class, manifest, report):
+    files = store.file_names  # The matcher only needs the file names
+    matching_tools = []
+    with report.stage("match"):
+        for icon_map in icon_maps:
+            matching_tools.extend(get_matching_tools(files, icon_map))
+            matching_tools.extend(get_content_matches(files, labels_by_file, icon_map))
+    report.count("matches", len(matching_tools))
+
+    with report.stage("minimize"):
+        image_paths = ["/" + store.display_path(file_id) for file_id in range(len(files))]
+        owned = owned_menu_class(menu_class, manifest, matching_tools)
+        generated = minimal_menu_class(image_paths, matching_tools, hand_written_keys(menu_class, owned))
+    report.count("generated_entries", len(generated))
+
+    with report.stage("merge"):
+        return reconcile_menu_class(menu_class, generated, owned)
+
+
+# Class Ventoy shows for an image: its "image" entry, else the first key in its file name, else the
+# entry of its folder
+def menu_class_of(image_path, menu_class):
+    name = image_path.rsplit("/", 1)[-1]
+    for field, matches in (("image", lambda value: value == image_path), ("key", lambda value: value in name), ("parent", lambda value: image_path.startswith(value.rstrip("/") + "/"))):
+        for entry in menu_class:
+            if isinstance(entry.get(field), str) and matches(entry[field]):
+                return entry.get("class")
+    return None
+
+
+# The icon every image of the drive would get from Apply Icons with the selected theme, without resizing
+# or comparing any icon. Returns (image path, class, icon source) rows; the source is ("pack", pack path,
+# icon file), ("file", path) for an icon already in the theme, or None when the image gets no icon.
+def preview_icon_assignments(drive_letter, selected_theme, use_theme_icons, icon_dir=ICON_DIR, report=None):
+    report = report or RunReport("preview")
+    ventoy_dir = os.path.join(drive_root(drive_letter), "ventoy")
+    ventoy_json = read_ventoy_json(ventoy_dir)
+    theme_paths = collect_theme_paths(drive_letter, ventoy_json, selected_theme, False, False)
+    if not theme_paths:
+        raise ValueError("No matching themes found to apply icons.")
+    icons_path = os.path.join(theme_paths[0], "icons")
+    theme_icons = {os.path.splitext(file)[0]: os.path.join(icons_path, file) for file in os.listdir(icons_path) if file.lower().endswith(".png")} if os.path.isdir(icons_path) else {}
+
+    pack = None if use_theme_icons else open_icon_pack(icon_dir)
+    pack_icons = {os.path.splitext(file)[0]: file for file in pack.names()} if pack else {}
+    icon_map = {name: name for name in (theme_icons if use_theme_icons else pack_icons)}
+
+    with report.stage("scan"):
+        store = PathStore.scan(drive_letter, IMAGE_EXTENSIONS, report=report)
+    with report.stage("detect"):
+        labels_by_file, _ = detect_image_labels(store, read_state(ventoy_dir, "contents.json"))
+    manifest = read_state(ventoy_dir, "manifest.json")
+    menu_class, _ = plan_menu_class(store, [icon_map], labels_by_file, ventoy_json.get("menu_class", []), manifest.get("menu_class"), report)
+
+    rows = []
+    for file_id in range(len(store.file_names)):
+        image_path = "/" + store.display_path(file_id)
+        class_string = menu_class_of(image_path, menu_class)
+        # A new icon comes from the pack, also when it ends up as 'name-alt'; other classes use the theme's icon
+        base_name = class_string[: -len("-alt")] if class_string and class_string.endswith("-alt") else class_string
+        if base_name in pack_icons:
+            source = ("pack", pack.path, pack_icons[base_name])
+        elif class_string in theme_icons:
+            source = ("file", theme_icons[class_string])
+        else:
+            source = None
+        rows.append((image_path, class_string, source))
+    return rows
+
+
+# Plan the Apply Icons job: icons to write, '-alt' conflicts and the new menu_class
+def plan_apply_icons(drive_letter, selected_theme, apply_to_all_themes, apply_to_all_resolutions, use_theme_icons, icon_dir=ICON_DIR, detect_contents=True, recolor=None, recolor_strength=1.0, memory_budget=DEFAULT_MEMORY_BUDGET, report=None):
+    report = report or RunReport("apply")
+    ventoy_dir = os.path.join(drive_root(drive_letter), "ventoy")
+    with report.stage("read_json"):
+        ventoy_json = read_ventoy_json(ventoy_dir)
+
+    with report.stage("collect_themes"):
+        theme_paths = collect_theme_paths(drive_letter, ventoy_json, selected_theme, apply_to_all_themes, apply_to_all_resolutions)
+    if theme_paths is None:
+        raise ValueError("No matching themes found to apply icons.")
+    report.count("theme_folders", len(theme_paths))
+
+    plan = new_plan("apply", ventoy_dir, ventoy_json, report)
+
+    # Get filenames with specified extensions from the selected drive
+    with report.stage("scan"):
+        store = PathStore.scan(drive_letter, IMAGE_EXTENSIONS, report=report)
+    files = store.file_names  # The matcher only needs the file names
+    report.count("images_found", len(files))
+
+    # Read the volume labels of the images so renamed or misleadingly named images get the right class
+    labels_by_file = {}
+    if detect_contents:
+        with report.stage("detect"):
+            labels_by_file, cache = detect_image_labels(store, read_state(ventoy_dir, "contents.json"))
+        if cache is not None:
+            plan["state"].append(("contents.json", cache))
+        report.count("images_detected", len(labels_by_file))
+
+    # Work out the icon size (and palette, when recoloring) of every theme folder first, so folders
+    # sharing them share one resize pass
+    icon_maps = []
+    targets_by_size = {}
+    with report.stage("icon_size"):
+        for theme_folder in theme_paths:
+            icons_path = os.path.join(theme_folder, "icons")
+
+            if not os.path.exists(icons_path):
+                plan["warnings"].append(f"No icons folder found in theme {os.path.basename(theme_folder)}. Skipping.")
+                continue
+
+            if use_theme_icons:
+                icon_map = {}
+                for icon_file in os.listdir(icons_path):
+                    if icon_file.lower().endswith(".png"):
+                        icon_name = os.path.splitext(icon_file)[0]
+                        icon_map[icon_name] = icon_name
+                icon_maps.append(icon_map)
+            else:
+                icon_size_value, warning = theme_icon_size(icons_path)
+                if warning:
+                    plan["warnings"].append(warning)
+                palette = None
+                if recolor:
+                    palette = sample_theme_palette(theme_folder)
+                    if palette is None:
+                        plan["warnings"].append(f"No background image found in theme {os.path.basename(theme_folder)}. Icons are not recolored.")
+                targets_by_size.setdefault((icon_size_value, palette), []).append(icons_path)
+
+    # One budget for the whole plan, the icons of every size stay in it until the plan is written
+    budget = MemoryBudget(memory_budget)
+    for (icon_size_value, palette), icons_paths in targets_by_size.items():
+        recolor_step = (recolor, palette, recolor_strength) if palette else None
+        size_icon_maps, steps, warnings = plan_icon_copies(icon_dir, icons_paths, (icon_size_value, icon_size_value), report, recolor_step, budget)
+        plan["warnings"].extend(warnings)
+        for step in steps:
+            if step["write"]:
+                plan["writes"].append(step["write"])
+                plan["sources"][step["write"][0]] = step["source"]
+            if step["remove"]:
+                plan["removes"].append(step["remove"])
+            if step["conflict"]:
+                plan["conflicts"].append({"icon": step["icon"], "class": step["class"], **step["conflict"]})
+        icon_maps.extend(size_icon_maps.values())
+
+    menu_class = ventoy_json.get("menu_class", [])
+    manifest = read_state(ventoy_dir, "manifest.json")
+    new_menu_class, new_manifest = plan_menu_class(store, icon_maps, labels_by_file, menu_class, manifest.get("menu_class"), report)
+
+    # An '-alt' icon no menu_class entry uses would only be pruned by gc again, so it is not written
+    used_classes = {entry.get("class") for entry in new_menu_class if isinstance(entry, dict)}
+    unused = [path for path, _ in plan["writes"] if os.path.splitext(os.path.basename(path))[0].endswith("-alt") and os.path.splitext(os.path.basename(path))[0] not in used_classes]
+    if unused:
+        unused = set(unused)
+        plan["writes"] = [write for write in plan["writes"] if write[0] not in unused]
+        for path in unused:
+            del plan["sources"][path]
+        report.count("unused_alt_icons_skipped", len(unused))
+
+    with report.stage("merge"):
+        plan["ventoy_json"] = {**ventoy_json, "menu_class": new_menu_class}
+        plan["diff"]["menu_class"] = diff_menu_entries(menu_class, new_menu_class)
+        plan["state"].append(("manifest.json", {**manifest, "menu_class": new_manifest}))
+    return plan
+
+
+# Plan the Rename job: the new menu_alias for (relative path, alias) pairs
+def plan_rename(drive_letter, aliases, report=None):
+    report = report or RunReport("rename")
+    ventoy_dir = os.path.join(drive_root(drive_letter), "ventoy")
+    with report.stage("read_json"):
+        ventoy_json = read_ventoy_json(ventoy_dir, True)
+
+    plan = new_plan("rename", ventoy_dir, ventoy_json, report)
+    with report.stage("merge"):
+        menu_alias = ventoy_json.get("menu_alias", [])
+        plan["ventoy_json"] = {**ventoy_json, "menu_alias": merge_menu_alias(menu_alias, aliases, drive_letter)}
+        plan["diff"]["menu_alias"] = diff_menu_entries(menu_alias, plan["ventoy_json"]["menu_alias"])
+    report.count("aliases", len(aliases))
+    return plan
+
+
+# Plan removing what ventoy.json and the icon folders no longer need, from a single walk of the volume:
+# entries whose image or folder is gone, menu_class entries whose class has no PNG in any icons folder,
+# and '-alt' icons no menu_class entry uses any more.
+def plan_gc(drive_letter, report=None):
+    report = report or RunReport("gc")
+    root = drive_root(drive_letter)
+    ventoy_dir = os.path.join(root, "ventoy")
+    with report.stage("read_json"):
+        ventoy_json = read_ventoy_json(ventoy_dir, True)
+    plan = new_plan("gc", ventoy_dir, ventoy_json, report)
+
+    # FAT is case-insensitive, so references are compared case-folded
+    paths = {"/"}
+    icon_files = {}  # icons folder -> PNG file names
+    with report.stage("scan"):
+        for folder, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in ("$RECYCLE.BIN", "System Volume Information")]
+            relative_folder = os.path.relpath(folder, root).replace(os.sep, "/")
+            relative_folder = "/" if relative_folder == "." else "/" + relative_folder
+            prefix = relative_folder.rstrip("/")
+            paths.add(relative_folder.casefold())
+            paths.update(f"{prefix}/{file}".casefold() for file in files)
+            if os.path.basename(folder).lower() == "icons" and os.path.relpath(folder, ventoy_dir).split(os.sep)[0] != "..":
+                icon_files[folder] = [file for file in files if file.lower().endswith(".png")]
+            report.count("files_scanned", len(files))
+    classes = {os.path.splitext(file)[0] for files in icon_files.values() for file in files}
+
+    # menu_class keys match a substring of an image file name; one string keeps the lookups in C
+    image_names = "\n".join(path.rsplit("/", 1)[-1] for path in paths if path.endswith(IMAGE_EXTENSIONS))
+
+    def is_dead(entry):
+        for field in ("image", "dir", "parent"):
+            target = entry.get(field)
+            if isinstance(target, str) and "*" not in target:
+                return (target.rstrip("/") or "/").casefold() not in paths
+        key = entry.get("key")
+        return isinstance(key, str) and bool(key) and key.casefold() not in image_names
+
+    removed = {"dead_references": 0, "missing_icons": 0, "unused_alt_icons": 0}
+    new_json = dict(ventoy_json)
+    with report.stage("check"):
+        for section, entries in ventoy_json.items():
+            if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+                continue
+            kept = []
+            for entry in entries:
+                if is_dead(entry):
+                    removed["dead_references"] += 1
+                elif section.startswith("menu_class") and classes and entry.get("class") not in classes:
+                    removed["missing_icons"] += 1  # Without any icons folder there is nothing to check against
+                else:
+                    kept.append(entry)
+            if len(kept) != len(entries):
+                new_json[section] = kept
+                plan["diff"][section] = diff_menu_entries(entries, kept)
+
+        used_classes = {entry.get("class") for section, entries in new_json.items() if section.startswith("menu_class") and isinstance(entries, list) for entry in entries if isinstance(entry, dict)}
+        for folder, files in icon_files.items():
+            for file in files:
+                icon_name = os.path.splitext(file)[0]
+                if icon_name.endswith("-alt") and icon_name not in used_classes:
+                    plan["removes"].append(os.path.join(folder, file))
+                    removed["unused_alt_icons"] += 1
+    plan["ventoy_json"] = new_json
+
+    # Forget pruned entries in the manifest, so they are not mistaken for generated ones if they come back
+    manifest = read_state(ventoy_dir, "manifest.json")
+    if manifest.get("menu_class"):
+        remaining = {generated_key(entry) for entry in new_json.get("menu_class", []) if isinstance(entry, dict)}
+        owned = {key: class_string for key, class_string in manifest["menu_class"].items() if key in remaining}
+        if owned != manifest["menu_class"]:
+            plan["state"].append(("manifest.json", {**manifest, "menu_class": owned}))
+
+    for name, amount in removed.items():
+        report.count(name, amount)
+    return plan
+
+
+# Bytes the journal of a plan writes before the run starts and the syncs of its log, see Journal
+def journal_cost(plan):
+    journal_bytes = len(json.dumps(plan["original_json"])) + len(json.dumps(plan["ventoy_json"])) + len(json.dumps(plan["sources"]))
+    for path, data in plan["writes"]:
+        journal_bytes += 100 + (0 if path in plan["sources"] else len(data))
+    for path in [path for path, _ in plan["writes"]] + plan["removes"]:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        journal_bytes += size if size <= JOURNAL_BACKUP_LIMIT else 0
+    operations = len(plan["writes"]) + len(plan["removes"]) + 1
+    return journal_bytes, -(-operations // JOURNAL_SYNC_OPERATIONS) + 2
+
+
+# Estimate how long writing the plan will take on the volume, journal included. A dry run or preview
+# must not write to the drive, so unless probe is set it only uses a profile measured earlier or saved by
+# `probe`.
+def estimate_plan(plan, probe=False):
+    json_bytes = len(json.dumps(plan["ventoy_json"], indent=4))
+    journal_bytes, journal_syncs = journal_cost(plan)
+    total_bytes = sum(len(data) for _, data in plan["writes"]) + json_bytes + journal_bytes
+    files = len(plan["writes"]) + 1
+    with plan["report"].stage("probe"):
+        profile = volume_profile(plan["ventoy_dir"], probe) or saved_volume_profile(plan["ventoy_dir"])
+    schedule = io_schedule(profile)
+
+    seconds = None
+    if profile:
+        seconds = files * profile["latency"] / schedule["workers"] + journal_syncs * profile["latency"] + total_bytes / profile["sequential_throughput"]
+
+    plan["estimate"] = {
+        "files": files,
+        "bytes": total_bytes,
+        "journal_bytes": journal_bytes,
+        "profile": profile,
+        "schedule": schedule,
+        "seconds": seconds,
+    }
+    return plan["estimate"]
+
+
+# I/O schedule for executing a plan; small plans skip the probe and use the defaults
+def plan_schedule(plan):
+    if plan["estimate"] and plan["estimate"]["profile"]:
+        return plan["estimate"]["schedule"]
+    if len(plan["writes"]) < 32:
+        return io_schedule()
+    with plan["report"].stage("probe"):
+        return io_schedule(volume_profile(plan["ventoy_dir"]))
+
+
+# Short human readable summary of a plan
+def summarize_plan(plan):
+    lines = []
+    if plan["report"].command == "resume":
+        lines.append(f"Finishing an interrupted {plan['kind']} run, {plan['report'].counters.get('steps_skipped', 0)} finished steps are skipped")
+        lines.append(f"Files to write: {len(plan['writes'])}")
+        lines.append(f"Files to remove: {len(plan['removes'])}")
+    elif plan["kind"] == "apply":
+        lines.append(f"Icons to write: {len(plan['writes'])}")
+        lines.append(f"Icons to remove: {len(plan['removes'])}")
+        alt_count = sum(1 for conflict in plan["conflicts"] if conflict["class"].endswith("-alt"))
+        lines.append(f"Conflicts with existing icons: {len(plan['conflicts'])} ({alt_count} kept as '-alt')")
+    elif plan["kind"] == "gc":
+        counters = plan["report"].counters
+        lines.append(f"Entries pointing at missing images or folders: {counters.get('dead_references', 0)}")
+        lines.append(f"menu_class entries without an icon: {counters.get('missing_icons', 0)}")
+        lines.append(f"Unused '-alt' icons to remove: {counters.get('unused_alt_icons', 0)}")
+    elif plan["kind"] == "duplicates":
+        freed = plan["report"].counters.get("bytes_freed", 0)
+        lines.append(f"Duplicate copies to remove: {len(plan['removes'])} ({format_size(freed)} freed)")
+
+    for section, diff in plan["diff"].items():
+        lines.append(f"{section}: {len(diff['added'])} added, {len(diff['changed'])} changed, {len(diff['removed'])} removed")
+
+    estimate = plan["estimate"]
+    if estimate:
+        line = f"Data to write: {format_size(estimate['bytes'])} in {estimate['files']} files ({format_size(estimate['journal_bytes'])} of it journal)"
+        if estimate["seconds"] is not None:
+            profile = estimate["profile"]
+            line += f", about {estimate['seconds']:.1f}s with {estimate['schedule']['workers']} writer(s)"
+            line += f" ({profile['latency'] * 1000:.1f} ms per file, {format_size(profile['sequential_throughput'])}/s sequential)"
+        else:
+            line += ", write time unknown until the drive is probed ('ventoy-assist probe')"
+        lines.append(line)
+    return lines
+
+
+# Full text report of a plan, for the dry run output and the preview dialog
+def format_plan(plan):
+    lines = summarize_plan(plan)
+
+    if plan["writes"]:
+        lines.append("")
+        lines.append("Files to write:")
+        lines.extend(f"  {path} ({format_size(len(data))})" for path, data in plan["writes"])
+    if plan["removes"]:
+        lines.append("")
+        lines.append("Files to remove:")
+        lines.extend(f"  {path}" for path in plan["removes"])
+    if plan["conflicts"]:
+        lines.append("")
+        lines.append("Conflicts:")
+        for conflict in plan["conflicts"]:
+            similarity = "unknown" if conflict["similarity"] is None else f"{conflict['similarity']:.0f}%"
+            lines.append(f"  {conflict['path']}: similarity {similarity}, using '{conflict['class']}'")
+
+    for section, diff in plan["diff"].items():
+        for label, entries in (("added", diff["added"]), ("removed", diff["removed"])):
+            if entries:
+                lines.append("")
+                lines.append(f"{section} {label}:")
+                lines.extend(f"  {json.dumps(entry)}" for entry in entries)
+        if diff["changed"]:
+            lines.append("")
+            lines.append(f"{section} changed:")
+            lines.extend(f"  {json.dumps(old)} -> {json.dumps(new)}" for old, new in diff["changed"])
+
+    if plan["warnings"]:
+        lines.append("")
+        lines.append("Warnings:")
+        lines.extend(f"  {warning}" for warning in plan["warnings"])
+    return "\n".join(lines)
+
+
+# Execute exactly the changes recorded in a plan, ventoy.json is written last
+def execute_plan(plan):
+    report = plan["report"]
+    schedule = plan_schedule(plan)
+    with report.stage("journal"):
+        journal = Journal.begin(plan)
+    with report.stage("write_files"):
+        warnings = write_plan_files(plan["writes"], plan["removes"], schedule, journal.mark)
+    report.count("files_written", len(plan["writes"]))
+    report.count("files_removed", len(plan["removes"]))
+    report.count("bytes_written", sum(len(data) for _, data in plan["writes"]))
+
+    with report.stage("save_json"):
+        ventoy_json_path = write_ventoy_json(plan["ventoy_dir"], plan["ventoy_json"], schedule["buffer_size"])
+    report.count("bytes_written", os.path.getsize(ventoy_json_path))
+    journal.mark(["json"])
+
+    # Caches are best effort, a failed save only costs the next run some reads
+    for name, state in plan["state"]:
+        try:
+            write_state(plan["ventoy_dir"], name, state)
+        except OSError as e:
+            warnings.append(f"Failed to save {name}: {e}.")
+    journal.finish()
+    return ventoy_json_path, warnings
+
+
+# Files up to this size are backed up in the journal before they are overwritten or removed
+JOURNAL_BACKUP_LIMIT = 1024 * 1024
+# Finished operations are logged one by one and made durable every this many, so a resume redoes at most
+# this many files
+JOURNAL_SYNC_OPERATIONS = 8
+
+
+# Write-ahead journal of a plan on the volume. Before anything is touched, the steps go to journal.json:
+# icons by the source they are built from and the digest of their bytes, other writes with their bytes
+# in journal.data, plus a backup of every small file a step overwrites or removes. Finished operations
+# are appended to journal.log. An interrupted run can then be finished from the journal without
+# planning again, or rolled back.
+class Journal:
+    def __init__(self, ventoy_dir):
+        self.ventoy_dir = ventoy_dir
+        self.lock = threading.Lock()
+        self.log = None
+        self.unsynced = 0
+
+    # Relative path with '/' of a file on the volume, so the journal survives a new drive letter
+    def relative(self, path):
+        return os.path.relpath(path, os.path.dirname(self.ventoy_dir)).replace(os.sep, "/")
+
+    def absolute(self, relative_path):
+        return os.path.join(os.path.dirname(self.ventoy_dir), relative_path.replace("/", os.sep))
+
+    @classmethod
+    def begin(cls, plan):
+        journal = cls(plan["ventoy_dir"])
+        steps = []
+        os.makedirs(os.path.dirname(state_path(plan["ventoy_dir"], "journal.data")), exist_ok=True)
+        with open(state_path(plan["ventoy_dir"], "journal.data"), "wb") as data_file:
+
+            def append(data):
+                offset = data_file.tell()
+                data_file.write(data)
+                return [offset, len(data)]
+
+            def backup(step, path):
+                try:
+                    if os.path.getsize(path) <= JOURNAL_BACKUP_LIMIT:
+                        with open(path, "rb") as original:
+                            step["backup"] = append(original.read())
+                    else:
+                        step["backup"] = None  # Too large to keep, this step cannot be rolled back
+                except OSError:
+                    pass  # No file to back up, rolling back means removing the new one
+
+            for path, data in plan["writes"]:
+                step = {"op": "write", "path": journal.relative(path)}
+                if path in plan["sources"]:
+                    step["source"] = plan["sources"][path]
+                    step["sha256"] = hashlib.sha256(plan_bytes(data)).hexdigest()
+                else:
+                    step["data"] = append(plan_bytes(data))
+                backup(step, path)
+                steps.append(step)
+            for path in plan["removes"]:
+                step = {"op": "remove", "path": journal.relative(path)}
+                backup(step, path)
+                steps.append(step)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+
+        header = {
+            "kind": plan["kind"],
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "steps": steps,
+            "original_json": plan["original_json"],
+            "ventoy_json": plan["ventoy_json"],
+            "state": plan["state"],
+        }
+        write_state(plan["ventoy_dir"], "journal.json", header)
+        journal.log = open(state_path(plan["ventoy_dir"], "journal.log"), "w")
+        return journal
+
+    # Record finished operations ("write <path>", "remove <path>", "json"), durable every few operations
+    # and always after the ventoy.json one
+    def mark(self, operations):
+        with self.lock:
+            for operation in operations:
+                kind, _, path = operation.partition(" ")
+                self.log.write(f"{kind} {self.relative(path)}\n" if path else f"{kind}\n")
+            self.log.flush()
+            self.unsynced += len(operations)
+            if self.unsynced >= JOURNAL_SYNC_OPERATIONS or "json" in operations:
+                os.fsync(self.log.fileno())
+                self.unsynced = 0
+
+    # The run finished, the journal is no longer needed
+    def finish(self):
+        self.log.close()
+        for name in ("journal.json", "journal.log", "journal.data"):
+            try:
+                os.remove(state_path(self.ventoy_dir, name))
+            except OSError:
+                pass
+
+
+# The journal of an interrupted run on a volume with the set of finished operations, None if there is none
+def read_journal(ventoy_dir):
+    header = read_state(ventoy_dir, "journal.json")
+    if not header.get("steps") and "ventoy_json" not in header:
+        return None
+    try:
+        with open(state_path(ventoy_dir, "journal.log"), "r") as log_file:
+            header["done"] = set(log_file.read().splitlines())
+    except OSError:
+        header["done"] = set()
+    return header
+
+
+def read_journal_data(ventoy_dir, location):
+    offset, size = location
+    with open(state_path(ventoy_dir, "journal.data"), "rb") as data_file:
+        data_file.seek(offset)
+        return data_file.read(size)
+
+
+# Plan that finishes an interrupted run: only the steps the journal has not seen finish. Icons are built
+# again from their source and must match the journal's digest; nothing is compared or matched again.
+def plan_resume(drive_letter, report=None):
+    ventoy_dir = os.path.join(drive_root(drive_letter), "ventoy")
+    journal_state = read_journal(ventoy_dir)
+    if journal_state is None:
+        raise FileNotFoundError("No interrupted run found on this drive.")
+    report = report or RunReport("resume")
+    journal = Journal(ventoy_dir)
+
+    plan = new_plan(journal_state["kind"], ventoy_dir, journal_state["original_json"], report)
+    plan["ventoy_json"] = journal_state["ventoy_json"]
+    plan["state"] = [tuple(state) for state in journal_state["state"]]
+    for step in journal_state["steps"]:
+        path = journal.absolute(step["path"])
+        # A half written '.part' file is the partial step, it is redone from the journal
+        if os.path.exists(path + ".part"):
+            os.remove(path + ".part")
+        if f"{step['op']} {step['path']}" in journal_state["done"]:
+            report.count("steps_skipped")
+        elif step["op"] == "write" and "source" in step:
+            try:
+                with report.stage("resize"):
+                    data = build_icon_png(step["source"])
+            except Exception as e:
+                plan["warnings"].append(f"Failed to build {step['path']} again: {e}. Run Apply Icons again to write it.")
+                continue
+            if hashlib.sha256(data).hexdigest() != step["sha256"]:
+                plan["warnings"].append(f"The icon pack of {step['path']} changed since the run started. Run Apply Icons again to write it.")
+                continue
+            plan["writes"].append((path, data))
+            plan["sources"][path] = step["source"]
+        elif step["op"] == "write":
+            plan["writes"].append((path, read_journal_data(ventoy_dir, step["data"])))
+        elif os.path.exists(path):
+            plan["removes"].append(path)
+    for section in ("menu_class", "menu_alias"):
+        if journal_state["original_json"].get(section) != journal_state["ventoy_json"].get(section):
+            plan["diff"][section] = diff_menu_entries(journal_state["original_json"].get(section, []), journal_state["ventoy_json"].get(section, []))
+    return plan
+
+
+# Undo an interrupted run: restore the backed up files, remove the files it created and put the
+# original ventoy.json back. Returns warnings for steps that could not be undone.
+def rollback_journal(drive_letter):
+    ventoy_dir = os.path.join(drive_root(drive_letter), "ventoy")
+    journal_state = read_journal(ventoy_dir)
+    if journal_state is None:
+        raise FileNotFoundError("No interrupted run found on this drive.")
+    journal = Journal(ventoy_dir)
+
+    warnings = []
+    for step in journal_state["steps"]:
+        path = journal.absolute(step["path"])
+        try:
+            if os.path.exists(path + ".part"):
+                os.remove(path + ".part")
+            if step.get("backup"):
+                with open(path + ".part", "wb") as file_out:
+                    file_out.write(read_journal_data(ventoy_dir, step["backup"]))
+                os.replace(path + ".part", path)
+            elif "backup" in step:
+                warnings.append(f"{step['path']} was too large to back up and cannot be restored.")
+            elif step["op"] == "write" and os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            warnings.append(f"Failed to restore {step['path']}: {e}.")
+
+    write_ventoy_json(ventoy_dir, journal_state["original_json"])
+    journal.log = open(state_path(ventoy_dir, "journal.log"), "a")
+    journal.finish()
+    return warnings
+
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+CHECKSUM_FILE_NAMES = ("sha256sums", "sha256sums.txt", "sha256sum.txt", "checksums.sha256")
+# "<digest> *name" (sha256sum) and "SHA256 (name) = <digest>" (BSD, Fedora CHECKSUM) lines
+CHECKSUM_LINE = re.compile(r"^(?:([0-9a-fA-F]{64})\s+\*?(.+)|SHA256 \((.+)\) = ([0-9a-fA-F]{64}))$")
+
+
+# Expected SHA-256 digests of images from .sha256 files and SHA256SUMS files next to them, by image path
+def find_expected_digests(image_files):
+    expected = {}
+    images_by_dir = {}
+    for image_file in image_files:
+        images_by_dir.setdefault(os.path.dirname(image_file), {})[os.path.basename(image_file).lower()] = image_file
+
+    for folder, images in images_by_dir.items():
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            continue
+        for name in names:
+            lower = name.lower()
+            if lower not in CHECKSUM_FILE_NAMES and not lower.endswith(".sha256") and not (lower.endswith("-checksum") or lower.endswith("_checksum")):
+                continue
+            try:
+                with open(os.path.join(folder, name), "r", errors="replace") as checksum_file:
+                    lines = checksum_file.read().splitlines()
+            except OSError:
+                continue
+
+            for line in lines:
+                line = line.strip()
+                match = CHECKSUM_LINE.match(line)
+                if match:
+                    digest = match.group(1) or match.group(4)
+                    listed = os.path.basename((match.group(2) or match.group(3)).strip().replace("\\", "/")).lower()
+                    if listed in images:
+                        expected[images[listed]] = digest.lower()
+                elif len(line) == 64 and lower.endswith(".sha256") and lower[:-7] in images:
+                    # A bare digest in "<image>.sha256"
+                    expected[images[lower[:-7]]] = line.lower()
+    return expected
+
+
+# SHA-256 of a file read in large sequential chunks into one reused buffer
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE, report=None):
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as image:
+        while True:
+            size = image.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])  # hashlib releases the GIL for large updates, so workers overlap
+            if report:
+                report.count("bytes_hashed", size)
+    return digest.hexdigest()
+
+
+# Verify the images of a volume against their checksum files. Digests are cached in the sidecar by
+# (size, mtime) and saved after every image, so an interrupted run resumes with the images left.
+# Returns a list of {path, status, expected, actual} with status ok, mismatch, unlisted or error.
+def verify_images(drive_letter, hash_all=False, report=None, log=None):
+    report = report or RunReport("verify")
+    root = drive_root(drive_letter)
+    ventoy_dir = os.path.join(root, "ventoy")
+    with report.stage("scan"):
+        image_files = sorted(find_image_files(root, IMAGE_EXTENSIONS, report))
+    report.count("images_found", len(image_files))
+    with report.stage("find_checksums"):
+        expected = find_expected_digests(image_files)
+    report.count("images_listed", len(expected))
+
+    cache = read_state(ventoy_dir, "checksums.json")
+    results = {}
+    to_hash = []
+    for image_file in image_files:
+        relative_path = os.path.relpath(image_file, root).replace(os.sep, "/")
+        result = {"path": relative_path, "status": "unlisted", "expected": expected.get(image_file), "actual": None}
+        results[image_file] = result
+        if image_file not in expected and not hash_all:
+            continue
+        try:
+            stat = os.stat(image_file)
+        except OSError as e:
+            result["status"] = "error"
+            result["error"] = str(e)
+            continue
+        entry = cache.get(relative_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            result["actual"] = entry["sha256"]
+            report.count("images_cached")
+        else:
+            to_hash.append((image_file, relative_path, stat))
+
+    # Biggest images first, so one large image does not start last and hold up the whole run
+    to_hash.sort(key=lambda item: -item[2].st_size)
+    with report.stage("probe"):
+        schedule = io_schedule(volume_profile(root) if to_hash else None)
+    report.count("read_workers", schedule["read_workers"])
+
+    def hash_image(item):
+        image_file, _, _ = item
+        try:
+            return hash_file(image_file, report=report), None
+        except OSError as e:
+            return None, str(e)
+
+    save_lock = threading.Lock()
+    with report.stage("hash"), ThreadPoolExecutor(max_workers=schedule["read_workers"]) as executor:
+        for (image_file, relative_path, stat), (digest, error) in zip(to_hash, executor.map(hash_image, to_hash)):
+            result = results[image_file]
+            if error:
+                result["status"] = "error"
+                result["error"] = error
+                continue
+            result["actual"] = digest
+            with save_lock:
+                cache[relative_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+                try:
+                    write_state(ventoy_dir, "checksums.json", cache)
+                except OSError:
+                    pass  # A read-only stick still verifies, it just cannot resume
+            if log:
+                log(f"Hashed {relative_path}")
+    report.count("images_hashed", len(to_hash))
+
+    for result in results.values():
+        if result["status"] == "error" or result["expected"] is None:
+            continue
+        result["status"] = "ok" if result["actual"] == result["expected"] else "mismatch"
+    return list(results.values())
+
+
+DUPLICATE_SAMPLE_SIZE = 64 * 1024
+
+
+# Hash of the head, middle and tail of a file, cheap enough to run on every same-size candidate
+def sample_hash(path, size):
+    digest = hashlib.sha256()
+    with open(path, "rb", buffering=0) as image:
+        for offset in sorted({0, max(size // 2 - DUPLICATE_SAMPLE_SIZE // 2, 0), max(size - DUPLICATE_SAMPLE_SIZE, 0)}):
+            image.seek(offset)
+            digest.update(image.read(DUPLICATE_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+# Find images stored more than once: bucket by size, then by sampled hash, and fully hash only what is
+# left. Full digests share the checksums.json cache with verify_images.
+# Returns groups of relative paths, shallowest and shortest path first, largest images first and then by
+# that first path.
+def find_duplicates(drive_letter, report=None):
+    report = report or RunReport("duplicates")
+    root = drive_root(drive_letter)
+    ventoy_dir = os.path.join(root, "ventoy")
+    with report.stage("scan"):
+        store = PathStore.scan(drive_letter, IMAGE_EXTENSIONS, skip_dirs=("$RECYCLE.BIN",), report=report)
+    report.count("images_found", len(store.file_names))
+
+    by_size = {}
+    for file_id in range(len(store.file_names)):
+        path = store.full_path(file_id)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_size:
+            by_size.setdefault(stat.st_size, []).append((store.display_path(file_id), path, stat))
+    candidates = [files for files in by_size.values() if len(files) > 1]
+    report.count("size_candidates", sum(len(files) for files in candidates))
+
+    cache = read_state(ventoy_dir, "checksums.json")
+    schedule = io_schedule()
+
+    def cached_digest(relative_path, stat):
+        entry = cache.get(relative_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        return None
+
+    # Images with a cached full digest skip the sampling, the others are split by their sampled hash
+    def sample_key(item):
+        relative_path, path, stat = item
+        digest = cached_digest(relative_path, stat)
+        if digest:
+            return ("full", digest)
+        try:
+            return ("sample", sample_hash(path, stat.st_size))
+        except OSError:
+            return None
+
+    groups_to_hash = []
+    with report.stage("sample"), ThreadPoolExecutor(max_workers=8) as executor:
+        for files in candidates:
+            by_sample = {}
+            for item, key in zip(files, executor.map(sample_key, files)):
+                if key is not None:
+                    by_sample.setdefault(key[1] if key[0] == "sample" else None, []).append(item)
+            # Cached full digests cannot be compared with samples, so they stay with every sample bucket
+            known = by_sample.pop(None, [])
+            if not by_sample and len(known) > 1:
+                groups_to_hash.append(known)
+            for items in by_sample.values():
+                if len(items) + len(known) > 1:
+                    groups_to_hash.append(items + known)
+    report.count("sample_candidates", sum(len(items) for items in groups_to_hash))
+
+    to_hash = {item[0]: item for items in groups_to_hash for item in items if not cached_digest(item[0], item[2])}
+    if len(to_hash) > 1:
+        with report.stage("probe"):
+            schedule = io_schedule(volume_profile(root))
+
+    def full_digest(item):
+        try:
+            return hash_file(item[1], report=report)
+        except OSError:
+            return None
+
+    with report.stage("hash"), ThreadPoolExecutor(max_workers=schedule["read_workers"]) as executor:
+        for (relative_path, _, stat), digest in zip(to_hash.values(), executor.map(full_digest, to_hash.values())):
+            if digest:
+                cache[relative_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+                try:
+                    write_state(ventoy_dir, "checksums.json", cache)
+                except OSError:
+                    pass
+    report.count("images_hashed", len(to_hash))
+
+    duplicates = {}
+    for items in groups_to_hash:
+        for relative_path, _, stat in items:
+            digest = cached_digest(relative_path, stat)
+            if digest:
+                duplicates.setdefault((stat.st_size, digest), set()).add(relative_path)
+
+    groups = []
+    for (size, _), paths in duplicates.items():
+        if len(paths) > 1:
+            groups.append({"size": size, "paths": sorted(paths, key=lambda path: (path.count("/"), len(path), path.lower()))})
+    # Same-size groups keep a stable order too, by the copy that is kept
+    groups.sort(key=lambda group: (-group["size"], group["paths"][0]))
+    report.count("duplicate_groups", len(groups))
+    return groups
+
+
+# Plan removing all but one copy of every duplicate group. The copy that ventoy.json already refers to
+# is kept, entries of the removed copies are re-pointed to it (or dropped if it has its own).
+def plan_remove_duplicates(drive_letter, groups, report=None):
+    report = report or RunReport("duplicates")
+    root = drive_root(drive_letter)
+    ventoy_dir = os.path.join(root, "ventoy")
+    with report.stage("read_json"):
+        ventoy_json = read_ventoy_json(ventoy_dir, True)
+    plan = new_plan("duplicates", ventoy_dir, ventoy_json, report)
+
+    referenced = {entry["image"] for section in ventoy_json.values() if isinstance(section, list) for entry in section if isinstance(entry, dict) and "image" in entry}
+    keep_for = {}  # "/path" of a removed copy -> "/path" of the kept copy
+    for group in groups:
+        images = ["/" + path for path in group["paths"]]
+        keep = next((image for image in images if image in referenced), images[0])
+        for image in images:
+            if image != keep:
+                keep_for[image] = keep
+                plan["removes"].append(os.path.join(root, image[1:].replace("/", os.sep)))
+    report.count("bytes_freed", sum(group["size"] * (len(group["paths"]) - 1) for group in groups))
+
+    # Keys equal to a removed file name (added by content detection) move to the kept file name
+    keep_name_for = {os.path.basename(image): os.path.basename(keep) for image, keep in keep_for.items()}
+
+    with report.stage("merge"):
+        new_json = dict(ventoy_json)
+        for section, entries in ventoy_json.items():
+            if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+                continue
+            existing = {menu_entry_id(entry) for entry in entries}
+            new_entries = []
+            for entry in entries:
+                if entry.get("image") in keep_for:
+                    entry = {**entry, "image": keep_for[entry["image"]]}
+                elif section == "menu_class" and entry.get("key") in keep_name_for:
+                    entry = {**entry, "key": keep_name_for[entry["key"]]}
+                else:
+                    new_entries.append(entry)
+                    continue
+                if menu_entry_id(entry) not in existing:
+                    existing.add(menu_entry_id(entry))
+                    new_entries.append(entry)
+            if new_entries != entries:
+                new_json[section] = new_entries
+                plan["diff"][section] = diff_menu_entries(entries, new_entries)
+        plan["ventoy_json"] = new_json
+    return plan
+
+
+# Folders and files replicate leaves alone: system folders, our own caches and ventoy.json (merged instead)
+REPLICATE_SKIP_DIRS = ("$RECYCLE.BIN", "System Volume Information", ".ventoy-assist")
+MTIME_TOLERANCE_NS = 2 * 10**9  # FAT stores modification times in 2 second steps
+
+
+# Files of the source layout that are missing or different on the target, as (relative path, size).
+# Files compare by size and modification time, or by size and SHA-256 with use_hash.
+def diff_layout(source_root, target_root, use_hash=False, report=None):
+    changes = []
+    for root, dirs, files in os.walk(source_root):
+        dirs[:] = [d for d in dirs if d not in REPLICATE_SKIP_DIRS]
+        for file in files:
+            source_path = os.path.join(root, file)
+            relative_path = os.path.relpath(source_path, source_root)
+            if relative_path == os.path.join("ventoy", "ventoy.json"):
+                continue
+            source_stat = os.stat(source_path)
+            try:
+                target_stat = os.stat(os.path.join(target_root, relative_path))
+            except OSError:
+                changes.append((relative_path, source_stat.st_size))
+                continue
+
+            if target_stat.st_size != source_stat.st_size:
+                changes.append((relative_path, source_stat.st_size))
+            elif use_hash:
+                if hash_file(source_path, report=report) != hash_file(os.path.join(target_root, relative_path), report=report):
+                    changes.append((relative_path, source_stat.st_size))
+            elif abs(target_stat.st_mtime_ns - source_stat.st_mtime_ns) > MTIME_TOLERANCE_NS:
+                changes.append((relative_path, source_stat.st_size))
+    return changes
+
+
+# Copy one file with the kernel doing the work where it can, then carry over the modification time
+def copy_file(source_path, target_path, buffer_size=4 * 1024 * 1024):
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    size = os.path.getsize(source_path)
+    with open(source_path, "rb", buffering=0) as source, open(target_path, "wb", buffering=0) as target:
+        copied = 0
+        if hasattr(os, "copy_file_range"):
+            try:
+                while copied < size:
+                    sent = os.copy_file_range(source.fileno(), target.fileno(), size - copied)
+                    if not sent:
+                        break
+                    copied += sent
+            except OSError:
+                source.seek(copied)  # Not supported between these filesystems, finish with plain reads
+                target.seek(copied)
+
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        while copied < size:
+            read = source.readinto(buffer)
+            if not read:
+                break
+            target.write(view[:read])
+            copied += read
+    source_stat = os.stat(source_path)
+    os.utime(target_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    return copied
+
+
+# Merge the source ventoy.json into the target one: source settings win, menu lists are combined
+def merge_ventoy_json(target_json, source_json):
+    merged = dict(target_json)
+    for section, entries in source_json.items():
+        target_entries = target_json.get(section)
+        if isinstance(entries, list) and isinstance(target_entries, list) and all(isinstance(entry, dict) for entry in entries + target_entries):
+            # Entries the target has on its own are kept, entries for the same image, folder or key come from the source
+            source_ids = {menu_entry_id(entry) for entry in entries}
+            combined = [entry for entry in target_entries if menu_entry_id(entry) is None or menu_entry_id(entry) not in source_ids] + entries
+            merged[section] = merge_menu_class(combined, []) if section == "menu_class" else combined
+        else:
+            merged[section] = entries
+    return merged
+
+
+# Generated menu_class entries of the merged ventoy.json: the source's own for the entries that came from
+# it, the target's for the entries it kept
+def merge_manifest_menu_class(target_owned, source_owned, source_json, merged_json):
+    source_keys = {generated_key(entry) for entry in source_json.get("menu_class", []) if isinstance(entry, dict)}
+    remaining = {generated_key(entry) for entry in merged_json.get("menu_class", []) if isinstance(entry, dict)}
+    owned = {key: class_string for key, class_string in target_owned.items() if key not in source_keys}
+    owned.update(source_owned)
+    return {key: class_string for key, class_string in owned.items() if key in remaining}
+
+
+# Bring one target in line with the source layout; returns a summary dict of the run on that target
+def replicate_to(source_root, target_root, use_hash=False, dry_run=False, report=None, log=None):
+    report = report or RunReport("replicate")
+    result = {"target": target_root, "files": [], "bytes": 0, "copied": 0, "errors": []}
+    with report.stage("diff"):
+        changes = diff_layout(source_root, target_root, use_hash, report)
+    result["files"] = [relative_path for relative_path, _ in changes]
+    result["bytes"] = sum(size for _, size in changes)
+    if dry_run:
+        return result
+
+    schedule = io_schedule(volume_profile(target_root)) if changes else io_schedule()
+    # Small files first so the menu and themes are complete early, then the images
+    for relative_path, size in sorted(changes, key=lambda change: change[1]):
+        try:
+            with report.stage("copy"):
+                copy_file(os.path.join(source_root, relative_path), os.path.join(target_root, relative_path), schedule["buffer_size"])
+            report.count("files_copied")
+            report.count("bytes_copied", size)
+            result["copied"] += 1
+            if log:
+                log(f"{target_root}: copied {relative_path}")
+        except OSError as e:
+            result["errors"].append(f"Failed to copy {relative_path}: {e}.")
+
+    source_ventoy_dir = os.path.join(source_root, "ventoy")
+    target_ventoy_dir = os.path.join(target_root, "ventoy")
+    try:
+        with report.stage("merge_json"):
+            source_json = read_ventoy_json(source_ventoy_dir, True)
+            try:
+                target_json = read_ventoy_json(target_ventoy_dir, True)
+            except FileNotFoundError:
+                target_json = {}
+            merged = merge_ventoy_json(target_json, source_json)
+            if merged != target_json:
+                os.makedirs(target_ventoy_dir, exist_ok=True)
+                write_ventoy_json(target_ventoy_dir, merged, schedule["buffer_size"])
+            # .ventoy-assist is not copied, so the target's manifest learns which merged entries were generated
+            target_manifest = read_state(target_ventoy_dir, "manifest.json")
+            owned = merge_manifest_menu_class(target_manifest.get("menu_class", {}), read_state(source_ventoy_dir, "manifest.json").get("menu_class", {}), source_json, merged)
+            if owned != target_manifest.get("menu_class", {}):
+                write_state(target_ventoy_dir, "manifest.json", {**target_manifest, "menu_class": owned})
+    except (OSError, ValueError) as e:
+        result["errors"].append(f"Failed to merge ventoy.json: {e}")
+    return result
+
+
+# Replicate one curated drive to several others, every target on its own thread
+def replicate(source_drive, target_drives, use_hash=False, dry_run=False, report=None, log=None):
+    report = report or RunReport("replicate")
+    source_root = drive_root(source_drive)
+    if not os.path.isdir(os.path.join(source_root, "ventoy")):
+        raise FileNotFoundError(f"No ventoy folder found on {source_drive}")
+
+    with ThreadPoolExecutor(max_workers=max(len(target_drives), 1)) as executor:
+        futures = [executor.submit(replicate_to, source_root, drive_root(target), use_hash, dry_run, report, log) for target in target_drives]
+        return [future.result() for future in futures]
+
+
+# Icon map of an icons folder that already has icons applied, 'name-alt.png' wins over 'name.png'
+def icon_map_from_folder(icons_path):
+    icon_names = {os.path.splitext(f)[0] for f in os.listdir(icons_path) if f.lower().endswith(".png")}
+    icon_map = {}
+    for icon_name in icon_names:
+        if icon_name.endswith("-alt"):
+            continue
+        icon_map[icon_name] = f"{icon_name}-alt" if f"{icon_name}-alt" in icon_names else icon_name
+    return icon_map
+
+
+# Keeps menu_class in step with the image files of a volume by running only the matcher on changed files
+class MenuClassSync:
+    def __init__(self, drive_letter, icon_maps):
+        self.root = drive_root(drive_letter)
+        self.ventoy_dir = os.path.join(self.root, "ventoy")
+        self.icon_maps = icon_maps
+        self.matches_by_path = {}  # Image path from the drive root -> its (key, class) matches
+        self.match_counts = collections.Counter()  # (key, class) -> images it matches
+        self.names = collections.Counter()  # Image file names, keeps Apply's content-detected entries alive
+        self.content_keys = set()  # Manifest keys counted through self.names at the last full update
+        self.generated = None  # Minimal entries of the last full update
+        self.classes = {}  # Key -> class of every match and hand-written key at the last full update
+        self.entries = {}  # Key -> class of the generated and hand-written keys in ventoy.json
+        self.parents = {}  # Folder -> class of the generated folder entries
+
+    def matches(self, files):
+        matching_tools = []
+        for icon_map in self.icon_maps:
+            matching_tools.extend(get_matching_tools(files, icon_map))
+        return matching_tools
+
+    def image_path(self, file):
+        return "/" + os.path.relpath(file, self.root).replace(os.sep, "/")
+
+    # Count the matches of the images already on the volume and add any entry that is missing
+    def start(self, files):
+        return self.update(files, [], initial=True)
+
+    # Whether the entries of the last full update still give a new image the class a full update would.
+    # Keys are tried first, then the image needs the entry of its own folder; a folder entry above it
+    # would only hold where Ventoy matches "parent" as a path prefix.
+    def keeps_class(self, image_path):
+        folder, name = image_path.rsplit("/", 1)
+        desired = next((self.classes[key] for key in self.classes if key in name), None)
+        key = next((key for key in self.entries if key in name), None)
+        if key is not None:
+            return self.entries[key] == desired
+        if desired is not None:
+            return self.parents.get(folder) == desired
+        return not any(image_path.startswith(parent + "/") for parent in self.parents)
+
+    # Apply added and removed image files, returns (added entries, removed entries) written to ventoy.json.
+    # A batch that adds or removes no match and leaves every new image its class is handled from the
+    # changed files alone; anything else runs the full minimization again.
+    def update(self, added_files, removed_files, initial=False):
+        full = initial or self.generated is None
+        added = [self.image_path(file) for file in added_files]
+        for image_path in added:
+            matches = self.matches([image_path.rsplit("/", 1)[-1]])
+            self.matches_by_path[image_path] = matches
+            for match in matches:
+                self.match_counts[match] += 1
+                full = full or self.match_counts[match] == 1
+        for file in removed_files:
+            for match in self.matches_by_path.pop(self.image_path(file), ()):
+                self.match_counts[match] -= 1
+                if self.match_counts[match] <= 0:
+                    del self.match_counts[match]
+                    full = True
+        for name in map(os.path.basename, added_files):
+            self.names[name] += 1
+            full = full or (self.names[name] == 1 and name in self.content_keys)
+        for name in map(os.path.basename, removed_files):
+            self.names[name] -= 1
+            full = full or (self.names[name] <= 0 and name in self.content_keys)
+        if not full and all(self.keeps_class(image_path) for image_path in added):
+            return [], []
+
+        # Only entries recorded in the manifest are touched, hand-written ones stay as they are
+        ventoy_json = read_ventoy_json(self.ventoy_dir)
+        menu_class = ventoy_json.get("menu_class", [])
+        manifest = read_state(self.ventoy_dir, "manifest.json")
+        # Apply's content-detected entries cannot be detected again here, they count while their image is there
+        self.content_keys = set(manifest.get("menu_class") or {})
+        matching_tools = list(self.match_counts)
+        matching_tools.extend((key, class_string) for key, class_string in (manifest.get("menu_class") or {}).items() if self.names[key] > 0)
+        owned = owned_menu_class(menu_class, manifest.get("menu_class"), matching_tools)
+        fixed_keys = hand_written_keys(menu_class, owned)
+        generated = minimal_menu_class(list(self.matches_by_path), matching_tools, fixed_keys)
+        self.remember(matching_tools, fixed_keys, generated)
+        if not initial and generated == self.generated:
+            return [], []
+        self.generated = generated
+
+        new_menu_class, new_manifest = reconcile_menu_class(menu_class, generated, owned)
+        diff = diff_menu_entries(menu_class, new_menu_class)
+        if not diff["added"] and not diff["removed"] and not diff["changed"]:
+            return [], []
+
+        # One ventoy.json write for the whole batch of changes
+        ventoy_json["menu_class"] = new_menu_class
+        write_ventoy_json(self.ventoy_dir, ventoy_json)
+        write_state(self.ventoy_dir, "manifest.json", {**manifest, "menu_class": new_manifest})
+        return diff["added"] + [new for _, new in diff["changed"]], diff["removed"]
+
+    # Keep what keeps_class needs from a full update, keys in the order Ventoy tries them
+    def remember(self, matching_tools, fixed_keys, generated):
+        classes = {**dict(sorted(set(matching_tools))), **dict(fixed_keys)}
+        self.classes = {key: classes[key] for key in sorted(classes, key=menu_key_order)}
+        entries = {**{key: class_string for key, class_string in generated if not key.startswith(PARENT_KEY)}, **dict(fixed_keys)}
+        self.entries = {key: entries[key] for key in sorted(entries, key=menu_key_order)}
+        self.parents = {key[len(PARENT_KEY) :]: class_string for key, class_string in generated if key.startswith(PARENT_KEY)}
+
+
+# inotify through libc, so watching needs no extra package (Linux only)
+class Inotify:
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self):
+        import ctypes.util
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # watch descriptor -> directory
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+
+    # Wait for events, returns the set of changed directories or None after a queue overflow
+    def read(self, timeout):
+        import select, struct
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, name_length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16 : offset + 16 + name_length].rstrip(b"\0")
+            offset += 16 + name_length
+
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                del self.watches[wd]
+            changed.add(os.path.join(directory, os.fsdecode(name)) if mask & self.IN_ISDIR else directory)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+# Watches a volume for image files being added or removed and reports them in debounced batches
+class ImageWatcher:
+    def __init__(self, root, on_change, debounce=2.0, poll_interval=5.0, use_inotify=True):
+        self.root = root
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.images_by_dir = {}  # directory -> set of image file names
+        self.inotify = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                self.inotify = None
+
+    def image_files(self):
+        return [os.path.join(directory, name) for directory, names in self.images_by_dir.items() for name in names]
+
+    # Index a directory tree (and watch it), returns the image files found
+    def index_tree(self, top):
+        found = []
+        for directory, _, files in os.walk(top):
+            if self.inotify:
+                self.inotify.add_watch(directory)
+            names = {file for file in files if file.lower().endswith(IMAGE_EXTENSIONS)}
+            self.images_by_dir[directory] = names
+            found.extend(os.path.join(directory, name) for name in names)
+        return found
+
+    # Forget a directory and everything below it, returns the image files that were there
+    def drop_tree(self, top):
+        gone = []
+        for directory in [d for d in self.images_by_dir if d == top or d.startswith(top + os.sep)]:
+            gone.extend(os.path.join(directory, name) for name in self.images_by_dir.pop(directory))
+        return gone
+
+    # Re-list only the changed directories, returns (added, removed)
+    def rescan(self, directories):
+        added, removed = [], []
+        for directory in sorted(directories):
+            if not os.path.isdir(directory):
+                removed.extend(self.drop_tree(directory))
+                continue
+            if directory not in self.images_by_dir:
+                added.extend(self.index_tree(directory))
+                continue
+
+            known = self.images_by_dir[directory]
+            current = set()
+            for entry in os.scandir(directory):
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self.images_by_dir:
+                        added.extend(self.index_tree(entry.path))
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    current.add(entry.name)
+            added.extend(os.path.join(directory, name) for name in current - known)
+            removed.extend(os.path.join(directory, name) for name in known - current)
+            self.images_by_dir[directory] = current
+        return added, removed
+
+    # Full walk, used by the polling fallback and after an inotify overflow
+    def rescan_all(self):
+        previous = set(self.image_files())
+        self.images_by_dir = {}
+        current = set(self.index_tree(self.root))
+        return sorted(current - previous), sorted(previous - current)
+
+    def run(self, stop_event):
+        if not self.images_by_dir:
+            self.index_tree(self.root)
+        pending = set()
+        full_rescan = False
+        deadline = None
+
+        while not stop_event.is_set():
+            if self.inotify:
+                timeout = self.debounce if deadline is None else max(deadline - time.monotonic(), 0)
+                changed = self.inotify.read(timeout)
+                if changed is None:
+                    full_rescan = True
+                    deadline = time.monotonic() + self.debounce
+                elif changed:
+                    pending |= changed
+                    deadline = time.monotonic() + self.debounce  # Wait until the events settle
+            else:
+                stop_event.wait(self.poll_interval)
+                full_rescan = True
+                deadline = time.monotonic()
+
+            if deadline is None or time.monotonic() < deadline:
+                continue
+
+            if full_rescan:
+                added, removed = self.rescan_all()
+            else:
+                added, removed = self.rescan(pending)
+            pending.clear()
+            full_rescan = False
+            deadline = None
+
+            if added or removed:
+                self.on_change(added, removed)
+
+        if self.inotify:
+            self.inotify.close()
+
+
+# Watch a volume and keep its menu_class in sync until interrupted
+def watch_volume(drive_letter, selected_theme, apply_to_all_themes, apply_to_all_resolutions, debounce=2.0, use_inotify=True, stop_event=None, log=print):
+    ventoy_dir = os.path.join(drive_root(drive_letter), "ventoy")
+    ventoy_json = read_ventoy_json(ventoy_dir)
+    theme_paths = collect_theme_paths(drive_letter, ventoy_json, selected_theme, apply_to_all_themes, apply_to_all_resolutions)
+    if theme_paths is None:
+        raise ValueError("No matching themes found to apply icons.")
+
+    icon_maps = [icon_map_from_folder(os.path.join(p, "icons")) for p in theme_paths if os.path.isdir(os.path.join(p, "icons"))]
+    sync = MenuClassSync(drive_letter, icon_maps)
+
+    def on_change(added, removed):
+        new_entries, gone_entries = sync.update(added, removed)
+        log(f"{len(added)} image(s) added, {len(removed)} removed: {len(new_entries)} menu_class entries added or updated, {len(gone_entries)} removed")
+
+    watcher = ImageWatcher(drive_root(drive_letter), on_change, debounce=debounce, use_inotify=use_inotify)
+    watcher.index_tree(watcher.root)
+    new_entries, gone_entries = sync.start(watcher.image_files())
+    log(f"Watching {watcher.root} ({'inotify' if watcher.inotify else 'polling'}), {len(new_entries)} menu_class entries added or updated, {len(gone_entries)} stale removed")
+
+    stop_event = stop_event or threading.Event()
+    try:
+        watcher.run(stop_event)
+    except KeyboardInterrupt:
+        pass
+
+
+# List model over a PathStore, display strings are only built for the rows Qt asks for
+class PathListModel(QtCore.QAbstractListModel):
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role in (QtCore.Qt.ItemDataRole.DisplayRole, QtCore.Qt.ItemDataRole.EditRole):
+            return self.store[index.row()]
+        return None
+
+
+# List model of the icon preview: one row per image with the icon it gets. Thumbnails are decoded only
+# when a view asks for a row, on worker threads, newest requests first so the rows on screen come before
+# the ones already scrolled past. Decoded icons go to QPixmapCache, which evicts by size.
+class IconPreviewModel(QtCore.QAbstractListModel):
+    thumbnail_ready = QtCore.pyqtSignal(str, QtGui.QImage)
+
+    def __init__(self, rows, icon_size=32, workers=2, max_pending=256, parent=None):
+        super().__init__(parent)
+        self.rows = rows  # (image path, class, icon source) from preview_icon_assignments
+        self.icon_size = icon_size
+        self.max_pending = max_pending
+        self.pending = {}  # Cache key -> rows waiting for it, only touched on the UI thread
+        self.requests = collections.deque()  # (cache key, source), workers pop from the right
+        self.condition = threading.Condition()
+        self.closed = False
+        self.placeholder = QtGui.QPixmap(icon_size, icon_size)
+        self.placeholder.fill(QtCore.Qt.GlobalColor.transparent)
+        self.thumbnail_ready.connect(self.on_thumbnail_ready)
+        for _ in range(workers):
+            threading.Thread(target=self.decode_thumbnails, daemon=True).start()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        image_path, class_string, source = self.rows[index.row()]
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return f"{image_path}  \u2192  {class_string}" if class_string else image_path
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return source[-1] if source else "No icon"
+        if role == QtCore.Qt.ItemDataRole.DecorationRole and source is not None:
+            return self.thumbnail(index.row(), source)
+        return None
+
+    def thumbnail(self, row, source):
+        key = f"{self.icon_size}|" + "|".join(source)
+        pixmap = QtGui.QPixmapCache.find(key)
+        if pixmap is not None:
+            return pixmap
+        if key not in self.pending:
+            self.pending[key] = set()
+            with self.condition:
+                self.requests.append((key, source))
+                # Requests for rows long scrolled past are dropped; they are asked for again when shown
+                while len(self.requests) > self.max_pending:
+                    self.pending.pop(self.requests.popleft()[0], None)
+                self.condition.notify()
+        self.pending[key].add(row)
+        return self.placeholder
+
+    # Worker thread: read and scale icons into QImages, QPixmaps may only be made on the UI thread
+    def decode_thumbnails(self):
+        while True:
+            with self.condition:
+                while not self.requests and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                key, source = self.requests.pop()
+            try:
+                if source[0] == "pack":
+                    data = open_icon_pack(source[1]).read(source[2])
+                else:
+                    with open(source[1], "rb") as icon:
+                        data = icon.read()
+                image = QtGui.QImage.fromData(data)
+            except (OSError, KeyError, ValueError):
+                image = QtGui.QImage()
+            if not image.isNull():
+                image = image.scaled(self.icon_size, self.icon_size, QtCore.Qt.AspectRatioMode.KeepAspectRatio, QtCore.Qt.TransformationMode.SmoothTransformation)
+            self.thumbnail_ready.emit(key, image)
+
+    def on_thumbnail_ready(self, key, image):
+        # An icon that fails to decode is cached as the placeholder so it is not read again
+        QtGui.QPixmapCache.insert(key, QtGui.QPixmap.fromImage(image) if not image.isNull() else self.placeholder)
+        for row in self.pending.pop(key, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [QtCore.Qt.ItemDataRole.DecorationRole])
+
+    # Stop the workers, the model is about to be replaced
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.requests.clear()
+            self.condition.notify_all()
+
+
 # Main GUI Application
 class VentoyApp(QtWidgets.QWidget):
+    icon_preview_ready = QtCore.pyqtSignal(object, object)  # Request id, rows or the error message
+
     def __init__(self):
         super().__init__()
 
         self.iso_aliases = []  # List to store ISOs/directories and their aliases for rename
+        self.profile_runs = False  # Hidden switch (Ctrl+Shift+P) to profile Apply Icons and Rename runs
+        self.last_report = None
+        self.icon_preview_request = 0  # Only the latest icon preview request is shown
         self.init_ui()
 
     def init_ui(self):
@@ -144,6 +3264,35 @@ class VentoyApp(QtWidgets.QWidget):
         # Apply custom styles
         self.apply_styles()
 
+        profile_shortcut = QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Shift+P"), self)
+        profile_shortcut.activated.connect(self.toggle_profiling)
+
+    # Switch profiling of Apply Icons and Rename runs on or off, for diagnosing slow drives
+    def toggle_profiling(self):
+        self.profile_runs = not self.profile_runs
+        if self.profile_runs:
+            QMessageBox.information(self, "Profiling", f"Profiling is on. Apply Icons and Rename runs save a profile to {PROFILE_DIR}.")
+        else:
+            QMessageBox.information(self, "Profiling", "Profiling is off.")
+
+    # Profile the wrapped run when profiling is on and save the profile with the run report
+    @contextlib.contextmanager
+    def profiled(self, command):
+        if not self.profile_runs:
+            yield
+            return
+
+        self.last_report = None
+        profiler = RunProfiler(profile_prefix(command))
+        with profiler:
+            yield
+        try:
+            paths = profiler.save(self.last_report)
+        except OSError as e:
+            QMessageBox.warning(self, "Warning", f"Failed to save the profile: {e}.")
+            return
+        QMessageBox.information(self, "Profiling", "Profile saved:\n" + "\n".join(paths))
+
     def apply_styles(self):
         arrow_svg_path = resource_path("resources/arrow.svg").as_posix()
         combo_box_style = f"""
@@ -204,6 +3353,8 @@ class VentoyApp(QtWidgets.QWidget):
         """
         self.usb_dropdown.setStyleSheet(combo_box_style)
         self.theme_dropdown.setStyleSheet(combo_box_style)
+        self.icon_pack_dropdown.setStyleSheet(combo_box_style)
+        self.recolor_dropdown.setStyleSheet(combo_box_style)
         self.rename_usb_dropdown.setStyleSheet(combo_box_style)
         self.iso_dropdown.setStyleSheet(combo_box_style)
 
@@ -271,7 +3422,7 @@ class VentoyApp(QtWidgets.QWidget):
 
     def on_tab_changed(self, index):
         if index == self.tabs.indexOf(self.apply_icons_tab):
-            self.setFixedSize(610, 550)
+            self.setFixedSize(610, 690)
         elif index == self.tabs.indexOf(self.rename_tab):
             self.setFixedSize(610, 600)
 
@@ -303,6 +3454,41 @@ class VentoyApp(QtWidgets.QWidget):
         self.theme_dropdown.setToolTip("Select the Ventoy theme to apply icons to")
         usb_theme_layout.addWidget(self.theme_dropdown, 1, 1)
 
+        # Icon pack dropdown, the bundled icons and any archive in the icon-packs folder
+        self.icon_pack_label = QtWidgets.QLabel("Icon Pack:")
+        usb_theme_layout.addWidget(self.icon_pack_label, 2, 0)
+
+        self.icon_pack_dropdown = QtWidgets.QComboBox()
+        self.icon_pack_dropdown.setMinimumWidth(200)
+        self.icon_pack_dropdown.setToolTip("Select the set of icons to copy into the theme")
+        for pack_name, pack_path in find_icon_packs().items():
+            self.icon_pack_dropdown.addItem(pack_name, pack_path)
+        usb_theme_layout.addWidget(self.icon_pack_dropdown, 2, 1)
+
+        # Recolor dropdown and strength, with a live preview of a few icons on the theme's background
+        self.recolor_label = QtWidgets.QLabel("Recolor:")
+        usb_theme_layout.addWidget(self.recolor_label, 3, 0)
+
+        recolor_layout = QtWidgets.QHBoxLayout()
+        self.recolor_dropdown = QtWidgets.QComboBox()
+        self.recolor_dropdown.setToolTip("Recolor the icons toward the colors of the theme's background")
+        self.recolor_dropdown.addItem("Off", None)
+        for mode in RECOLOR_MODES:
+            self.recolor_dropdown.addItem(mode.capitalize(), mode)
+        recolor_layout.addWidget(self.recolor_dropdown, 1)
+
+        self.recolor_strength_slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+        self.recolor_strength_slider.setRange(0, 100)
+        self.recolor_strength_slider.setValue(100)
+        self.recolor_strength_slider.setToolTip("Recolor strength")
+        recolor_layout.addWidget(self.recolor_strength_slider, 1)
+        usb_theme_layout.addLayout(recolor_layout, 3, 1)
+
+        self.recolor_preview = QtWidgets.QLabel()
+        self.recolor_preview.setFixedHeight(40)
+        usb_theme_layout.addWidget(self.recolor_preview, 4, 1)
+        self.preview_icons = None  # (icon pack path, RGBA stack of the preview icons)
+
         usb_theme_group.setLayout(usb_theme_layout)
         layout.addWidget(usb_theme_group)
 
@@ -320,10 +3506,16 @@ class VentoyApp(QtWidgets.QWidget):
         self.use_theme_icons_checkbox = QCheckBox("Use theme's icons folder instead of the default icons")
         options_layout.addWidget(self.use_theme_icons_checkbox)
 
+        self.show_report_checkbox = QCheckBox("Show run report (stage timings) when finished")
+        options_layout.addWidget(self.show_report_checkbox)
+
         options_group.setLayout(options_layout)
         layout.addWidget(options_group)
 
         self.usb_dropdown.currentIndexChanged.connect(self.auto_load_themes)
+        for dropdown in (self.theme_dropdown, self.icon_pack_dropdown, self.recolor_dropdown):
+            dropdown.currentIndexChanged.connect(self.update_recolor_preview)
+        self.recolor_strength_slider.valueChanged.connect(self.update_recolor_preview)
 
         self.populate_usb_dropdown(self.usb_dropdown)
 
@@ -344,7 +3536,37 @@ class VentoyApp(QtWidgets.QWidget):
             }
         """
         )
-        layout.addWidget(self.start_button)
+
+        # Preview button, shows the planned changes before anything is written
+        self.preview_button = QtWidgets.QPushButton("Preview Changes")
+        self.preview_button.clicked.connect(self.preview_apply_icons)
+        self.preview_button.setStyleSheet(
+            """
+            QPushButton {
+                background-color: #ffffff;
+                color: black;
+                font-weight: semi-bold;
+                padding: 6px 12px;
+                border-radius: 4px;
+                border: 1px solid #d3d3d3; 
+            }
+            QPushButton:hover {
+                background-color: #e3e3e3;
+            }
+        """
+        )
+
+        # Icon preview button, swaps the text below for the list of images and the icon each one gets
+        self.icon_preview_button = QtWidgets.QPushButton("Preview Icons")
+        self.icon_preview_button.setCheckable(True)
+        self.icon_preview_button.toggled.connect(self.toggle_icon_preview)
+        self.icon_preview_button.setStyleSheet(self.preview_button.styleSheet())
+
+        button_layout = QtWidgets.QHBoxLayout()
+        button_layout.addWidget(self.icon_preview_button)
+        button_layout.addWidget(self.preview_button)
+        button_layout.addWidget(self.start_button, 1)
+        layout.addLayout(button_layout)
 
         # Text below Start Process button
         self.info_label = QtWidgets.QLabel()
@@ -354,7 +3576,40 @@ class VentoyApp(QtWidgets.QWidget):
         self.info_label.setStyleSheet("font-size: 13px; color: #111;")
         self.info_label.setWordWrap(True)
         self.info_label.setText(self.get_info_text())
-        layout.addWidget(self.info_label)
+
+        # Icon preview: a header and a list that only asks for the rows on screen
+        self.icon_preview_label = QtWidgets.QLabel()
+        self.icon_preview_list = QtWidgets.QListView()
+        self.icon_preview_list.setUniformItemSizes(True)
+        self.icon_preview_list.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)  # A thumbnail arriving does not lay out every row again
+        self.icon_preview_list.setIconSize(QtCore.QSize(32, 32))
+        self.icon_preview_list.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.icon_preview_list.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.icon_preview_model = None
+
+        icon_preview_panel = QtWidgets.QWidget()
+        icon_preview_layout = QtWidgets.QVBoxLayout(icon_preview_panel)
+        icon_preview_layout.setContentsMargins(0, 0, 0, 0)
+        icon_preview_layout.addWidget(self.icon_preview_label)
+        icon_preview_layout.addWidget(self.icon_preview_list, 1)
+
+        self.info_stack = QtWidgets.QStackedWidget()
+        self.info_stack.addWidget(self.info_label)
+        self.info_stack.addWidget(icon_preview_panel)
+        layout.addWidget(self.info_stack, 1)
+
+        QtGui.QPixmapCache.setCacheLimit(THUMBNAIL_CACHE_LIMIT // 1024)  # In kilobytes
+        self.icon_preview_ready.connect(self.show_icon_preview)
+
+        # Changing the drive, theme or icons reloads a visible preview; the timer coalesces the bursts of
+        # changes a drive switch causes
+        self.icon_preview_timer = QtCore.QTimer(self)
+        self.icon_preview_timer.setSingleShot(True)
+        self.icon_preview_timer.setInterval(200)
+        self.icon_preview_timer.timeout.connect(self.load_icon_preview)
+        for dropdown in (self.usb_dropdown, self.theme_dropdown, self.icon_pack_dropdown):
+            dropdown.currentIndexChanged.connect(self.icon_preview_changed)
+        self.use_theme_icons_checkbox.toggled.connect(self.icon_preview_changed)
 
         self.apply_icons_tab.setLayout(layout)
 
@@ -418,6 +3673,7 @@ class VentoyApp(QtWidgets.QWidget):
         self.iso_dropdown = QtWidgets.QComboBox()
         self.iso_dropdown.setMinimumWidth(200)
         self.iso_dropdown.setToolTip("Select the ISO or folder from the list")
+        self.iso_dropdown.view().setUniformItemSizes(True)  # Lets the popup skip measuring every row
         path_layout.addWidget(self.iso_dropdown, 1, 1)
 
         path_group.setLayout(path_layout)
@@ -429,6 +3685,21 @@ class VentoyApp(QtWidgets.QWidget):
         # Connect signals
         self.iso_dropdown.currentIndexChanged.connect(self.on_dropdown_changed)
         self.search_bar.textEdited.connect(self.on_search_bar_changed)
+
+        # Ranked search results for the search bar, refreshed shortly after typing stops
+        self.search_results_model = QtCore.QStringListModel(self)
+        self.search_completer = QCompleter(self.search_results_model, self.search_bar)
+        self.search_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.search_completer.setMaxVisibleItems(12)
+        self.search_completer.activated.connect(self.sync_dropdown_to_search_bar)
+        self.search_bar.setCompleter(self.search_completer)
+
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(120)
+        self.search_timer.timeout.connect(self.run_search)
+        self.path_store = None
+        self.search_index = None
         self.rename_usb_dropdown.currentIndexChanged.connect(self.auto_load_paths)
 
         # GroupBox for alias input
@@ -500,7 +3771,39 @@ class VentoyApp(QtWidgets.QWidget):
             }
         """
         )
-        layout.addWidget(self.rename_button)
+
+        # Preview button, shows the menu_alias changes before anything is written
+        self.preview_rename_button = QtWidgets.QPushButton("Preview Changes")
+        self.preview_rename_button.clicked.connect(self.preview_rename)
+        self.preview_rename_button.setStyleSheet(
+            """
+            QPushButton {
+                background-color: #ffffff;
+                color: black;
+                font-weight: semi-bold;
+                padding: 6px 12px;
+                border-radius: 4px;
+                border: 1px solid #d3d3d3; 
+            }
+            QPushButton:hover {
+                background-color: #e3e3e3;
+            }
+        """
+        )
+
+        # Duplicates button, lists images stored more than once and offers to remove the extra copies
+        self.duplicates_button = QtWidgets.QPushButton("Find Duplicates")
+        self.duplicates_button.clicked.connect(self.find_duplicates)
+        self.duplicates_button.setStyleSheet(self.preview_rename_button.styleSheet())
+
+        self.rename_show_report_checkbox = QCheckBox("Show run report (stage timings) when finished")
+        layout.addWidget(self.rename_show_report_checkbox)
+
+        rename_button_layout = QtWidgets.QHBoxLayout()
+        rename_button_layout.addWidget(self.duplicates_button)
+        rename_button_layout.addWidget(self.preview_rename_button)
+        rename_button_layout.addWidget(self.rename_button, 1)
+        layout.addLayout(rename_button_layout)
 
         self.rename_tab.setLayout(layout)
 
@@ -518,7 +3821,7 @@ class VentoyApp(QtWidgets.QWidget):
 
         ventoy_dir = os.path.join(drive_letter + "\\", "ventoy")
         try:
-            ventoy_json = self.read_ventoy_json(ventoy_dir)
+            ventoy_json = read_ventoy_json(ventoy_dir)
         except FileNotFoundError:
             self.theme_dropdown.clear()
             self.theme_dropdown.addItem("ventoy.json not found")
@@ -558,10 +3861,106 @@ class VentoyApp(QtWidgets.QWidget):
         else:
             self.theme_dropdown.addItem("No themes found")
 
+    # Folder of the theme selected on the Apply tab, None if it cannot be found
+    def selected_theme_folder(self):
+        drive_letter = self.usb_dropdown.itemData(self.usb_dropdown.currentIndex())
+        if not drive_letter or "No external drives found" in drive_letter:
+            return None
+        try:
+            ventoy_json = read_ventoy_json(os.path.join(drive_root(drive_letter), "ventoy"))
+        except (FileNotFoundError, ValueError):
+            return None
+        theme_paths = collect_theme_paths(drive_letter, ventoy_json, self.theme_dropdown.currentText(), False, False)
+        return theme_paths[0] if theme_paths else None
+
+    # Redraw the recolor preview: a few icons of the selected pack, recolored, on the theme's background
+    def update_recolor_preview(self):
+        pack_path = self.icon_pack_dropdown.currentData()
+        if not pack_path:
+            self.recolor_preview.clear()
+            return
+
+        icon_size = 32
+        if self.preview_icons is None or self.preview_icons[0] != pack_path:
+            try:
+                pack = open_icon_pack(pack_path)
+                names = pack.names()
+                sample = names[:: max(len(names) // 12, 1)][:12]
+                resized, _ = resize_icon_set_subset(pack, sample, (icon_size, icon_size))
+            except ValueError:
+                self.recolor_preview.clear()
+                return
+            self.preview_icons = (pack_path, resized)
+        stack = self.preview_icons[1]
+        if not len(stack):
+            self.recolor_preview.clear()
+            return
+
+        theme_folder = self.selected_theme_folder()
+        palette = sample_theme_palette(theme_folder) if theme_folder else None
+        mode = self.recolor_dropdown.currentData()
+        if mode and palette:
+            stack = recolor_icons(stack, mode, palette, self.recolor_strength_slider.value() / 100)
+
+        # Blend onto the theme background and lay the icons out in a row with a small gap
+        background = np.array(palette[0] if palette else (255, 255, 255), dtype=np.float32)
+        alpha = stack[..., 3:].astype(np.float32) / 255
+        blended = (stack[..., :3] * alpha + background * (1 - alpha)).astype(np.uint8)
+        gap = np.broadcast_to(background.astype(np.uint8), (len(blended), icon_size, 6, 3))
+        row = np.ascontiguousarray(np.concatenate(np.concatenate([blended, gap], axis=2), axis=1))
+        image = QtGui.QImage(row.data, row.shape[1], row.shape[0], row.shape[1] * 3, QtGui.QImage.Format.Format_RGB888).copy()
+        self.recolor_preview.setPixmap(QtGui.QPixmap.fromImage(image))
+
+    # Show the icon preview in place of the info text, or go back to the text
+    def toggle_icon_preview(self, checked):
+        self.info_stack.setCurrentIndex(1 if checked else 0)
+        self.icon_preview_button.setText("Hide Preview" if checked else "Preview Icons")
+        if checked:
+            self.load_icon_preview()
+
+    def icon_preview_changed(self):
+        if self.icon_preview_button.isChecked():
+            self.icon_preview_timer.start()
+
+    # Work out the icon of every image off the UI thread; show_icon_preview receives the rows
+    def load_icon_preview(self):
+        self.icon_preview_request += 1
+        drive_letter = self.usb_dropdown.itemData(self.usb_dropdown.currentIndex())
+        if not drive_letter or "No external drives found" in drive_letter:
+            self.show_icon_preview(self.icon_preview_request, "No external drives detected.")
+            return
+        self.icon_preview_label.setText("Matching images to icons...")
+        args = (self.icon_preview_request, drive_letter, self.theme_dropdown.currentText(), self.use_theme_icons_checkbox.isChecked(), self.icon_pack_dropdown.currentData() or ICON_DIR)
+        threading.Thread(target=self.build_icon_preview, args=args, daemon=True).start()
+
+    def build_icon_preview(self, request, drive_letter, selected_theme, use_theme_icons, icon_dir):
+        try:
+            rows = preview_icon_assignments(drive_letter, selected_theme, use_theme_icons, icon_dir)
+        except (OSError, ValueError) as e:
+            rows = str(e)
+        self.icon_preview_ready.emit(request, rows)
+
+    def show_icon_preview(self, request, rows):
+        if request != self.icon_preview_request:
+            return
+        if self.icon_preview_model is not None:
+            self.icon_preview_model.close()
+        if isinstance(rows, str):
+            self.icon_preview_model = None
+            self.icon_preview_list.setModel(None)
+            self.icon_preview_label.setText(rows)
+            return
+        self.icon_preview_model = IconPreviewModel(rows, self.icon_preview_list.iconSize().width(), parent=self)
+        self.icon_preview_list.setModel(self.icon_preview_model)
+        with_icon = sum(1 for row in rows if row[2] is not None)
+        self.icon_preview_label.setText(f"{len(rows)} image(s), {with_icon} with an icon")
+
     # Populate USB drive dropdown
     def populate_usb_dropdown(self, dropdown):
         dropdown.clear()
+        start = time.perf_counter()
         usb_drives = get_external_drives()
+        self.drive_query_seconds = time.perf_counter() - start
         if usb_drives:
             for drive in usb_drives:
                 drive_letter = drive["drive_letter"]
@@ -574,447 +3973,161 @@ class VentoyApp(QtWidgets.QWidget):
         else:
             dropdown.addItem("No external drives found")
 
-    def start_apply_icons(self):
+    # Build the Apply Icons plan from the current selections, None if something is missing
+    def build_apply_plan(self):
         # Get the selected USB drive
         current_index = self.usb_dropdown.currentIndex()
         drive_letter = self.usb_dropdown.itemData(current_index)
         if not drive_letter or "No external drives found" in drive_letter:
             QMessageBox.critical(self, "Error", "No external drives detected.")
-            return
+            return None
 
         # Get the selected theme
         selected_theme = self.theme_dropdown.currentText()
         if not selected_theme or selected_theme == "No themes found":
             QMessageBox.critical(self, "Error", "No theme selected.")
-            return
+            return None
 
-        # Determine which themes to apply icons to
-        apply_to_all_themes = self.apply_all_themes_checkbox.isChecked()
-        apply_to_all_resolutions = self.apply_all_resolutions_checkbox.isChecked()
-        use_theme_icons = self.use_theme_icons_checkbox.isChecked()
+        if not self.handle_interrupted_run(drive_letter):
+            return None
 
-        ventoy_dir = os.path.join(drive_letter + "\\", "ventoy")
+        report = RunReport("apply")
+        report.add_time("drive_query", self.drive_query_seconds)
         try:
-            ventoy_json = self.read_ventoy_json(ventoy_dir)
-        except FileNotFoundError as e:
-            QMessageBox.critical(self, "Error", str(e))
-            return
-        except ValueError as e:
+            plan = plan_apply_icons(
+                drive_letter,
+                selected_theme,
+                self.apply_all_themes_checkbox.isChecked(),
+                self.apply_all_resolutions_checkbox.isChecked(),
+                self.use_theme_icons_checkbox.isChecked(),
+                icon_dir=self.icon_pack_dropdown.currentData() or ICON_DIR,
+                recolor=self.recolor_dropdown.currentData(),
+                recolor_strength=self.recolor_strength_slider.value() / 100,
+                report=report,
+            )
+        except (FileNotFoundError, ValueError) as e:
             QMessageBox.critical(self, "Error", str(e))
-            return
-
-        theme_paths = self.collect_theme_paths(
-            drive_letter,
-            ventoy_json,
-            selected_theme,
-            apply_to_all_themes,
-            apply_to_all_resolutions,
-        )
-        if theme_paths is None:
-            QMessageBox.critical(self, "Error", "No matching themes found to apply icons.")
-            return
-
-        # Get filenames with specified extensions from the selected drive
-        extensions = (".iso", ".wim", ".img", ".vhd", ".vhdx")
-        files = find_image_files(drive_letter + "\\", extensions)
-
-        matching_tools = []
-        for theme_folder in theme_paths:
-            icons_path = os.path.join(theme_folder, "icons")
-
-            if not os.path.exists(icons_path):
-                QMessageBox.warning(
-                    self,
-                    "Warning",
-                    f"No icons folder found in theme {os.path.basename(theme_folder)}. Skipping.",
-                )
-                continue
-
-            if use_theme_icons:
-                icon_map = {}
-                for icon_file in os.listdir(icons_path):
-                    if icon_file.lower().endswith(".png"):
-                        icon_name = os.path.splitext(icon_file)[0]
-                        icon_map[icon_name] = icon_name
-            else:
-                png_files = [f for f in os.listdir(icons_path) if f.lower().endswith(".png")]
-                icon_size_value = None
-
-                if "ubuntu.png" in png_files:
-                    # Use the resolution of ubuntu.png
-                    ubuntu_path = os.path.join(icons_path, "ubuntu.png")
-                    pixmap = QPixmap(ubuntu_path)
-                    if pixmap.isNull():
-                        QMessageBox.warning(
-                            self,
-                            "Warning",
-                            f"Failed to load ubuntu.png in theme {os.path.basename(theme_folder)}. Using default icon size.",
-                        )
-                        icon_size_value = self.icon_size_from_res()
-                    else:
-                        icon_size_value = pixmap.width()  # Assuming square icons
-                else:
-                    if png_files:
-                        selected_file = random.choice(png_files)
-                        selected_path = os.path.join(icons_path, selected_file)
-                        pixmap = QPixmap(selected_path)
-                        if pixmap.isNull():
-                            QMessageBox.warning(
-                                self,
-                                "Warning",
-                                f"Failed to load {selected_file} in theme {os.path.basename(theme_folder)}. Using default icon size.",
-                            )
-                            icon_size_value = self.icon_size_from_res()
-                        else:
-                            icon_size_value = pixmap.width()
-                    else:
-                        icon_size_value = self.icon_size_from_res()
-
-                if icon_size_value is None:
-                    icon_size_value = self.icon_size_from_res()
-
-                icon_size = (icon_size_value, icon_size_value)
-
-                success, icon_map = self.copy_and_resize_icons(ICON_DIR, icons_path, icon_size)
-                if not success:
-                    return
-
-            matching_tools.extend(self.get_matching_tools(files, icon_map))
-
-        # Remove duplicates from matching_tools
-        matching_tools = list(set(matching_tools))
-
-        # Sort matching_tools by length of key in descending order and then case-insensitive
-        matching_tools.sort(key=lambda x: (-len(x[0]), x[0].lower()))
-
-        # Add menu_class entries
-        if "menu_class" not in ventoy_json:
-            ventoy_json["menu_class"] = []
-
-        for key_string, class_string in matching_tools:
-            menu_entry = {"key": key_string, "class": class_string}
-            ventoy_json["menu_class"].append(menu_entry)
-
-        # Remove duplicates and sort the menu_class entries
-        unique_menu_class = {}
-        for entry in ventoy_json["menu_class"]:
-            if "key" in entry:
-                unique_key = f"key:{entry['key']}"
-                sort_key = entry["key"]
-            elif "dir" in entry:
-                unique_key = f"dir:{entry['dir']}"
-                sort_key = entry["dir"]
-            else:
-                continue
-            unique_menu_class[unique_key] = (sort_key, entry)  # Store sort_key for sorting
-
-        sorted_menu_class_entries = [entry for _, entry in sorted(unique_menu_class.values(), key=lambda x: (-len(x[0]), x[0].lower()))]
-
-        # Separate entries where key.lower() == "linux" and move them to the end
-        linux_entries = [entry for entry in sorted_menu_class_entries if entry.get("key", "").lower() == "linux"]
-        non_linux_entries = [entry for entry in sorted_menu_class_entries if entry.get("key", "").lower() != "linux"]
+            return None
 
-        # Combine non-linux entries with linux entries
-        ventoy_json["menu_class"] = non_linux_entries + linux_entries
+        for warning in plan["warnings"]:
+            QMessageBox.warning(self, "Warning", warning)
+        return plan
 
-        # Save the updated ventoy.json
-        self.save_ventoy_json(ventoy_dir, ventoy_json)
+    def start_apply_icons(self):
+        with self.profiled("apply"):
+            plan = self.build_apply_plan()
+            if plan is not None:
+                self.apply_plan(plan, self.show_report_checkbox.isChecked())
+
+    def preview_apply_icons(self):
+        with self.profiled("apply"):
+            plan = self.build_apply_plan()
+            if plan is not None and self.preview_plan(plan):
+                self.apply_plan(plan, self.show_report_checkbox.isChecked())
+
+    # Show the planned changes and ask whether to apply them
+    def preview_plan(self, plan):
+        estimate_plan(plan)
+        box = QMessageBox(self)
+        box.setWindowTitle("Preview")
+        box.setIcon(QMessageBox.Icon.Information)
+        box.setText("\n".join(summarize_plan(plan)))
+        box.setDetailedText(format_plan(plan))
+        box.setStandardButtons(QMessageBox.StandardButton.Apply | QMessageBox.StandardButton.Cancel)
+        return box.exec() == QMessageBox.StandardButton.Apply
+
+    # Offer to finish or roll back a run that was interrupted on this drive, False if the user cancels
+    def handle_interrupted_run(self, drive_letter):
+        journal_state = read_journal(os.path.join(drive_root(drive_letter), "ventoy"))
+        if journal_state is None:
+            return True
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Interrupted Run")
+        box.setIcon(QMessageBox.Icon.Warning)
+        box.setText(f"An interrupted {journal_state['kind']} run from {journal_state['started']} was found on this drive. Finish it or roll it back before making new changes.")
+        finish_button = box.addButton("Finish It", QMessageBox.ButtonRole.AcceptRole)
+        rollback_button = box.addButton("Roll Back", QMessageBox.ButtonRole.DestructiveRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
 
-    def icon_size_from_res(self):
         try:
-            monitors = get_monitors()
-            if monitors:
-                width = monitors[0].width
-                height = monitors[0].height
-
-                # Get the scaling factor
-                user32 = ctypes.windll.user32
-                hdc = user32.GetDC(0)
-                dpi = ctypes.windll.gdi32.GetDeviceCaps(hdc, 88)
-
-                # Default DPI is 96
-                scale_factor = dpi / 96.0
-                scaled_width = int(width / scale_factor)
-                scaled_height = int(height / scale_factor)
-                resolution = (scaled_width, scaled_height)
-            else:
-                resolution = (1920, 1080)
-        except Exception:
-            resolution = (1920, 1080)
-
-        # Mapping of resolutions to icon sizes
-        resolution_icon_size_map = {
-            (1920, 1080): 32,
-            (2560, 1080): 32,
-            (2560, 1440): 48,
-            (3440, 1440): 48,
-            (3840, 2160): 64,
-        }
-
-        # Find the closest matching resolution
-        min_diff = float("inf")
-        icon_size = 32  # Default icon size
-        for res, size in resolution_icon_size_map.items():
-            diff = abs(resolution[0] - res[0]) + abs(resolution[1] - res[1])
-            if diff < min_diff:
-                min_diff = diff
-                icon_size = size
-
-        return icon_size
-
-    def read_ventoy_json(self, ventoy_dir, is_rename=False):
-        ventoy_json_path = os.path.join(ventoy_dir, "ventoy.json")
-        if not os.path.exists(ventoy_json_path):
-            raise FileNotFoundError("ventoy.json not found")
+            if box.clickedButton() is finish_button:
+                return self.apply_plan(plan_resume(drive_letter))
+            if box.clickedButton() is rollback_button:
+                for warning in rollback_journal(drive_letter):
+                    QMessageBox.warning(self, "Warning", warning)
+                return True
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", str(e))
+        return False
 
+    # Write the planned changes to the drive
+    def apply_plan(self, plan, show_report=False):
+        self.last_report = plan["report"]
         try:
-            if is_rename:
-                with open(ventoy_json_path, "r") as json_file:
-                    content = json_file.read().strip()
-                    if not content:
-                        ventoy_json = {}
-                    else:
-                        ventoy_json = json.loads(content)
-                return ventoy_json
-            else:
-                with open(ventoy_json_path, "r") as json_file:
-                    ventoy_json = json.load(json_file)
-                return ventoy_json
-        except json.JSONDecodeError:
-            raise ValueError("Invalid ventoy.json syntax")
-
-    def save_ventoy_json(self, ventoy_dir, ventoy_json):
-        ventoy_json_path = os.path.join(ventoy_dir, "ventoy.json")
-        temp_ventoy_json_path = os.path.join(ventoy_dir, "temp_ventoy.json")
-        with open(temp_ventoy_json_path, "w") as json_file:
-            json.dump(ventoy_json, json_file, indent=4)
-
-        if check_json_syntax(temp_ventoy_json_path):
-            shutil.move(temp_ventoy_json_path, ventoy_json_path)
-            QMessageBox.information(self, "Success", f"Updated ventoy.json saved at {ventoy_json_path}")
-        else:
-            os.remove(temp_ventoy_json_path)
-            QMessageBox.critical(
-                self,
-                "Error",
-                "Syntax error in the modified ventoy.json. No changes were made.",
-            )
-
-    def collect_theme_paths(self, drive_letter, ventoy_json, selected_theme, apply_to_all_themes, apply_to_all_resolutions):
-        theme_paths = []
-
-        # Find theme entries in ventoy.json
-        theme_keys = [key for key in ventoy_json.keys() if key.startswith("theme")]
-
-        for theme_key in theme_keys:
-            theme_entry = ventoy_json[theme_key]
-            if "file" in theme_entry:
-                file_field = theme_entry["file"]
-                if isinstance(file_field, str):
-                    file_field = [file_field]
-                for file_path in file_field:
-                    # Extract theme name from the path
-                    if file_path.startswith("/"):
-                        file_path = file_path[1:]
-                    file_path = file_path.replace("/", os.sep)
-                    full_path = os.path.join(drive_letter + "\\", file_path)
-                    if os.path.exists(full_path):
-                        theme_name = os.path.basename(os.path.dirname(full_path))
-
-                        # Decide whether to include this theme
-                        include_theme = False
-                        if apply_to_all_themes:
-                            include_theme = True
-                        elif theme_name == selected_theme:
-                            include_theme = True
-
-                        if include_theme:
-                            if apply_to_all_resolutions:
-                                # Include all resolutions of the theme
-                                theme_base_name = theme_name.split("_")[0]
-                                theme_dir = os.path.dirname(os.path.dirname(full_path))
-                                # Search for all folders starting with the base theme name
-                                for dir_name in os.listdir(theme_dir):
-                                    if dir_name.startswith(theme_base_name):
-                                        theme_paths.append(os.path.join(theme_dir, dir_name))
-                            else:
-                                theme_paths.append(os.path.dirname(full_path))
-
-        # Remove duplicates
-        theme_paths = list(set(theme_paths))
-
-        if not theme_paths:
-            return None
-
-        return theme_paths
-
-    def copy_and_resize_icons(self, source_dir, dest_dir, icon_size):
-        print(source_dir)
-        if not os.path.exists(source_dir):
-            QMessageBox.critical(self, "Error", "Local icons folder not found.")
-            return False, {}
-
-        icon_map = {}
-
-        for icon_file in os.listdir(source_dir):
-            if icon_file.lower().endswith(".png"):
-                src_icon_path = os.path.join(source_dir, icon_file)
-                icon_name = os.path.splitext(icon_file)[0]  # Original icon name
-
-                # Destination icon path
-                dest_icon_filename = icon_file
-                dest_icon_path = os.path.join(dest_dir, dest_icon_filename)
+            ventoy_json_path, warnings = execute_plan(plan)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return False
 
-                # If a file with the same name exists in the icons folder, rename the dest file to 'name-alt.png'
-                if os.path.exists(dest_icon_path):
-                    alt_icon_filename = f"{icon_name}-alt.png"
-                    alt_icon_path = os.path.join(dest_dir, alt_icon_filename)
+        for warning in warnings:
+            QMessageBox.warning(self, "Warning", warning)
+        QMessageBox.information(self, "Success", f"Updated ventoy.json saved at {ventoy_json_path}")
 
-                    # Resize and save the alt icon
-                    try:
-                        with Image.open(src_icon_path) as img:
-                            # Convert image to RGBA to ensure transparency is preserved
-                            img = img.convert("RGBA")
-                            resized_img = img.resize(icon_size, Image.LANCZOS)
-                            resized_img.save(alt_icon_path, format="PNG")
-                    except Exception as e:
-                        QMessageBox.warning(
-                            self,
-                            "Warning",
-                            f"Failed to process {icon_file}: {e}. Skipping this icon.",
-                        )
-                        continue
-
-                    # Calculate similarity between original and alternative icons
-                    try:
-                        with Image.open(dest_icon_path) as original_img, Image.open(alt_icon_path) as alt_img:
-                            # Make sure both images have same size
-                            original_img = original_img.convert("RGBA").resize(icon_size, Image.LANCZOS)
-                            alt_img = alt_img.convert("RGBA").resize(icon_size, Image.LANCZOS)
-
-                            # Convert images to grayscale for SSIM
-                            original_gray = original_img.convert("L")
-                            alt_gray = alt_img.convert("L")
-
-                            original_array = np.array(original_gray)
-                            alt_array = np.array(alt_gray)
-
-                            # Compute SSIM
-                            similarity, _ = ssim(original_array, alt_array, full=True)
-                            similarity_percentage = similarity * 100
-
-                    except Exception as e:
-                        QMessageBox.warning(
-                            self,
-                            "Warning",
-                            f"Failed to calculate similarity for {icon_name}: {e}. Keeping the '-alt' icon.",
-                        )
-                        icon_map[icon_name] = os.path.splitext(alt_icon_filename)[0]
-                        continue
-
-                    # If similarity is high; remove the '-alt' icon and map to original
-                    if similarity_percentage >= 90:
-                        try:
-                            os.remove(alt_icon_path)
-                        except Exception as e:
-                            QMessageBox.warning(
-                                self,
-                                "Warning",
-                                f"Failed to remove {alt_icon_filename}: {e}. Keeping the '-alt' icon.",
-                            )
-                            icon_map[icon_name] = os.path.splitext(alt_icon_filename)[0]
-                            continue
-                        icon_map[icon_name] = icon_name
-                    else:
-                        # Similarity is low; keep the '-alt' icon
-                        icon_map[icon_name] = os.path.splitext(alt_icon_filename)[0]
-                else:
-                    # No conflict; copy and resize the icon normally
-                    try:
-                        with Image.open(src_icon_path) as img:
-                            # Convert image to RGBA to ensure transparency is preserved
-                            img = img.convert("RGBA")
-                            resized_img = img.resize(icon_size, Image.LANCZOS)
-                            resized_img.save(dest_icon_path, format="PNG")
-                    except Exception as e:
-                        QMessageBox.warning(
-                            self,
-                            "Warning",
-                            f"Failed to process {icon_file}: {e}. Skipping this icon.",
-                        )
-                        continue
-
-                    icon_map[icon_name] = icon_name
-
-        return True, icon_map
-
-    def get_matching_tools(self, files, icon_map):
-        tool_icons = list(icon_map.keys())
+        if show_report:
+            self.show_report(plan["report"])
+        return True
 
-        matching_tools = []
-        for file in files:
-            filename = os.path.basename(file)
-            filename_lower = filename.lower()
-            matches_for_file = []
-            for tool in tool_icons:
-                tool_lower = tool.lower()
-                index = filename_lower.find(tool_lower)
-                if index != -1:
-                    # Extract the matching substring from the filename, preserving case
-                    matched_string = filename[index : index + len(tool)]
-                    matching_tools.append((matched_string, icon_map[tool]))
-        return matching_tools
+    # Show the stage timings of a run, with the full JSON report as details
+    def show_report(self, report):
+        report_data = report.to_dict()
+        lines = [f"Total: {report_data['total_seconds']:.3f}s"]
+        lines.extend(f"{name}: {seconds:.3f}s" for name, seconds in report_data["stages"].items())
+        if report_data["peak_memory"]:
+            lines.append(f"Peak memory: {format_size(report_data['peak_memory'])}")
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Run Report")
+        box.setText("\n".join(lines))
+        box.setDetailedText(report.to_json())
+        box.setStandardButtons(QMessageBox.StandardButton.Save | QMessageBox.StandardButton.Close)
+        if box.exec() == QMessageBox.StandardButton.Save:
+            report_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Run Report", f"ventoy-assist-{report.command}.json", "JSON (*.json)")
+            if report_path:
+                try:
+                    report.save(report_path)
+                except OSError as e:
+                    QMessageBox.critical(self, "Error", f"Failed to save the run report: {e}")
 
     # Automatically load paths (files and folders) when a USB drive is selected
     def auto_load_paths(self):
         current_index = self.rename_usb_dropdown.currentIndex()
         drive_letter = self.rename_usb_dropdown.itemData(current_index)
         if not drive_letter or "No external drives found" in drive_letter:
-            self.iso_dropdown.clear()
-            self.iso_dropdown.addItem("No external drives found")
+            # Forget the previous drive's paths, the search bar must not offer them any more
+            self.path_store = None
+            self.search_index = None
+            self.iso_dropdown.setModel(QtCore.QStringListModel(["No external drives found"], self))
             return
 
-        # Find image files and their parent directories
-        extensions = (".iso", ".wim", ".img", ".vhd", ".vhdx")
-        image_files = find_image_files(drive_letter + "\\", extensions)
-
-        # Collect unique paths (files and directories)
-        paths_set = set()
-
-        for file_path in image_files:
-            if "$RECYCLE.BIN" in file_path:
-                continue
-
-            paths_set.add(file_path)
-
-            # Add parent directories up to the drive root
-            parent_path = os.path.dirname(file_path)
-            while parent_path.startswith(drive_letter + "\\"):
-                paths_set.add(parent_path)
-                parent_path = os.path.dirname(parent_path)
-                if parent_path == drive_letter + "\\":
-                    break
-
-        # Convert paths to relative for display
-        relative_paths = []
-        for path in paths_set:
-            relative_path = os.path.relpath(path, drive_letter + "\\")
-            display_name = relative_path.replace("\\", "/")
-            relative_paths.append(display_name)
-
-        relative_paths.sort()
+        # Index the image files and their parent directories; the dropdown and the completer share it
+        self.path_store = PathStore.scan(drive_letter, IMAGE_EXTENSIONS, skip_dirs=("$RECYCLE.BIN",))
+        self.path_model = PathListModel(self.path_store, self)
 
         self.iso_dropdown.blockSignals(True)
-        self.iso_dropdown.clear()
-        for display_name in relative_paths:
-            self.iso_dropdown.addItem(display_name)
+        self.iso_dropdown.setModel(self.path_model)
         self.iso_dropdown.blockSignals(False)
 
-        # Set up auto-complete for the search bar
-        self.completer_model = QtCore.QStringListModel(relative_paths)
-        completer = QCompleter(self.completer_model, self.search_bar)
-        completer.setCaseSensitivity(QtCore.Qt.CaseSensitivity.CaseInsensitive)
-        self.search_bar.setCompleter(completer)
+        # Build the search index off the UI thread, the search bar uses a plain scan until it is ready
+        self.search_index = None
+        store = self.path_store
+        threading.Thread(target=self.build_search_index, args=(store,), daemon=True).start()
+
+    def build_search_index(self, store):
+        search_index = TrigramIndex(store)
+        if store is self.path_store:
+            self.search_index = search_index
 
     # Handle dropdown selection change
     def on_dropdown_changed(self):
@@ -1029,14 +4142,37 @@ class VentoyApp(QtWidgets.QWidget):
     # Handle search bar text change
     def on_search_bar_changed(self):
         self.last_changed_field = "search_bar"
-        # Do not update the dropdown unless the text matches an item
+        self.sync_dropdown_to_search_bar()
+        self.search_timer.start()  # Restarting the timer debounces fast typing
+
+    # Do not update the dropdown unless the text matches an item
+    def sync_dropdown_to_search_bar(self):
         text = self.search_bar.text()
-        index = self.iso_dropdown.findText(text, QtCore.Qt.MatchFlag.MatchExactly)
+        # The dropdown rows are the store's rows; findText would build the path of every row
+        index = self.path_store.find(text) if self.path_store is not None else -1
         if index != -1:
             self.iso_dropdown.blockSignals(True)
             self.iso_dropdown.setCurrentIndex(index)
             self.iso_dropdown.blockSignals(False)
 
+    # Show ranked matches for the typed text in the completer popup
+    def run_search(self):
+        text = self.search_bar.text()
+        if self.search_index is not None:
+            results = self.search_index.search(text)
+        elif self.path_store is not None and text.strip():
+            query = text.strip().lower()
+            matches = (self.path_store[row] for row in range(len(self.path_store)))
+            results = list(itertools.islice((path for path in matches if query in path.lower()), 50))
+        else:
+            results = []
+
+        self.search_results_model.setStringList(results)
+        if results and self.search_bar.hasFocus():
+            self.search_completer.complete()
+        else:
+            self.search_completer.popup().hide()
+
     # Add selected path and alias to the rename list
     def add_to_rename_list(self):
         selected_path = self.search_bar.text() if self.last_changed_field == "search_bar" else self.iso_dropdown.currentText()
@@ -1109,63 +4245,599 @@ class VentoyApp(QtWidgets.QWidget):
                     self.iso_aliases[index] = (path_item, new_alias)
                     break
 
+    # Build the Rename plan from the rename list, None if something is missing
+    def build_rename_plan(self):
+        current_index = self.rename_usb_dropdown.currentIndex()
+        drive_letter = self.rename_usb_dropdown.itemData(current_index)
+        if not drive_letter or "No external drives found" in drive_letter:
+            QMessageBox.critical(self, "Error", "No external drives detected.")
+            return None
+
+        if not self.handle_interrupted_run(drive_letter):
+            return None
+
+        report = RunReport("rename")
+        report.add_time("drive_query", self.drive_query_seconds)
+        try:
+            return plan_rename(drive_letter, self.iso_aliases, report)
+        except (FileNotFoundError, ValueError) as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return None
+
     # Start process for rename
     def start_rename(self):
+        with self.profiled("rename"):
+            plan = self.build_rename_plan()
+            applied = plan is not None and self.apply_plan(plan, self.rename_show_report_checkbox.isChecked())
+        if applied:
+            # Clear the list of paths and aliases after applying the rename
+            self.iso_aliases.clear()
+            self.update_rename_table()
+
+    def preview_rename(self):
+        with self.profiled("rename"):
+            plan = self.build_rename_plan()
+            applied = plan is not None and self.preview_plan(plan) and self.apply_plan(plan, self.rename_show_report_checkbox.isChecked())
+        if applied:
+            self.iso_aliases.clear()
+            self.update_rename_table()
+
+    # Show the duplicate images of the drive and offer to keep one copy of each
+    def find_duplicates(self):
         current_index = self.rename_usb_dropdown.currentIndex()
         drive_letter = self.rename_usb_dropdown.itemData(current_index)
         if not drive_letter or "No external drives found" in drive_letter:
             QMessageBox.critical(self, "Error", "No external drives detected.")
             return
 
-        ventoy_dir = os.path.join(drive_letter + "\\", "ventoy")
-        if not os.path.exists(ventoy_dir):
-            os.makedirs(ventoy_dir)
+        if not self.handle_interrupted_run(drive_letter):
+            return
 
-        # Read ventoy.json
+        report = RunReport("duplicates")
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
         try:
-            ventoy_json = self.read_ventoy_json(ventoy_dir, True)
-        except FileNotFoundError as e:
-            QMessageBox.critical(self, "Error", str(e))
+            groups = find_duplicates(drive_letter, report)
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+        if not groups:
+            QMessageBox.information(self, "Duplicates", "No duplicate images found.")
             return
-        except ValueError as e:
-            QMessageBox.critical(self, "Error", str(e))
+
+        freed = sum(group["size"] * (len(group["paths"]) - 1) for group in groups)
+        details = "\n\n".join(f"{format_size(group['size'])}:\n" + "\n".join(f"  /{path}" for path in group["paths"]) for group in groups)
+        box = QMessageBox(self)
+        box.setWindowTitle("Duplicates")
+        box.setIcon(QMessageBox.Icon.Information)
+        box.setText(f"{len(groups)} images are stored more than once, removing the extra copies frees {format_size(freed)}.")
+        box.setDetailedText(details)
+        remove_button = box.addButton("Remove Extra Copies", QMessageBox.ButtonRole.AcceptRole)
+        box.addButton(QMessageBox.StandardButton.Close)
+        box.exec()
+        if box.clickedButton() is not remove_button:
             return
 
-        # Add the new alias
-        if "menu_alias" not in ventoy_json:
-            ventoy_json["menu_alias"] = []
+        try:
+            plan = plan_remove_duplicates(drive_letter, groups, report)
+        except (FileNotFoundError, ValueError) as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        if self.preview_plan(plan) and self.apply_plan(plan, self.rename_show_report_checkbox.isChecked()):
+            self.auto_load_paths()
 
-        for path, new_alias in self.iso_aliases:
-            image_path = "/" + path.replace("\\", "/")
-            alias_exists = False
 
-            # Determine if the path is a file or directory
-            full_path = os.path.join(drive_letter + "\\", path.replace("/", "\\"))
-            is_directory = os.path.isdir(full_path)
+# Plan a command from its command line options; the job server gets the same options as JSON
+def build_plan(args):
+    if args.command == "apply":
+        icon_dir = resolve_icon_pack(args.icon_pack) if args.icon_pack else ICON_DIR
+        return plan_apply_icons(
+            args.drive, args.theme, args.all_themes, args.all_resolutions, args.theme_icons, icon_dir, not args.no_detect, args.recolor, args.recolor_strength,
+            memory_budget=args.memory_budget * 1024 * 1024,
+        )
+    if args.command == "gc":
+        return plan_gc(args.drive)
+    if args.command == "resume":
+        return plan_resume(args.drive)
+    return plan_rename(args.drive, [tuple(alias) for alias in args.aliases])
+
+
+# Print a plan (dry run) or apply it, returns the output and the warnings
+def run_plan(plan, dry_run):
+    warnings = list(plan["warnings"])
+    if dry_run:
+        estimate_plan(plan)
+        return format_plan(plan), warnings
+
+    ventoy_json_path, write_warnings = execute_plan(plan)
+    return f"Updated ventoy.json saved at {ventoy_json_path}", warnings + write_warnings
+
+
+# Print a plan or apply it, for the command line
+def run_plan_cli(plan, dry_run, report_path=None):
+    output, warnings = run_plan(plan, dry_run)
+    for warning in warnings:
+        print(f"Warning: {warning}", file=sys.stderr)
+    print(output)
+
+    save_report_cli(plan["report"], report_path)
+    return 0
+
+
+# Write the run report to a file, or to stdout for "-"
+def save_report_cli(report, report_path):
+    if report_path == "-":
+        print(report.to_json())
+    elif report_path:
+        report.save(report_path)
+
+
+# Port and token of the running job server, in a folder only the user can open
+SERVER_DIR = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"), "ventoy-assist")
+SERVER_FILE = os.path.join(SERVER_DIR, "server.json")
+SERVER_JOB_HISTORY = 100
+SERVER_CLIENT_OPTIONS = ("command", "report", "profile", "server")  # Options the client keeps for itself
+# Required options of the jobs, and the other options with the defaults of the command line
+SERVER_JOB_REQUIRED = {"apply": ("drive", "theme"), "rename": ("drive", "aliases")}
+SERVER_JOB_OPTIONS = {
+    "apply": {"all_themes": False, "all_resolutions": False, "theme_icons": False, "icon_pack": None, "recolor": None, "recolor_strength": 1.0, "memory_budget": DEFAULT_MEMORY_BUDGET // (1024 * 1024), "no_detect": False, "dry_run": False},
+    "rename": {"dry_run": False},
+}
+# Accepted types of every job option; bool is checked on its own since it is also an int
+SERVER_OPTION_TYPES = {"drive": str, "theme": str, "aliases": list, "icon_pack": str, "recolor": str, "recolor_strength": (int, float), "memory_budget": int}
+
+
+# JSON-RPC error with its standard code: -32700 parse error, -32600 invalid request, -32601 unknown
+# method, -32602 invalid params
+class ServerError(ValueError):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+# Check the type of every option of a job, so a bad request fails when it is submitted and not halfway
+def check_job_params(params):
+    for name, value in params.items():
+        if value is None:
+            continue
+        expected = SERVER_OPTION_TYPES.get(name, bool)
+        if isinstance(value, bool) != (expected is bool) or not isinstance(value, expected):
+            raise ServerError(-32602, f"Invalid value for {name}: {value!r}")
+    aliases = params.get("aliases")
+    if aliases is not None and not all(isinstance(pair, list) and len(pair) == 2 and all(isinstance(part, str) for part in pair) for pair in aliases):
+        raise ServerError(-32602, "aliases must be a list of [path, alias] pairs")
+    if params.get("recolor") is not None and params["recolor"] not in RECOLOR_MODES:
+        raise ServerError(-32602, f"recolor must be one of {', '.join(RECOLOR_MODES)}")
+
+
+# One lock per volume, so two jobs never plan and write the same drive at the same time
+VOLUME_LOCKS = {}
+VOLUME_LOCKS_GUARD = threading.Lock()
+
+
+def volume_lock(drive_letter):
+    key = os.path.normcase(os.path.abspath(drive_root(drive_letter)))
+    with VOLUME_LOCKS_GUARD:
+        return VOLUME_LOCKS.setdefault(key, threading.Lock())
+
+
+# The server file and its folder must belong to the user and be closed to everyone else, otherwise
+# another user could read the token or plant a server of their own. Windows keeps LOCALAPPDATA per user.
+def check_private(path, stat_result):
+    if hasattr(os, "getuid") and (stat_result.st_uid != os.getuid() or stat_result.st_mode & 0o077):
+        raise ValueError(f"{path} is not private to the current user")
+
+
+# Write the server file: a fresh file in the private folder, never through a link
+def write_server_file(server_file, info):
+    server_dir = os.path.dirname(server_file)
+    os.makedirs(server_dir, mode=0o700, exist_ok=True)
+    check_private(server_dir, os.lstat(server_dir))
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(server_file)  # Left behind by a server that did not shut down
+    fd = os.open(server_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    with os.fdopen(fd, "w") as info_file:
+        json.dump(info, info_file)
+
+
+def read_server_file(server_file):
+    check_private(os.path.dirname(server_file), os.lstat(os.path.dirname(server_file)))
+    fd = os.open(server_file, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    with os.fdopen(fd) as info_file:
+        check_private(server_file, os.fstat(fd))
+        return json.load(info_file)
+
+
+# Long-running local job server for stations where several operators provision drives at once. Jobs run
+# on a worker pool in one process, so the imports are paid once and the icon packs, resized icons,
+# theme palettes and drive profiles stay warm between jobs. Clients talk JSON-RPC 2.0 over HTTP on
+# 127.0.0.1 and authenticate with the token the server writes to SERVER_FILE.
+class JobServer:
+    def __init__(self, workers=2, port=0, server_file=SERVER_FILE):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.workers = workers
+        self.port = port
+        self.server_file = server_file
+        self.token = hashlib.sha256(os.urandom(32)).hexdigest()
+        self.jobs = collections.OrderedDict()  # Job id -> job, oldest first
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        # Jobs share resized icons on top of their memory budget, only while this server runs
+        self.resized_icons_limit = RESIZED_ICONS.limit
+        RESIZED_ICONS.limit = RESIZED_ICON_CACHE_LIMIT
+
+    # Load the default icon pack and the SSIM code before the first job needs them
+    def warm_up(self):
+        importlib.import_module("skimage.metrics")
+
+        for path in find_icon_packs().values():
+            try:
+                open_icon_pack(path)
+            except ValueError:
+                pass
+
+    # Wait for the running jobs, then turn the shared resized icons cache back off
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with RESIZED_ICONS.lock:
+            RESIZED_ICONS.limit = self.resized_icons_limit
+            RESIZED_ICONS.entries.clear()
+            RESIZED_ICONS.size = 0
+
+    def submit(self, method, params):
+        if method not in SERVER_JOB_OPTIONS:
+            raise ServerError(-32601, f"Unknown method {method!r}")
+        required, options = SERVER_JOB_REQUIRED[method], SERVER_JOB_OPTIONS[method]
+        missing = [name for name in required if params.get(name) is None]
+        if missing:
+            raise ServerError(-32602, f"Missing options: {', '.join(missing)}")
+        unknown = set(params) - set(required) - set(options)
+        if unknown:
+            raise ServerError(-32602, f"Unknown options: {', '.join(sorted(unknown))}")
+        check_job_params(params)
+        args = argparse.Namespace(command=method, **{**options, **params})
+        with self.lock:
+            job = {"id": next(self.job_ids), "method": method, "drive": args.drive, "state": "queued", "submitted": time.time()}
+            self.jobs[job["id"]] = job
+            while len(self.jobs) > SERVER_JOB_HISTORY and next(iter(self.jobs.values()))["state"] in ("done", "failed"):
+                self.jobs.popitem(last=False)
+        job["future"] = self.executor.submit(self.run_job, job, args)
+        return job
+
+    def run_job(self, job, args):
+        with volume_lock(args.drive):
+            job["state"] = "running"
+            try:
+                if read_journal(os.path.join(drive_root(args.drive), "ventoy")) is not None:
+                    raise ValueError(f"An interrupted run was found on {args.drive}. Run 'ventoy-assist resume {args.drive}' to finish it, or add --rollback to undo it.")
+                plan = build_plan(args)
+                output, warnings = run_plan(plan, args.dry_run)
+                job["result"] = {"output": output, "warnings": warnings, "report": plan["report"].to_dict()}
+                job["state"] = "done"
+            except Exception as e:
+                job["error"] = str(e)
+                job["state"] = "failed"
+
+    # The client's view of a job, waiting for it to finish first if asked to
+    def job_status(self, job_id, wait=False):
+        job = self.jobs.get(job_id) if isinstance(job_id, int) else None
+        if job is None:
+            raise ServerError(-32602, f"Unknown job {job_id!r}")
+        if wait:
+            job["future"].result()
+        return {key: value for key, value in job.items() if key != "future"}
+
+    def call(self, method, params):
+        if method == "ping":
+            with self.lock:
+                active = sum(job["state"] in ("queued", "running") for job in self.jobs.values())
+            return {"pid": os.getpid(), "uptime": round(time.time() - self.started, 3), "workers": self.workers, "active_jobs": active}
+        if method == "job":
+            return self.job_status(params.get("id"), params.get("wait") is True)
+        if method == "jobs":
+            with self.lock:
+                return [self.job_status(job_id) for job_id in self.jobs]
+        wait = params.pop("wait", False) is True
+        return self.job_status(self.submit(method, params)["id"], wait)
+
+    def serve(self, log=print):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.headers.get("Authorization") != f"Bearer {server.token}":
+                    self.send_error(403)
+                    return
+                request_id = None
+                try:
+                    try:
+                        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    except ValueError as e:
+                        raise ServerError(-32700, f"Parse error: {e}")
+                    if not isinstance(request, dict) or not isinstance(request.get("method"), str) or not isinstance(request.get("params", {}), dict):
+                        raise ServerError(-32600, "Invalid request: expected an object with a method name and object params")
+                    request_id = request.get("id")
+                    response = {"jsonrpc": "2.0", "id": request_id, "result": server.call(request["method"], dict(request.get("params", {})))}
+                except ServerError as e:
+                    response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}}
+                except Exception as e:
+                    response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32603, "message": f"Internal error: {e}"}}
+                body = json.dumps(response).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        httpd = http.server.ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.port = httpd.server_address[1]
+        # Only the user running the server may read the token
+        write_server_file(self.server_file, {"port": self.port, "token": self.token, "pid": os.getpid()})
+        log(f"Serving on 127.0.0.1:{self.port} with {self.workers} workers")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            self.close()
+            # A server started since owns the file now
+            with contextlib.suppress(OSError, ValueError):
+                if read_server_file(self.server_file)["token"] == self.token:
+                    os.remove(self.server_file)
+
+
+# Call the running job server, for the command line acting as a thin client
+def call_server(method, params, server_file=SERVER_FILE):
+    try:
+        info = read_server_file(server_file)
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{info['port']}/",
+            data=json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {info['token']}"},
+        )
+        with urllib.request.urlopen(request) as response:
+            reply = json.load(response)
+    except (OSError, ValueError, KeyError) as e:
+        raise ValueError(f"No ventoy-assist server is reachable, start one with 'ventoy-assist serve' ({e})")
+    if "error" in reply:
+        raise ValueError(reply["error"]["message"])
+    return reply["result"]
+
+
+# Run an apply or rename command on the job server and print its result like a local run
+def run_server_job_cli(args):
+    params = {key: value for key, value in vars(args).items() if key not in SERVER_CLIENT_OPTIONS}
+    # The server may run in another folder, so paths that exist here are sent as absolute paths
+    params["drive"] = os.path.abspath(args.drive) if os.path.isdir(args.drive) else args.drive
+    if params.get("icon_pack") and os.path.exists(params["icon_pack"]):
+        params["icon_pack"] = os.path.abspath(params["icon_pack"])
+    job = call_server(args.command, {**params, "wait": True})
+    if job["state"] == "failed":
+        print(f"Error: {job['error']}", file=sys.stderr)
+        return 1
+
+    for warning in job["result"]["warnings"]:
+        print(f"Warning: {warning}", file=sys.stderr)
+    print(job["result"]["output"])
+    if args.report == "-":
+        print(json.dumps(job["result"]["report"], indent=4))
+    elif args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(job["result"]["report"], report_file, indent=4)
+    return 0
+
+
+# Headless entry point, used when ventoy-assist is started with arguments
+def run_cli(argv):
+    parser = argparse.ArgumentParser(prog="ventoy-assist", description="Apply icons and aliases to a Ventoy drive without the GUI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    apply_parser = subparsers.add_parser("apply", help="apply icons to the images on a drive")
+    apply_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+    apply_parser.add_argument("--theme", required=True, help="theme folder name to apply icons to")
+    apply_parser.add_argument("--all-themes", action="store_true", help="apply icons to all themes")
+    apply_parser.add_argument("--all-resolutions", action="store_true", help="apply icons to all resolutions of the theme")
+    apply_parser.add_argument("--theme-icons", action="store_true", help="use the theme's icons folder instead of the default icons")
+    apply_parser.add_argument("--icon-pack", metavar="PACK", help="icon pack name from the icon-packs folder, or the path of a folder, zip or tar of icons")
+    apply_parser.add_argument("--recolor", choices=RECOLOR_MODES, help="recolor the icons toward the colors of each theme's background")
+    apply_parser.add_argument("--recolor-strength", type=float, default=1.0, metavar="0-1", help="how far to recolor the icons (default: 1)")
+    apply_parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024), metavar="MB", help="memory for resized icons; past it, planned icons are spooled to a temporary file (default: 256)")
+    apply_parser.add_argument("--no-detect", action="store_true", help="match images by file name only, without reading their volume labels")
+    apply_parser.add_argument("--dry-run", action="store_true", help="print the planned changes without writing anything")
+    apply_parser.add_argument("--report", metavar="FILE", help="write a JSON run report with stage timings ('-' for stdout)")
+    apply_parser.add_argument("--server", action="store_true", help="run the job on the running 'ventoy-assist serve' instead of in this process")
+    apply_parser.add_argument("--profile", nargs="?", const="", metavar="PREFIX", help="profile the run: write PREFIX.pstats, PREFIX.collapsed (flamegraph stacks) and PREFIX.alloc.txt (top allocators) next to the run report")
+
+    rename_parser = subparsers.add_parser("rename", help="set menu aliases for images or folders")
+    rename_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+    rename_parser.add_argument("aliases", nargs="+", metavar="PATH=ALIAS", help="path relative to the drive root and its new alias")
+    rename_parser.add_argument("--dry-run", action="store_true", help="print the planned changes without writing anything")
+    rename_parser.add_argument("--report", metavar="FILE", help="write a JSON run report with stage timings ('-' for stdout)")
+    rename_parser.add_argument("--server", action="store_true", help="run the job on the running 'ventoy-assist serve' instead of in this process")
+    rename_parser.add_argument("--profile", nargs="?", const="", metavar="PREFIX", help="profile the run: write PREFIX.pstats, PREFIX.collapsed (flamegraph stacks) and PREFIX.alloc.txt (top allocators) next to the run report")
+
+    probe_parser = subparsers.add_parser("probe", help="measure the write speed of a drive and show the chosen I/O schedule")
+    probe_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+
+    verify_parser = subparsers.add_parser("verify", help="check the images against the SHA-256 checksum files next to them")
+    verify_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+    verify_parser.add_argument("--all", action="store_true", help="also hash images without a checksum file, to cache their digests")
+    verify_parser.add_argument("--report", metavar="FILE", help="write a JSON run report with stage timings ('-' for stdout)")
+
+    resume_parser = subparsers.add_parser("resume", help="finish (or roll back) a run that was interrupted")
+    resume_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+    resume_parser.add_argument("--rollback", action="store_true", help="undo the interrupted run instead of finishing it")
+    resume_parser.add_argument("--dry-run", action="store_true", help="print the remaining changes without writing anything")
+    resume_parser.add_argument("--report", metavar="FILE", help="write a JSON run report with stage timings ('-' for stdout)")
+
+    gc_parser = subparsers.add_parser("gc", help="remove ventoy.json entries and '-alt' icons that nothing uses any more")
+    gc_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+    gc_parser.add_argument("--dry-run", action="store_true", help="print the planned changes without writing anything")
+    gc_parser.add_argument("--report", metavar="FILE", help="write a JSON run report with stage timings ('-' for stdout)")
+
+    duplicates_parser = subparsers.add_parser("duplicates", help="find images stored more than once and optionally remove the extra copies")
+    duplicates_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+    duplicates_parser.add_argument("--delete", action="store_true", help="keep one copy of each image and re-point its ventoy.json entries")
+    duplicates_parser.add_argument("--dry-run", action="store_true", help="with --delete, print the planned changes without removing anything")
+    duplicates_parser.add_argument("--report", metavar="FILE", help="write a JSON run report with stage timings ('-' for stdout)")
+
+    replicate_parser = subparsers.add_parser("replicate", help="copy a curated drive to other drives, only the missing or changed files")
+    replicate_parser.add_argument("source", help="drive letter (E:) or mount point of the curated drive")
+    replicate_parser.add_argument("targets", nargs="+", help="drive letters or mount points of the drives to update")
+    replicate_parser.add_argument("--hash", action="store_true", help="compare files of the same size by SHA-256 instead of modification time")
+    replicate_parser.add_argument("--dry-run", action="store_true", help="list the files that would be copied without copying anything")
+    replicate_parser.add_argument("--report", metavar="FILE", help="write a JSON run report with stage timings ('-' for stdout)")
+
+    serve_parser = subparsers.add_parser("serve", help="run a local job server that keeps caches warm for apply and rename jobs (--server)")
+    serve_parser.add_argument("--port", type=int, default=0, help="port on 127.0.0.1 to listen on (default: any free port)")
+    serve_parser.add_argument("--workers", type=int, default=2, help="jobs run at the same time, one at a time per drive (default: 2)")
+
+    watch_parser = subparsers.add_parser("watch", help="keep menu_class in sync while images are added or removed")
+    watch_parser.add_argument("drive", help="drive letter (E:) or mount point of the Ventoy drive")
+    watch_parser.add_argument("--theme", required=True, help="theme folder whose icons are used")
+    watch_parser.add_argument("--all-themes", action="store_true", help="use the icons of all themes")
+    watch_parser.add_argument("--all-resolutions", action="store_true", help="use the icons of all resolutions of the theme")
+    watch_parser.add_argument("--debounce", type=float, default=2.0, help="seconds to wait for changes to settle (default: 2)")
+    watch_parser.add_argument("--poll", action="store_true", help="poll the drive instead of using inotify")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "rename":
+        aliases = []
+        for pair in args.aliases:
+            path, separator, alias = pair.partition("=")
+            if not separator or not alias.strip():
+                parser.error(f"expected PATH=ALIAS, got {pair!r}")
+            aliases.append([path.strip("/\\"), alias.strip()])
+        args.aliases = aliases
+
+    if args.command == "serve":
+        server = JobServer(args.workers, args.port)
+        server.warm_up()
+        server.serve()
+        return 0
+
+    if getattr(args, "server", False):
+        if args.profile is not None:
+            parser.error("--profile cannot be used with --server")
+        try:
+            return run_server_job_cli(args)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
 
-            for entry in ventoy_json["menu_alias"]:
-                key = "dir" if is_directory else "image"
-                if entry.get(key) == image_path:
-                    entry["alias"] = new_alias
-                    alias_exists = True
-                    break
+    # Commands that change the drive refuse to start on top of an unfinished run
+    changes_drive = args.command in ("apply", "rename", "gc") or (args.command == "duplicates" and args.delete)
+    if changes_drive and read_journal(os.path.join(drive_root(args.drive), "ventoy")) is not None:
+        print(f"Error: an interrupted run was found on {args.drive}. Run 'ventoy-assist resume {args.drive}' to finish it, or add --rollback to undo it.", file=sys.stderr)
+        return 1
 
-            if not alias_exists:
-                if is_directory:
-                    ventoy_json["menu_alias"].append({"dir": image_path, "alias": new_alias})
-                else:
-                    ventoy_json["menu_alias"].append({"image": image_path, "alias": new_alias})
+    if args.command == "resume" and args.rollback:
+        try:
+            warnings = rollback_journal(args.drive)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        for warning in warnings:
+            print(f"Warning: {warning}", file=sys.stderr)
+        print("The interrupted run was rolled back")
+        return 0
+
+    if args.command == "watch":
+        try:
+            watch_volume(args.drive, args.theme, args.all_themes, args.all_resolutions, args.debounce, not args.poll)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.command == "verify":
+        report = RunReport("verify")
+        results = verify_images(args.drive, args.all, report, log=lambda line: print(line, file=sys.stderr))
+        for result in results:
+            if result["status"] != "unlisted" or result["actual"]:
+                print(f"{result['status'].upper():9} {result['path']}" + (f" ({result['error']})" if result.get("error") else ""))
+        statuses = collections.Counter(result["status"] for result in results)
+        print(f"{statuses['ok']} ok, {statuses['mismatch']} mismatched, {statuses['error']} failed, {statuses['unlisted']} without a checksum")
+        save_report_cli(report, args.report)
+        return 1 if statuses["mismatch"] or statuses["error"] else 0
+
+    if args.command == "duplicates":
+        report = RunReport("duplicates")
+        groups = find_duplicates(args.drive, report)
+        for group in groups:
+            print(f"{format_size(group['size'])} x {len(group['paths'])}:")
+            print("\n".join(f"  /{path}" for path in group["paths"]))
+        print(f"{len(groups)} duplicate groups, {format_size(sum(group['size'] * (len(group['paths']) - 1) for group in groups))} can be freed")
+        if not args.delete or not groups:
+            save_report_cli(report, args.report)
+            return 0
+        try:
+            plan = plan_remove_duplicates(args.drive, groups, report)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        return run_plan_cli(plan, args.dry_run, args.report)
+
+    if args.command == "replicate":
+        report = RunReport("replicate")
+        try:
+            results = replicate(args.source, args.targets, args.hash, args.dry_run, report, log=lambda line: print(line, file=sys.stderr))
+        except FileNotFoundError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        for result in results:
+            if args.dry_run:
+                print(f"{result['target']}: {len(result['files'])} files to copy ({format_size(result['bytes'])})")
+                for path in result["files"]:
+                    print(f"  {path}")
+            else:
+                print(f"{result['target']}: {result['copied']} of {len(result['files'])} files copied ({format_size(result['bytes'])})")
+            for error in result["errors"]:
+                print(f"Warning: {error}", file=sys.stderr)
+        save_report_cli(report, args.report)
+        return 1 if any(result["errors"] for result in results) else 0
+
+    if args.command == "probe":
+        profile = volume_profile(drive_root(args.drive))
+        if profile is None:
+            print("Error: the drive cannot be written", file=sys.stderr)
+            return 1
+        # Dry runs estimate the write time from this profile instead of probing the drive themselves
+        ventoy_dir = os.path.join(drive_root(args.drive), "ventoy")
+        if os.path.isdir(ventoy_dir):
+            write_state(ventoy_dir, "volume.json", profile)
+        print(json.dumps({"profile": profile, "schedule": io_schedule(profile)}, indent=4))
+        return 0
+
+    # The profile files go next to the run report, or into the current folder without one
+    profiler = None
+    report_file = args.report if args.report != "-" else None
+    if getattr(args, "profile", None) is not None:
+        profiler = RunProfiler(args.profile or (os.path.splitext(report_file)[0] if report_file else profile_prefix(args.command, os.getcwd())))
 
-        # Save the updated ventoy.json
-        self.save_ventoy_json(ventoy_dir, ventoy_json)
+    try:
+        with profiler or contextlib.nullcontext():
+            plan = build_plan(args)
+            status = run_plan_cli(plan, args.dry_run, args.report)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
 
-        # Clear the list of paths and aliases after applying the rename
-        self.iso_aliases.clear()
-        self.update_rename_table()
+    if profiler:
+        for path in profiler.save(None if report_file else plan["report"]):
+            print(f"Profile saved at {path}", file=sys.stderr)
+    return status
 
 
 # Run the application
 def main():
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+
     app = QtWidgets.QApplication(sys.argv)
     font = QFont("Segoe UI", 9)
     app.setFont(font)